@@ -18,7 +18,8 @@ if "ai_draft_narrative" not in st.session_state:
 if "analyst_edited_narrative" not in st.session_state:
     st.session_state.analyst_edited_narrative = ""
 if "narrative_versions" not in st.session_state:
-    st.session_state.narrative_versions = []
+    from application_pages.version_store import VersionStore
+    st.session_state.narrative_versions = VersionStore()
 if "compliance_checklist_results" not in st.session_state:
     st.session_state.compliance_checklist_results = []
 if "sign_off_details" not in st.session_state:
@@ -26,7 +27,13 @@ if "sign_off_details" not in st.session_state:
 if "audit_trail" not in st.session_state:
     st.session_state.audit_trail = []
 
-page = st.sidebar.selectbox(label="Navigation", options=["Case Intake", "Explore Data", "Draft SAR (AI-augmented)", "Human Review", "Compliance Checklist & Sign-off", "Export & Audit"])
+from application_pages.case_store import (
+    CASE_STATUSES, DEFAULT_ANALYST_ID, autosave_case, get_case_store, open_case,
+)
+if "analyst_id" not in st.session_state:
+    st.session_state.analyst_id = DEFAULT_ANALYST_ID
+
+page = st.sidebar.selectbox(label="Navigation", options=["Case Intake", "Explore Data", "Draft SAR (AI-augmented)", "Human Review", "Compliance Checklist & Sign-off", "Export & Audit", "Bulk Export", "Audit Trail Query"])
 if page == "Case Intake":
     from application_pages.page_case_intake import run_page
     st.markdown('''
@@ -57,6 +64,34 @@ elif page == "Compliance Checklist & Sign-off":
 elif page == "Export & Audit":
     from application_pages.page_export_audit import run_page
     run_page()
+elif page == "Bulk Export":
+    from application_pages.page_bulk_export import run_page
+    run_page()
+elif page == "Audit Trail Query":
+    from application_pages.page_audit_query import run_page
+    run_page()
+
+# Saved cases: search by customer, alert, analyst or status and reopen one
+with st.sidebar.expander("Cases"):
+    st.text_input("Analyst ID", key="analyst_id")
+    if st.session_state.get("case_id"):
+        st.caption(f"Current case: {st.session_state.case_id} (saved automatically)")
+    status = st.selectbox("Status", ["any", *CASE_STATUSES], key="case_filter_status")
+    customer = st.text_input("Customer ID", key="case_filter_customer")
+    mine = st.checkbox("Only my cases", key="case_filter_mine")
+    cases = get_case_store().find(
+        customer_id=customer.strip() or None,
+        analyst=st.session_state.analyst_id if mine else None,
+        status=None if status == "any" else status,
+    )
+    if cases:
+        labels = {c["case_id"]: f"{c['case_id']} · customer {c['customer_id']} · {c['status']}" for c in cases}
+        chosen = st.selectbox("Saved cases", list(labels), format_func=labels.get, key="case_to_open")
+        st.button("Open case", on_click=open_case, args=(st.session_state, chosen))
+    else:
+        st.caption("No saved cases match.")
+
+autosave_case(st.session_state)
 
 
 # License
@@ -0,0 +1,318 @@
+"""
+Append-only audit event log, shared by all cases and sessions (and the processes that log to it).
+
+Pages emit an event for each auditable action (draft generated, narrative edited, checklist run,
+AI fix generated and applied, version restored, export prepared). Each record is one JSON line
+carrying a sequence number and a hash chain:
+
+    hash = sha256(canonical JSON of the record, including prev_hash)
+
+where prev_hash is the hash of the previous record (64 zeros for the first). Editing, removing or
+reordering any line breaks the chain from that line on, which `verify_log` reports. A last line
+without a newline is what a crash in the middle of a write leaves behind: the chain continues from
+the last complete record, and the fragment is moved to `<log>.fragment` before the next append.
+
+Several processes may append to the same log (the app, and the bulk-export CLI run next to it).
+`emit` takes an exclusive lock on the file (fcntl.flock), continues the chain from the file's last
+record if another process appended since, and writes the record before releasing the lock, so
+the chain stays linear whichever process wrote each record. The write is not synced: a background
+thread fsyncs in batches, so logging costs page interactions a locked append rather than a disk
+sync. `flush` waits until every record emitted so far is synced, and the log is flushed at exit.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:   # Windows: appends are serialized within the process only
+    fcntl = None
+
+# ---- Tunables ----
+AUDIT_LOG_PATH = os.getenv("SAR_AUDIT_LOG", "sar_audit_log.jsonl")
+AUDIT_BATCH_SIZE = 256                                                    # records per fsync
+AUDIT_FLUSH_INTERVAL_S = float(os.getenv("SAR_AUDIT_FLUSH_INTERVAL_S", "0.5"))  # max delay before an fsync
+AUDIT_FSYNC = os.getenv("SAR_AUDIT_FSYNC", "1") != "0"                    # fsync after every batch
+
+GENESIS_HASH = "0" * 64
+
+
+def _canonical(record: dict) -> str:
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def record_hash(record: dict) -> str:
+    """Chain hash of a record (every field except `hash` itself)."""
+    body = {k: v for k, v in record.items() if k != "hash"}
+    return hashlib.sha256(_canonical(body).encode("utf-8")).hexdigest()
+
+
+def _complete_end(f) -> int:
+    """Size of the file up to and including its last newline: where its complete records end."""
+    pos = f.seek(0, os.SEEK_END)
+    while pos > 0:
+        step = min(8192, pos)
+        pos -= step
+        f.seek(pos)
+        n = f.read(step).rfind(b"\n")
+        if n != -1:
+            return pos + n + 1
+    return 0
+
+
+def _last_record(path: str):
+    """
+    The last complete record of the log file, or None. A trailing fragment without a newline (a
+    write cut short by a crash) is not a record and is skipped.
+    """
+    try:
+        with open(path, "rb") as f:
+            pos = _complete_end(f)
+            tail = b""
+            while pos > 0:
+                step = min(8192, pos)
+                pos -= step
+                f.seek(pos)
+                tail = f.read(step) + tail
+                lines = tail.rstrip(b"\n").split(b"\n")
+                if len(lines) > 1 or pos == 0:
+                    return json.loads(lines[-1]) if lines[-1].strip() else None
+            return None
+    except FileNotFoundError:
+        return None
+
+
+def _drop_fragment(path: str) -> bytes:
+    """
+    Cut a trailing fragment without a newline off the log file, so new records start on a line of
+    their own, and keep it in `<path>.fragment`. Returns the fragment (empty if there was none).
+    """
+    try:
+        with open(path, "r+b") as f:
+            end = _complete_end(f)
+            size = f.seek(0, os.SEEK_END)
+            if end == size:
+                return b""
+            f.seek(end)
+            fragment = f.read()
+            with open(path + ".fragment", "ab") as kept:
+                kept.write(fragment + b"\n")
+            f.truncate(end)
+            return fragment
+    except FileNotFoundError:
+        return b""
+
+
+@contextmanager
+def _file_lock(fh):
+    """Exclusive lock on an open file across processes (a no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def verify_log(path: str = AUDIT_LOG_PATH) -> dict:
+    """
+    Recompute the hash chain of a log file. Returns `ok`, the number of `records` checked and,
+    when the chain is broken, the line number (`broken_at`, 1-based) and the `reason`.
+    """
+    prev, n = GENESIS_HASH, 0
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return {"ok": True, "records": 0}
+    with f:
+        for n, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return {"ok": False, "records": n - 1, "broken_at": n, "reason": "unreadable line"}
+            if record.get("prev_hash") != prev:
+                return {"ok": False, "records": n - 1, "broken_at": n, "reason": "prev_hash does not match the previous record"}
+            if record.get("hash") != record_hash(record):
+                return {"ok": False, "records": n - 1, "broken_at": n, "reason": "record content does not match its hash"}
+            prev = record["hash"]
+    return {"ok": True, "records": n}
+
+
+def read_log(path: str = AUDIT_LOG_PATH):
+    """Records of a log file, oldest first."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except FileNotFoundError:
+        return
+
+
+class AuditLog:
+    """
+    Hash-chained JSONL log. Each record is hashed and appended under an exclusive lock on the file,
+    so several processes (the app and the bulk-export CLI) can share one log; a background thread
+    syncs the appended records to disk in batches.
+    """
+
+    def __init__(self, path: str = AUDIT_LOG_PATH, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL_S, fsync: bool = AUDIT_FSYNC):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.last_error = None
+        self._fh = open(path, "ab", buffering=0)
+        self._end = -1            # file size after our last append; anything else means another writer
+        self._seq, self._last_hash = 0, GENESIS_HASH
+        with _file_lock(self._fh):
+            self._sync_tail()
+        self._written = self._synced = 0   # records appended / fsynced by this process
+        self._closed = False
+        self._flush_requested = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="sar-audit-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _sync_tail(self) -> None:
+        """Continue the chain from the file's last record (called with the file locked)."""
+        size = os.fstat(self._fh.fileno()).st_size
+        if size == self._end:
+            return
+        if _drop_fragment(self.path):
+            self.last_error = f"dropped an incomplete last line (kept in {self.path}.fragment)"
+        last = _last_record(self.path)
+        self._seq = last["seq"] if last else 0
+        self._last_hash = last["hash"] if last else GENESIS_HASH
+        self._end = os.fstat(self._fh.fileno()).st_size
+
+    def emit(self, event: str, case_id=None, analyst_id=None, **details) -> dict:
+        """
+        Append an event and return the record (numbered and hashed). The record is written to the
+        file before this returns and synced to disk with the next batch; an OSError from the write
+        is raised, with nothing appended.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The audit log is closed")
+            with _file_lock(self._fh):
+                self._sync_tail()   # another process may have appended since our last record
+                record = {
+                    "seq": self._seq + 1,
+                    "timestamp": datetime.now().isoformat(sep=" ", timespec="seconds"),
+                    "event": event,
+                    "case_id": case_id,
+                    "analyst_id": analyst_id,
+                    **details,
+                    "prev_hash": self._last_hash,
+                }
+                record["hash"] = record_hash(record)
+                line = (_canonical(record) + "\n").encode("utf-8")
+                try:
+                    view = memoryview(line)
+                    while view:
+                        view = view[self._fh.write(view):]
+                except OSError as e:
+                    self.last_error = str(e)
+                    self._end = -1   # a partial line is dropped by the next append
+                    raise
+                self._seq, self._last_hash = record["seq"], record["hash"]
+                self._end += len(line)
+            self._written += 1
+            if self._written - self._synced >= self.batch_size:
+                self._cond.notify_all()
+        return record
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._written - self._synced >= self.batch_size or self._flush_requested or self._closed,
+                    timeout=self.flush_interval,
+                )
+                target = self._written
+                self._flush_requested = False
+                closing = self._closed
+            if target > self._synced:
+                try:
+                    if self.fsync:
+                        os.fsync(self._fh.fileno())
+                except OSError as e:
+                    # Retry on the next round
+                    self.last_error = str(e)
+                    continue
+                with self._cond:
+                    self._synced = target
+                    self._cond.notify_all()
+            if closing:
+                with self._cond:
+                    if self._synced >= self._written:
+                        self._fh.close()
+                        return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every record emitted so far is on disk. False on timeout."""
+        with self._cond:
+            target = self._written
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._synced >= target, timeout=timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=10)
+
+    def pending(self) -> int:
+        """Records appended but not yet synced to disk."""
+        with self._cond:
+            return self._written - self._synced
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_audit_log(path: str = AUDIT_LOG_PATH) -> AuditLog:
+    with _logs_lock:
+        if path not in _logs:
+            _logs[path] = AuditLog(path)
+        return _logs[path]
+
+
+def log_event(state, event: str, **details) -> dict:
+    """
+    Emit an event for the session's case (case and analyst taken from `state`) and add it to the
+    case's audit trail in the session, which is saved with the case.
+    """
+    record = get_audit_log().emit(event, case_id=state.get("case_id"), analyst_id=state.get("analyst_id"), **details)
+    trail = state.get("audit_trail")
+    if not isinstance(trail, list):
+        trail = []
+    trail.append({k: v for k, v in record.items() if k != "prev_hash"})
+    state["audit_trail"] = trail
+    return record
+
+
+def log_revision(state, text: str, source: str, event: str = "Narrative edited", always: bool = False, **details):
+    """
+    Commit a narrative revision to the session's version store and log `event` for it. Unchanged
+    text creates no version and, unless `always`, no event. Returns the version number.
+    """
+    store = state["narrative_versions"]
+    before = len(store)
+    version = store.commit(text, source)
+    if always or len(store) > before:
+        log_event(state, event, source=source, version=version, chars=len(text or ""), **details)
+    return version
@@ -0,0 +1,265 @@
+"""
+Indexed, queryable copy of the audit event log (audit_log.py) across all cases.
+
+The JSONL log stays the tamper-evident record; this store is an SQLite index built from it, so
+compliance questions ("all exports by analyst X last quarter", "cases where an AI fix was applied
+after a FAIL") are answered from indexes instead of scanning the file:
+
+  * `events` holds one row per record: sequence number, timestamp, event type, case, analyst,
+    status, the remaining fields as JSON, and the record hash. It is indexed by time, by event
+    type and analyst (each with time), and by case and event type (with sequence).
+  * `events_fts` is a full-text (FTS5) index over the event type and details, for free-text
+    search. Without FTS5 in the SQLite build, text search falls back to a LIKE scan.
+
+`sync()` appends the log records written since the last sync (the byte offset read so far is kept
+in the database), so queries see new events at a cost proportional to what was added. If the log
+is replaced or truncated, the index is rebuilt.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from application_pages.audit_log import AUDIT_LOG_PATH, get_audit_log
+
+# ---- Tunables ----
+AUDIT_INDEX_PATH = os.getenv("SAR_AUDIT_INDEX", "sar_audit_index.sqlite3")
+SYNC_BATCH_ROWS = 50_000       # rows inserted per transaction while catching up with the log
+QUERY_LIMIT = 1000             # rows returned by a query unless a limit is given
+
+_BASE_FIELDS = ("seq", "timestamp", "event", "case_id", "analyst_id", "prev_hash", "hash")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq        INTEGER PRIMARY KEY,
+    ts         TEXT NOT NULL,
+    event      TEXT NOT NULL,
+    case_id    TEXT,
+    analyst_id TEXT,
+    status     TEXT,
+    details    TEXT NOT NULL,
+    hash       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_event ON events (event, ts);
+CREATE INDEX IF NOT EXISTS events_analyst ON events (analyst_id, ts);
+CREATE INDEX IF NOT EXISTS events_case ON events (case_id, event, seq);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _row(record: dict) -> tuple:
+    details = {k: v for k, v in record.items() if k not in _BASE_FIELDS}
+    status = details.get("status")
+    return (record["seq"], record["timestamp"], record["event"], record.get("case_id"), record.get("analyst_id"),
+            None if status is None else str(status), json.dumps(details, default=str, ensure_ascii=False), record["hash"])
+
+
+def _as_dict(row) -> dict:
+    seq, ts, event, case_id, analyst_id, status, details, hash_ = row
+    return {"seq": seq, "timestamp": ts, "event": event, "case_id": case_id, "analyst_id": analyst_id,
+            **json.loads(details), "hash": hash_}
+
+
+class AuditStore:
+    """SQLite index of one audit log file (thread-safe; one connection shared by the process)."""
+
+    def __init__(self, path: str = AUDIT_INDEX_PATH, log_path: str = AUDIT_LOG_PATH):
+        self.path = path
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(event, details)")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+
+    def _meta(self, key: str, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, key: str, value) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _reset(self) -> None:
+        self._conn.execute("DELETE FROM events")
+        if self.has_fts:
+            self._conn.execute("DELETE FROM events_fts")
+        self._conn.execute("DELETE FROM meta")
+
+    def _insert(self, rows: list) -> int:
+        """Insert rows not already indexed; returns how many were added."""
+        before = self._conn.total_changes
+        self._conn.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        added = self._conn.total_changes - before
+        if self.has_fts:
+            # A sequence number seen twice keeps its first row in `events`; index only that one
+            # (FTS5 ignores OR IGNORE on rowid conflicts, so the guard is explicit)
+            self._conn.executemany(
+                "INSERT INTO events_fts (rowid, event, details) SELECT ?, ?, ?"
+                " WHERE NOT EXISTS (SELECT 1 FROM events_fts WHERE rowid = ?)",
+                [(r[0], r[2], r[6], r[0]) for r in rows])
+        return added
+
+    def sync(self, flush_log: bool = True) -> int:
+        """Index the log records written since the last sync. Returns the number of records added."""
+        if flush_log and os.path.abspath(get_audit_log().path) == os.path.abspath(self.log_path):
+            get_audit_log().flush()
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return 0
+        added = 0
+        with self._lock, f:
+            size, head = os.fstat(f.fileno()).st_size, f.readline()
+            # Offset, reset and the new rows commit together, so an interrupted rebuild is redone
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                offset = int(self._meta("log_offset", 0))
+                first_hash = self._meta("first_hash")
+                # A different first record or a shorter file: the log was replaced, start over
+                if size < offset or (first_hash and head and json.loads(head).get("hash") != first_hash):
+                    self._reset()
+                    offset, first_hash = 0, None
+                f.seek(offset)
+                rows = []
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break                  # record still being written
+                    offset += len(line)
+                    if line.strip():
+                        record = json.loads(line)
+                        if not first_hash:
+                            first_hash = record["hash"]
+                            self._set_meta("first_hash", first_hash)
+                        rows.append(_row(record))
+                    if len(rows) >= SYNC_BATCH_ROWS:
+                        added += self._insert(rows)
+                        rows = []
+                added += self._insert(rows)
+                self._set_meta("log_offset", offset)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def query(self, event=None, analyst_id=None, case_id=None, status=None, since=None, until=None,
+              text=None, limit: int = QUERY_LIMIT, sync: bool = True) -> list:
+        """
+        Events matching every given filter, newest first. `event` may be a list of event types;
+        `since`/`until` are timestamps or dates ("2025-07-01"), `until` inclusive of that day when
+        it is a date; `text` is a full-text query over the event type and details.
+        """
+        if sync:
+            self.sync()
+        where, params = self._filters(event, analyst_id, case_id, status, since, until, text)
+        sql = "SELECT seq, ts, event, case_id, analyst_id, status, details, hash FROM events e"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit)).fetchall()
+        return [_as_dict(r) for r in rows]
+
+    def count(self, event=None, analyst_id=None, case_id=None, status=None, since=None, until=None,
+              text=None, sync: bool = True) -> int:
+        if sync:
+            self.sync()
+        where, params = self._filters(event, analyst_id, case_id, status, since, until, text)
+        sql = "SELECT COUNT(*) FROM events e" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def _filters(self, event, analyst_id, case_id, status, since, until, text):
+        where, params = [], []
+        if event:
+            events = [event] if isinstance(event, str) else list(event)
+            where.append(f"e.event IN ({', '.join('?' * len(events))})")
+            params.extend(events)
+        for column, value in (("analyst_id", analyst_id), ("case_id", case_id), ("status", status)):
+            if value not in (None, ""):
+                where.append(f"e.{column} = ?")
+                params.append(str(value))
+        if since:
+            where.append("e.ts >= ?")
+            params.append(str(since))
+        if until:
+            until = str(until)
+            where.append("e.ts <= ?" if len(until) > 10 else "e.ts < ?")
+            params.append(until if len(until) > 10 else until + "~")   # "~" sorts after any time of that day
+        if text:
+            if self.has_fts:
+                where.append("e.seq IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+                params.append(text)
+            else:
+                where.append("(e.event LIKE ? OR e.details LIKE ?)")
+                params.extend([f"%{text}%"] * 2)
+        return where, params
+
+    def cases_with_sequence(self, first_event: str, then_event: str, first_status=None,
+                            since=None, until=None, limit: int = QUERY_LIMIT, sync: bool = True) -> list:
+        """
+        Cases where `then_event` was logged after a `first_event` (optionally with `first_status`),
+        e.g. an AI fix applied after a failed checklist run; `since`/`until` apply to `then_event`.
+        One row per case, for its latest such `then_event` and the last `first_event` before it.
+        """
+        if sync:
+            self.sync()
+        where, params = self._filters(then_event, None, None, None, since, until, None)
+        status_sql = " AND f.status = ?" if first_status else ""
+        earlier = f"""SELECT 1 FROM events f
+                      WHERE f.case_id = e.case_id AND f.event = ? AND f.seq < e.seq{status_sql}"""
+        earlier_params = [first_event] + ([str(first_status)] if first_status else [])
+        # Each candidate `then_event` (found by event type and time) is checked with one lookup on
+        # the (case, event, seq) index
+        sql = f"""
+            SELECT e.case_id, MAX(e.seq) AS then_seq FROM events e
+             WHERE {" AND ".join(where)} AND e.case_id IS NOT NULL AND EXISTS ({earlier})
+             GROUP BY e.case_id ORDER BY then_seq DESC LIMIT ?"""
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, *earlier_params, limit)).fetchall()
+            result = []
+            for case_id, then_seq in rows:
+                then_ts, analyst_id = self._conn.execute(
+                    "SELECT ts, analyst_id FROM events WHERE seq = ?", (then_seq,)).fetchone()
+                first_seq, first_ts = self._conn.execute(
+                    "SELECT f.seq, f.ts FROM events f WHERE f.case_id = ? AND f.event = ? AND f.seq < ?"
+                    f"{status_sql} ORDER BY f.seq DESC LIMIT 1",
+                    (case_id, first_event, then_seq, *earlier_params[1:]),
+                ).fetchone()
+                result.append({"case_id": case_id, "first_seq": first_seq, "first_at": first_ts,
+                               "then_seq": then_seq, "then_at": then_ts, "analyst_id": analyst_id})
+        return result
+
+    def distinct(self, column: str) -> list:
+        """Distinct values of `event` or `analyst_id` (for filter choices), one index seek per value."""
+        if column not in ("event", "analyst_id"):
+            raise ValueError(f"Unsupported column: {column}")
+        sql = f"""
+            WITH RECURSIVE d(v) AS (
+                SELECT MIN({column}) FROM events
+                UNION ALL
+                SELECT (SELECT MIN({column}) FROM events WHERE {column} > d.v) FROM d WHERE d.v IS NOT NULL)
+            SELECT v FROM d WHERE v IS NOT NULL"""
+        with self._lock:
+            return [r[0] for r in self._conn.execute(sql)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_audit_store(path: str = AUDIT_INDEX_PATH, log_path: str = AUDIT_LOG_PATH) -> AuditStore:
+    with _stores_lock:
+        if (path, log_path) not in _stores:
+            _stores[path, log_path] = AuditStore(path, log_path)
+        return _stores[path, log_path]
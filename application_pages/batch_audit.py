@@ -0,0 +1,251 @@
+"""
+Batch compliance auditing of archived SAR narratives.
+
+Usage (from the repository root):
+
+    python -m application_pages.batch_audit sample archive.jsonl [--limit N]
+    python -m application_pages.batch_audit run archive.jsonl report.parquet [--workers N] [--rule-pack NAME]
+                                                [--summary summary.json]
+
+Input is JSON Lines, a JSON array or Parquet with one case per record: `case_id`, `narrative`,
+`five_ws` (dict or JSON string) and optionally `selected_facts` (list or JSON string). Records are
+streamed in chunks to a process pool; each worker runs the rules of the chosen rule pack (default:
+SAR_RULE_PACK), the same ones the Compliance page uses.
+The report has one row per case (overall pass/fail, length and one boolean column per checklist
+item) and is written as Parquet, or CSV when the output name ends in .csv. A case that cannot be
+audited (e.g. malformed `five_ws` JSON, or an unreadable JSONL line) does not stop the run: its row
+has an `error` and no results, and the summary counts it.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from application_pages.compliance_rules import run_compliance_checklist
+from application_pages.rule_packs import get_pack
+
+# ---- Tunables ----
+AUDIT_CHUNK_SIZE = int(os.getenv("SAR_AUDIT_CHUNK_SIZE", "500"))   # cases per task sent to a worker
+AUDIT_MAX_PENDING = 2                                              # queued chunks per worker
+ERROR_SAMPLES = 20                                                 # errored cases listed in the summary
+
+
+def _decode(value, default):
+    if value is None or (isinstance(value, float) and pd.isnull(value)):
+        return default
+    if isinstance(value, (str, bytes)):
+        return json.loads(value)
+    return value
+
+
+def iter_cases(path):
+    """Yield case dicts from a .jsonl/.json/.parquet file without loading Parquet or JSONL whole."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=AUDIT_CHUNK_SIZE):
+            yield from batch.to_pylist()
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    # Reported as an errored case by audit_case instead of ending the run
+                    yield {"case_id": None, "read_error": f"line {n}: {e}"}
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def audit_case(case: dict, rules=None) -> dict:
+    """Run the checklist (default: the default pack) on one archived case and flatten the report into a row."""
+    if case.get("read_error"):
+        raise ValueError(f"unreadable record, {case['read_error']}")
+    facts = _decode(case.get("selected_facts"), None)
+    report = run_compliance_checklist(case.get("narrative") or "", _decode(case.get("five_ws"), {}), facts, rules=rules)
+    row = {"case_id": case.get("case_id"), "overall": report["overall"], "length": report["length"]}
+    for item in report["items"]:
+        row[item["key"]] = item["passed"]
+    return row
+
+
+def _audit_chunk(cases, pack_name=None):
+    # Workers compile the pack themselves (once per process) rather than receiving pickled rules
+    rules = get_pack(pack_name).rules
+    rows = []
+    for case in cases:
+        try:
+            row = audit_case(case, rules)
+            row["error"] = None
+        except Exception as e:
+            row = {"case_id": case.get("case_id") if isinstance(case, dict) else None,
+                   "overall": None, "length": None, "error": f"{type(e).__name__}: {e}"}
+        rows.append(row)
+    return rows
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _ReportWriter:
+    """
+    Appends result rows to a Parquet file (one row group per chunk) or a CSV file. `columns` maps
+    each column to its (nullable) dtype, so every chunk has the same schema whichever of its
+    cases errored.
+    """
+
+    def __init__(self, path, columns: dict):
+        self.path = path
+        self.columns = columns
+        self._writer = None
+        self._csv_header = True
+
+    def write(self, rows):
+        df = pd.DataFrame(rows, columns=list(self.columns)).astype(self.columns)
+        if self.path.endswith(".csv"):
+            df.to_csv(self.path, mode="w" if self._csv_header else "a", header=self._csv_header, index=False)
+            self._csv_header = False
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run_batch_audit(input_path, output_path, workers: int = None, chunk_size: int = AUDIT_CHUNK_SIZE,
+                    rule_pack: str = None) -> dict:
+    """
+    Audit every case in `input_path` against `rule_pack` and write the per-case report to `output_path`.
+
+    At most `workers * AUDIT_MAX_PENDING` chunks are in flight, so memory stays bounded however
+    large the archive is. Rows are written in input order.
+
+    Returns:
+        dict: rule pack, cases, elapsed seconds, cases per second, the failure rate of each item
+        and overall (over the cases that could be audited), and the cases that errored.
+    """
+    workers = workers or os.cpu_count() or 1
+    pack = get_pack(rule_pack)   # fails fast on an unknown or invalid pack
+    keys = ["overall"] + [rule.key for rule in pack.rules]
+    writer = _ReportWriter(output_path, {"case_id": "string", "overall": "boolean", "length": "Int64",
+                                         **dict.fromkeys(keys[1:], "boolean"), "error": "string"})
+    failures = dict.fromkeys(keys, 0)
+    total = audited = 0
+    errors, error_samples = 0, []
+
+    def consume(rows):
+        nonlocal total, audited, errors
+        writer.write(rows)
+        total += len(rows)
+        for row in rows:
+            if row["error"]:
+                errors += 1
+                if len(error_samples) < ERROR_SAMPLES:
+                    error_samples.append({"case_id": row["case_id"], "error": row["error"]})
+                continue
+            audited += 1
+            for k in keys:
+                failures[k] += not row.get(k, True)
+
+    start = time.perf_counter()
+    try:
+        if workers == 1:
+            for chunk in _chunks(iter_cases(input_path), chunk_size):
+                consume(_audit_chunk(chunk, pack.path))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in _chunks(iter_cases(input_path), chunk_size):
+                    pending.append(pool.submit(_audit_chunk, chunk, pack.path))
+                    if len(pending) >= workers * AUDIT_MAX_PENDING:
+                        consume(pending.pop(0).result())
+                for future in pending:
+                    consume(future.result())
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rule_pack": pack.name,
+        "cases": total,
+        "audited": audited,
+        "errors": errors,
+        "workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "cases_per_s": round(total / elapsed, 1) if elapsed else None,
+        "failure_rates": {k: round(v / audited, 4) if audited else None for k, v in failures.items()},
+        "error_samples": error_samples,
+    }
+
+
+def write_sample_archive(data, path, limit: int = None) -> int:
+    """Write template drafts for the synthetic alerts as an archive to audit (JSON Lines)."""
+    from application_pages.prefetch import build_alert_prompt, prioritized_alerts
+    from application_pages.template_draft import render_template_draft
+
+    alerts = prioritized_alerts(data['alerts'], data['customers'])
+    if limit is not None:
+        alerts = alerts.head(limit)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for alert in alerts.to_dict('records'):
+            facts, five_ws, _ = build_alert_prompt(data, alert)
+            f.write(json.dumps({
+                "case_id": f"alert-{alert['alert_id']}",
+                "narrative": render_template_draft(facts, five_ws),
+                "five_ws": five_ws,
+                "selected_facts": facts,
+            }, default=str) + "\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score archived SAR narratives against the compliance checklist.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sample", help="write an archive of template drafts for the synthetic alerts")
+    p.add_argument("output")
+    p.add_argument("--limit", type=int, default=None)
+
+    p = sub.add_parser("run", help="audit an archive (.jsonl, .json or .parquet)")
+    p.add_argument("input")
+    p.add_argument("output", help="report file (.parquet or .csv)")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    p.add_argument("--chunk-size", type=int, default=AUDIT_CHUNK_SIZE)
+    p.add_argument("--rule-pack", default=None, help="rule pack name or file (default: SAR_RULE_PACK)")
+    p.add_argument("--summary", default=None, help="also write the aggregate failure rates as JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == "sample":
+        from application_pages.page_case_intake import load_synthetic_data
+        print(f"Wrote {write_sample_archive(load_synthetic_data(), args.output, args.limit)} cases to {args.output}")
+    elif args.command == "run":
+        summary = run_batch_audit(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                                  rule_pack=args.rule_pack)
+        if args.summary:
+            with open(args.summary, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Offline batch drafting of SAR narratives through JSONL request/response files.
+
+Usage (from the repository root):
+
+    python -m application_pages.batch_drafting prepare batch_input.jsonl [--limit N]
+    python -m application_pages.batch_drafting prepare-fixes fix_input.jsonl [--case-store PATH] [--limit N]
+    python -m application_pages.batch_drafting submit batch_input.jsonl
+    python -m application_pages.batch_drafting run-local batch_input.jsonl batch_output.jsonl [--concurrency N]
+    python -m application_pages.batch_drafting status batch_input.jsonl batch_output.jsonl
+    python -m application_pages.batch_drafting ingest batch_output.jsonl narratives/ [--case-store PATH]
+
+Input lines follow the OpenAI Batch API format (custom_id, method, url, body), so the same file can be
+submitted to a provider batch endpoint or processed by the local stand-in (`run-local`). Output lines
+follow the provider's output format, which is what `ingest` reads.
+
+`prepare` writes draft requests for the synthetic alerts; `prepare-fixes` writes a full-rewrite fix
+request (the Compliance page's "Fix it with AI" prompt) for every saved case whose last checklist
+run failed. `ingest` writes every result to a text file and, with --case-store, stores each fix as
+its case's AI-fixed narrative (for the analyst to review and save on the Compliance page) and logs
+an "AI fix generated" event for it.
+"""
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+
+from application_pages.llm_client import LLM_API_KEY, LLM_MODEL, chat_completion
+
+# ---- Tunables ----
+LLM_BATCH_API_BASE = os.getenv("LLM_BATCH_API_BASE", "https://api.openai.com/v1")
+BATCH_COMPLETION_WINDOW = "24h"
+DRAFT_MAX_TOKENS = 600    # matches the interactive Draft SAR call
+FIX_MAX_TOKENS = 1000     # matches the interactive "Fix it with AI" call
+CASE_QUERY_LIMIT = 1_000_000   # saved cases scanned for failing checklists
+BATCH_LLM_LABEL = "batch"      # latency/circuit-breaker label of local batch calls, apart from the pages'
+
+
+def batch_request_line(custom_id: str, prompt: str, max_tokens: int, temperature: float = 0.2) -> dict:
+    """One Batch API request line for a chat completion."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": LLM_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+    }
+
+
+def _write_jsonl(path, lines) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, default=str) + "\n")
+            count += 1
+    return count
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_draft_batch(data, path, limit: int = None) -> int:
+    """
+    Write one draft request per alert (highest risk first) using the same prompt as the Draft SAR page.
+    Returns the number of lines written.
+    """
+    from application_pages.prefetch import prioritized_alerts, build_alert_prompt
+
+    alerts = prioritized_alerts(data['alerts'], data['customers'])
+    if limit is not None:
+        alerts = alerts.head(limit)
+
+    def lines():
+        for alert in alerts.to_dict('records'):
+            _, _, prompt = build_alert_prompt(data, alert)
+            yield batch_request_line(f"draft-alert-{alert['alert_id']}", prompt, DRAFT_MAX_TOKENS)
+
+    return _write_jsonl(path, lines())
+
+
+def write_fix_batch(cases, path) -> int:
+    """
+    Write one full-rewrite fix request per failing case.
+    `cases` is an iterable of dicts with case_id, narrative and compliance_report.
+    """
+    from application_pages.page_compliance_checklist import build_fix_prompt
+
+    return _write_jsonl(path, (
+        batch_request_line(f"fix-{c['case_id']}", build_fix_prompt(c['narrative'], c['compliance_report']), FIX_MAX_TOKENS)
+        for c in cases if not c['compliance_report'].get('overall', True)
+    ))
+
+
+def failing_cases(store, limit: int = None):
+    """Saved checked cases whose last checklist run failed, as write_fix_batch cases."""
+    from application_pages.case_store import decode_case_state
+
+    count = 0
+    for row in store.find(status="checked", limit=CASE_QUERY_LIMIT):
+        if limit is not None and count >= limit:
+            return
+        state = decode_case_state(store.load(row["case_id"])[1])
+        report = state.get("compliance_checklist_results")
+        narrative = _current_narrative(state)
+        if isinstance(report, dict) and report and not report.get("overall", True) and narrative:
+            count += 1
+            yield {"case_id": row["case_id"], "narrative": narrative, "compliance_report": report}
+
+
+def _current_narrative(state):
+    # The narrative the Compliance page checks and fixes
+    return (state.get("human_edited_narrative") or state.get("analyst_edited_narrative")
+            or state.get("ai_draft_narrative"))
+
+
+def apply_fix(store, case_id: str, text: str, custom_id: str) -> bool:
+    """
+    Store a batch fix as the case's AI-fixed narrative and log it, as "Fix it with AI" does.
+    False if the case does not exist or already has this fix.
+    """
+    from application_pages.audit_log import log_event
+    from application_pages.case_store import case_status, decode_case_state, encode_case_state
+
+    found = store.load(case_id)
+    if found is None:
+        return False
+    row, blob = found
+    state = decode_case_state(blob)
+    if state.get("fixed_narrative") == text:
+        return False
+    state["fixed_narrative"] = text
+    state["case_id"], state["analyst_id"] = case_id, row["analyst"]
+    report = state.get("compliance_checklist_results") or {}
+    log_event(state, "AI fix generated", summary="Full rewrite of the narrative (batch).", batch_request=custom_id,
+              failed=[item["label"] for item in report.get("items", []) if not item["passed"]])
+    store.save(case_id, encode_case_state(state), case_status(state), customer_id=row["customer_id"],
+               alert_id=row["alert_id"], analyst=row["analyst"])
+    return True
+
+
+def submit_batch(input_path, api_base: str = LLM_BATCH_API_BASE) -> dict:
+    """Upload the request file and create a provider batch job. Returns the batch object."""
+    headers = {"Authorization": f"Bearer {LLM_API_KEY}"}
+    with open(input_path, "rb") as f:
+        r = requests.post(f"{api_base}/files", headers=headers,
+                          files={"file": (os.path.basename(input_path), f)}, data={"purpose": "batch"}, timeout=300)
+    r.raise_for_status()
+    r = requests.post(f"{api_base}/batches", headers=headers, timeout=60, json={
+        "input_file_id": r.json()["id"],
+        "endpoint": "/v1/chat/completions",
+        "completion_window": BATCH_COMPLETION_WINDOW,
+    })
+    r.raise_for_status()
+    return r.json()
+
+
+def completed_ids(output_path) -> set:
+    """custom_ids that already have a successful response in the output file."""
+    if not os.path.exists(output_path):
+        return set()
+    return {line["custom_id"] for line in _read_jsonl(output_path) if not line.get("error")}
+
+
+def batch_progress(input_path, output_path) -> dict:
+    total = sum(1 for _ in _read_jsonl(input_path))
+    done = len(completed_ids(output_path))
+    return {"total": total, "done": done, "remaining": total - done}
+
+
+def run_local_batch(input_path, output_path, concurrency: int = 4, llm=None) -> dict:
+    """
+    Local stand-in for a provider batch endpoint.
+
+    Requests already answered successfully in `output_path` are skipped, so an interrupted run resumes
+    where it stopped. Each response is appended and flushed as soon as it arrives.
+
+    By default requests are not hedged (a batch has no latency target, and a duplicate request
+    doubles its cost) and are labelled BATCH_LLM_LABEL, so a failing batch does not trip the circuit
+    breaker or skew the latency stats of the interactive pages.
+    """
+    llm = llm or partial(chat_completion, hedge=False, endpoint=BATCH_LLM_LABEL)
+    done = completed_ids(output_path)
+    todo = [line for line in _read_jsonl(input_path) if line["custom_id"] not in done]
+    lock = threading.Lock()
+    counts = {"skipped": len(done), "succeeded": 0, "failed": 0}
+
+    def run_one(line, out):
+        body = line["body"]
+        result = {"id": f"local-{line['custom_id']}", "custom_id": line["custom_id"], "response": None, "error": None}
+        try:
+            text = llm(body["messages"][0]["content"], temperature=body.get("temperature", 0.2),
+                       max_tokens=body.get("max_tokens", DRAFT_MAX_TOKENS))
+            result["response"] = {"status_code": 200, "body": {
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+            }}
+        except Exception as e:
+            result["error"] = {"message": str(e)}
+        with lock:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            counts["failed" if result["error"] else "succeeded"] += 1
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(lambda line: run_one(line, out), todo))
+    return counts
+
+
+def ingest_batch_results(output_path, narratives_dir, store=None) -> dict:
+    """
+    Write each successful response to `<narratives_dir>/<custom_id>.txt`, and with a case `store`,
+    apply fix responses ("fix-<case_id>") to their cases (see apply_fix).
+    Cases already ingested are skipped, so ingestion can be re-run as result files grow.
+    """
+    from application_pages.page_draft_sar import label_ai_draft
+
+    os.makedirs(narratives_dir, exist_ok=True)
+    counts = {"ingested": 0, "already_ingested": 0, "errors": 0, "fixes_applied": 0}
+    for line in _read_jsonl(output_path):
+        if line.get("error") or not line.get("response") or line["response"].get("status_code") != 200:
+            counts["errors"] += 1
+            continue
+        target = os.path.join(narratives_dir, f"{line['custom_id']}.txt")
+        if os.path.exists(target):
+            counts["already_ingested"] += 1
+            continue
+        text = line["response"]["body"]["choices"][0]["message"]["content"].strip()
+        if line["custom_id"].startswith("draft-"):
+            text = label_ai_draft(text)
+        elif line["custom_id"].startswith("fix-") and store is not None:
+            # Before the file is written, so an interrupted ingest re-applies it (apply_fix skips duplicates)
+            counts["fixes_applied"] += apply_fix(store, line["custom_id"][len("fix-"):], text, line["custom_id"])
+        # Write-then-rename so a crash never leaves a half-written narrative behind
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(target + ".tmp", target)
+        counts["ingested"] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch SAR drafting via JSONL request/response files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("prepare", help="write one draft request per alert (synthetic data)")
+    p.add_argument("input")
+    p.add_argument("--limit", type=int, default=None)
+
+    p = sub.add_parser("prepare-fixes", help="write one fix request per saved case whose checklist failed")
+    p.add_argument("input")
+    p.add_argument("--case-store", default=None, help="case store database (default: SAR_CASE_STORE)")
+    p.add_argument("--limit", type=int, default=None)
+
+    p = sub.add_parser("submit", help="submit the request file to the provider batch endpoint")
+    p.add_argument("input")
+
+    p = sub.add_parser("run-local", help="process the request file locally (resumable)")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--concurrency", type=int, default=4)
+
+    p = sub.add_parser("status", help="show progress of a local run")
+    p.add_argument("input")
+    p.add_argument("output")
+
+    p = sub.add_parser("ingest", help="write per-case narratives from a result file")
+    p.add_argument("output")
+    p.add_argument("narratives_dir")
+    p.add_argument("--case-store", default=None, help="apply fix results to the cases in this case store")
+
+    args = parser.parse_args(argv)
+    if args.command == "prepare":
+        from application_pages.page_case_intake import load_synthetic_data
+        print(f"Wrote {write_draft_batch(load_synthetic_data(), args.input, args.limit)} requests to {args.input}")
+    elif args.command == "prepare-fixes":
+        from application_pages.case_store import CASE_STORE_PATH, CaseStore
+        count = write_fix_batch(failing_cases(CaseStore(args.case_store or CASE_STORE_PATH), args.limit), args.input)
+        print(f"Wrote {count} fix requests to {args.input}")
+    elif args.command == "submit":
+        batch = submit_batch(args.input)
+        print(f"Submitted batch {batch['id']} (status: {batch.get('status')})")
+    elif args.command == "run-local":
+        print(run_local_batch(args.input, args.output, concurrency=args.concurrency))
+    elif args.command == "status":
+        print(batch_progress(args.input, args.output))
+    elif args.command == "ingest":
+        from application_pages.case_store import CaseStore
+        store = CaseStore(args.case_store) if args.case_store else None
+        print(ingest_batch_results(args.output, args.narratives_dir, store))
+
+
+if __name__ == "__main__":
+    main()
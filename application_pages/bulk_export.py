@@ -0,0 +1,336 @@
+"""
+Bulk export of finished SAR cases from the case store.
+
+Usage (from the repository root):
+
+    python -m application_pages.bulk_export sample [--limit N]
+    python -m application_pages.bulk_export run OUTPUT_DIR [CASE_ID ...] [--status checked] [--analyst ID]
+                                                [--workers N] [--formats json,csv,txt,pdf]
+
+Without case IDs, `run` exports every case whose status is one of FINISHED_STATUSES (or --status).
+Each case's bundle is built the way the Export & Audit page builds it (final narrative, facts,
+checklist report and the case's audit trail) and written to OUTPUT_DIR/<case_id>/ as JSON, CSV
+(audit trail), TXT (narrative) and PDF. Cases are sent to a process pool in chunks; each worker
+opens the case store and sets up its PDF renderer once, and writes its cases' files itself, so only
+file names and checksums come back to the parent.
+
+OUTPUT_DIR/manifest.json lists every file with its size and sha256, the cases that could not be
+exported and the job's throughput; OUTPUT_DIR/SHA256SUMS has the same checksums for `sha256sum -c`.
+The parent logs one "Export prepared" audit event per exported case, carrying the checksum of its
+JSON bundle, and saves the case back to the store as exported with that event added to its audit
+trail (so the next run skips it unless asked for "exported" cases); workers never write to the
+audit log or the store. The CLI may run while the app is logging to the
+same file: appends from both processes are serialized by the log's file lock (see audit_log.py).
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import pandas as pd
+
+from application_pages.audit_log import get_audit_log
+from application_pages.case_store import (
+    CASE_STORE_PATH, CaseStore, case_status, decode_case_state, encode_case_state, get_case_store,
+)
+from application_pages.page_export_audit import export_sar_data
+from application_pages.pdf_renderer import get_pdf_renderer, needs_scalable_layout
+
+# ---- Tunables ----
+BULK_EXPORT_DIR = os.getenv("SAR_BULK_EXPORT_DIR", "sar_exports")
+EXPORT_CHUNK_SIZE = int(os.getenv("SAR_EXPORT_CHUNK_SIZE", "8"))   # cases per task sent to a worker
+EXPORT_MAX_PENDING = 2                                             # queued chunks per worker
+EXPORT_FORMATS = ("json", "csv", "txt", "pdf")
+FINISHED_STATUSES = ("checked",)   # checked and not exported yet; add "exported" to re-export
+CASE_QUERY_LIMIT = 1_000_000   # cases selected per status
+
+FILE_NAMES = {"json": "SAR_export.json", "csv": "SAR_audit_trail.csv", "txt": "SAR_narrative.txt",
+              "pdf": "SAR_report.pdf"}
+
+
+def final_narrative(state) -> str:
+    """The narrative the Export & Audit page exports: the latest of fix, analyst edit and AI draft."""
+    return state.get("fixed_narrative") or state.get("analyst_edited_narrative") or state.get("ai_draft_narrative")
+
+
+def case_bundle(state) -> dict:
+    """Export bundle of a saved case. Raises ValueError when the case is not ready to export."""
+    narrative = final_narrative(state)
+    if not narrative:
+        raise ValueError("no narrative drafted")
+    if not state.get("selected_facts"):
+        raise ValueError("no facts selected")
+    report = state.get("compliance_checklist_results")
+    if not isinstance(report, dict) or not report:
+        raise ValueError("compliance checklist not run")
+    return export_sar_data(narrative, list(state["selected_facts"]), report, list(state.get("audit_trail") or []))
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_case(case_id: str, state, out_dir: str, formats=EXPORT_FORMATS) -> dict:
+    """Write one case's files to out_dir/<case_id>/. Returns the case's manifest entry."""
+    bundle = case_bundle(state)
+    case_dir = os.path.join(out_dir, case_id)
+    os.makedirs(case_dir, exist_ok=True)
+    files = []
+
+    def write(fmt, data: bytes):
+        path = os.path.join(case_dir, FILE_NAMES[fmt])
+        with open(path, "wb") as f:
+            f.write(data)
+        files.append({"file": f"{case_id}/{FILE_NAMES[fmt]}", "bytes": len(data),
+                      "sha256": hashlib.sha256(data).hexdigest()})
+
+    if "json" in formats:
+        write("json", json.dumps(bundle, indent=2, default=str).encode("utf-8"))
+    if "csv" in formats:
+        write("csv", pd.DataFrame(bundle["audit_trail"]).to_csv(index=False).encode("utf-8"))
+    if "txt" in formats:
+        write("txt", bundle["narrative"].encode("utf-8"))
+    if "pdf" in formats:
+        renderer = get_pdf_renderer()
+        if needs_scalable_layout(bundle):
+            path = renderer.render_to_file(bundle, path=os.path.join(case_dir, FILE_NAMES["pdf"]))
+            files.append({"file": f"{case_id}/{FILE_NAMES['pdf']}", "bytes": os.path.getsize(path),
+                          "sha256": _sha256_file(path)})
+        else:
+            write("pdf", renderer.build(bundle))
+    return {
+        "case_id": case_id,
+        "overall": bool(bundle["checklist_report"].get("overall")),
+        "chars": len(bundle["narrative"]),
+        "files": files,
+    }
+
+
+_worker_store = None
+
+
+def _store(path: str) -> CaseStore:
+    # One connection per worker process: an SQLite connection must not cross a fork
+    global _worker_store
+    if _worker_store is None or _worker_store[0] != (os.getpid(), path):
+        _worker_store = ((os.getpid(), path), CaseStore(path))
+    return _worker_store[1]
+
+
+def _export_chunk(case_ids, store_path, out_dir, formats):
+    store = _store(store_path)
+    results = []
+    for case_id in case_ids:
+        try:
+            found = store.load(case_id)
+            if found is None:
+                raise ValueError("no such case")
+            row, blob = found
+            result = export_case(case_id, decode_case_state(blob), out_dir, formats)
+            result["analyst_id"] = row["analyst"]
+        except Exception as e:
+            result = {"case_id": case_id, "error": f"{type(e).__name__}: {e}"}
+        results.append(result)
+    return results
+
+
+def mark_exported(store: CaseStore, case_id: str, record: dict) -> None:
+    """Save a case as exported, with the audit `record` of its export added to its trail."""
+    found = store.load(case_id)
+    if found is None:
+        return
+    row, blob = found
+    state = decode_case_state(blob)
+    state["audit_trail"] = [*(state.get("audit_trail") or []), {k: v for k, v in record.items() if k != "prev_hash"}]
+    state["case_exported"] = True
+    store.save(case_id, encode_case_state(state), case_status(state), customer_id=row["customer_id"],
+               alert_id=row["alert_id"], analyst=row["analyst"])
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def finished_case_ids(store: CaseStore, statuses=FINISHED_STATUSES, analyst=None) -> list:
+    """IDs of the cases in any of `statuses` (optionally one analyst's), most recently updated first."""
+    ids = []
+    for status in statuses:
+        ids.extend(c["case_id"] for c in store.find(analyst=analyst, status=status, limit=CASE_QUERY_LIMIT))
+    return list(dict.fromkeys(ids))
+
+
+def run_bulk_export(case_ids, out_dir: str = BULK_EXPORT_DIR, store_path: str = CASE_STORE_PATH,
+                    workers: int = None, chunk_size: int = EXPORT_CHUNK_SIZE, formats=EXPORT_FORMATS,
+                    analyst_id: str = None, on_progress=None) -> dict:
+    """
+    Export `case_ids` from the case store at `store_path` into `out_dir` and write its manifest.
+
+    At most `workers * EXPORT_MAX_PENDING` chunks are in flight. `analyst_id` is recorded on the
+    audit events (default: each case's analyst); `on_progress(done, total)` is called after each
+    chunk.
+
+    Returns:
+        dict: the manifest's job summary (cases exported and failed, files, bytes, elapsed seconds,
+        cases and megabytes per second).
+    """
+    case_ids = list(dict.fromkeys(case_ids))
+    formats = tuple(f for f in EXPORT_FORMATS if f in formats)
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    job_id = f"bulk-{datetime.now():%Y%m%d_%H%M%S}"
+    audit_log = get_audit_log()
+    store = get_case_store(store_path)
+    exported, errors = [], []
+
+    def consume(results):
+        for result in results:
+            if "error" in result:
+                errors.append(result)
+                continue
+            exported.append(result)
+            json_file = next((f for f in result["files"] if f["file"].endswith(".json")), None)
+            record = audit_log.emit(
+                "Export prepared", case_id=result["case_id"], analyst_id=analyst_id or result["analyst_id"],
+                status="PASS" if result["overall"] else "FAIL", chars=result["chars"], bulk_export=job_id,
+                **({"sha256": json_file["sha256"]} if json_file else {}),
+            )
+            mark_exported(store, result["case_id"], record)
+        if on_progress:
+            on_progress(len(exported) + len(errors), len(case_ids))
+
+    start = time.perf_counter()
+    if workers == 1:
+        for chunk in _chunks(case_ids, chunk_size):
+            consume(_export_chunk(chunk, store_path, out_dir, formats))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in _chunks(case_ids, chunk_size):
+                pending.append(pool.submit(_export_chunk, chunk, store_path, out_dir, formats))
+                if len(pending) >= workers * EXPORT_MAX_PENDING:
+                    consume(pending.pop(0).result())
+            for future in pending:
+                consume(future.result())
+    elapsed = time.perf_counter() - start
+
+    files = [dict(f, case_id=r["case_id"]) for r in exported for f in r["files"]]
+    total_bytes = sum(f["bytes"] for f in files)
+    job = {
+        "job_id": job_id,
+        "created": datetime.now().isoformat(sep=" ", timespec="seconds"),
+        "case_store": os.path.abspath(store_path),
+        "formats": list(formats),
+        "workers": workers,
+        "cases": len(case_ids),
+        "exported": len(exported),
+        "failed": len(errors),
+        "files": len(files),
+        "bytes": total_bytes,
+        "elapsed_s": round(elapsed, 3),
+        "cases_per_s": round(len(exported) / elapsed, 1) if elapsed else None,
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else None,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"job": job, "files": files, "errors": errors}, f, indent=2)
+    with open(os.path.join(out_dir, "SHA256SUMS"), "w", encoding="utf-8") as f:
+        f.writelines(f"{entry['sha256']}  {entry['file']}\n" for entry in files)
+    audit_log.flush()
+    return job
+
+
+def verify_export(out_dir: str) -> list:
+    """Files of an export whose size or sha256 no longer matches its manifest (missing files included)."""
+    with open(os.path.join(out_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    mismatched = []
+    for entry in manifest["files"]:
+        path = os.path.join(out_dir, entry["file"])
+        if not os.path.exists(path) or os.path.getsize(path) != entry["bytes"] or _sha256_file(path) != entry["sha256"]:
+            mismatched.append(entry["file"])
+    return mismatched
+
+
+def write_sample_cases(data, store: CaseStore, limit: int = None, analyst: str = "AML_Analyst_001") -> int:
+    """Save checked cases (template draft and checklist report) for the synthetic alerts to `store`."""
+    from application_pages.compliance_rules import run_compliance_checklist
+    from application_pages.prefetch import build_alert_prompt, prioritized_alerts
+    from application_pages.template_draft import render_template_draft
+    from application_pages.version_store import VersionStore
+
+    alerts = prioritized_alerts(data['alerts'], data['customers'])
+    if limit is not None:
+        alerts = alerts.head(limit)
+    count = 0
+    for alert in alerts.to_dict('records'):
+        facts, five_ws, _ = build_alert_prompt(data, alert)
+        narrative = render_template_draft(facts, five_ws)
+        case_id = f"alert-{alert['alert_id']}"
+        versions = VersionStore()
+        versions.commit(narrative, "template")
+        state = {
+            "selected_facts": facts, "extracted_5ws": five_ws, "ai_draft_narrative": narrative,
+            "narrative_versions": versions,
+            "compliance_checklist_results": run_compliance_checklist(narrative, five_ws, selected_facts=facts),
+            "audit_trail": [{"timestamp": datetime.now().isoformat(sep=" ", timespec="seconds"),
+                             "event": "AI draft generated", "case_id": case_id, "analyst_id": analyst,
+                             "mode": "template"}],
+        }
+        store.save(case_id, encode_case_state(state), case_status(state), customer_id=alert['customer_id'],
+                   alert_id=alert['alert_id'], analyst=analyst)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export finished SAR cases in bulk.")
+    parser.add_argument("--case-store", default=CASE_STORE_PATH, help="case store database (default: SAR_CASE_STORE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sample", help="save checked template cases for the synthetic alerts to the case store")
+    p.add_argument("--limit", type=int, default=None)
+
+    p = sub.add_parser("run", help="export cases to a directory with a manifest")
+    p.add_argument("output", nargs="?", default=BULK_EXPORT_DIR)
+    p.add_argument("case_ids", nargs="*", help="cases to export (default: all finished cases not exported yet)")
+    p.add_argument("--status", action="append", default=None,
+                   help=f"case status to export when no IDs are given (repeatable; default: {', '.join(FINISHED_STATUSES)})")
+    p.add_argument("--analyst", default=None, help="only this analyst's cases when no IDs are given")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    p.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    p.add_argument("--formats", default=",".join(EXPORT_FORMATS), help="comma-separated subset of json,csv,txt,pdf")
+
+    p = sub.add_parser("verify", help="check an export directory against its manifest")
+    p.add_argument("output", nargs="?", default=BULK_EXPORT_DIR)
+
+    args = parser.parse_args(argv)
+    if args.command == "sample":
+        from application_pages.page_case_intake import load_synthetic_data
+        count = write_sample_cases(load_synthetic_data(), CaseStore(args.case_store), args.limit)
+        print(f"Saved {count} checked cases to {args.case_store}")
+    elif args.command == "run":
+        case_ids = args.case_ids or finished_case_ids(CaseStore(args.case_store), args.status or FINISHED_STATUSES,
+                                                      analyst=args.analyst)
+        job = run_bulk_export(case_ids, args.output, store_path=args.case_store, workers=args.workers,
+                              chunk_size=args.chunk_size, formats=args.formats.split(","))
+        print(json.dumps(job, indent=2))
+    elif args.command == "verify":
+        mismatched = verify_export(args.output)
+        print("\n".join(f"MISMATCH {name}" for name in mismatched) or "All files match the manifest.")
+        raise SystemExit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Persistent case workspace: the state of each SAR case, saved to an embedded SQLite database so a
+case can be closed and resumed later.
+
+One row per case. The searchable fields (customer, alert, analyst, status, timestamps) are plain
+indexed columns; everything else the pages keep in st.session_state for the case (selected facts,
+5Ws, drafts, the narrative version history, checklist results, sign-off and audit trail) is one
+compressed binary blob. Reopening a case is a primary-key lookup and one decompression, independent
+of how many cases are stored.
+
+Blob layout (zlib-compressed): a 4-byte header length, a JSON header, then column buffers. Lists of
+records (selected facts, audit trail) are stored column by column: integer, float and timestamp
+columns as little-endian int64/float64 arrays, other columns as JSON lists in the header, so facts
+come back with the same types they were saved with.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from application_pages.version_store import VersionStore
+
+# ---- Tunables ----
+CASE_STORE_PATH = os.getenv("SAR_CASE_STORE", "sar_cases.sqlite3")
+DEFAULT_ANALYST_ID = os.getenv("SAR_ANALYST_ID", "AML_Analyst_001")
+CASE_LIST_LIMIT = 200          # cases listed by the sidebar search
+
+# Session keys saved with a case, and the record lists among them stored column by column
+CASE_STATE_KEYS = (
+    "selected_facts", "extracted_5ws", "ai_draft_narrative", "human_edited_narrative",
+    "analyst_edited_narrative", "fixed_narrative", "compliance_checklist_results",
+    "sign_off_details", "audit_trail", "rule_pack", "case_exported",
+)
+TABLE_KEYS = ("selected_facts", "audit_trail")
+# Session keys of a prepared export (Export & Audit page); never saved, dropped when the case changes
+EXPORT_STATE_KEYS = ("export_ready", "export_files", "pdf_generation_success", "apply_fixed_narrative")
+CASE_STATUSES = ("open", "drafted", "in_review", "checked", "exported")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    case_id     TEXT PRIMARY KEY,
+    customer_id TEXT,
+    alert_id    TEXT,
+    analyst     TEXT,
+    status      TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    state       BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_customer ON cases (customer_id, updated_at);
+CREATE INDEX IF NOT EXISTS cases_alert ON cases (alert_id);
+CREATE INDEX IF NOT EXISTS cases_analyst ON cases (analyst, updated_at);
+CREATE INDEX IF NOT EXISTS cases_analyst_status ON cases (analyst, status, updated_at);
+CREATE INDEX IF NOT EXISTS cases_status ON cases (status, updated_at);
+CREATE INDEX IF NOT EXISTS cases_updated ON cases (updated_at);
+"""
+
+
+# ---------- blob encoding ----------
+def _column_kind(values: list) -> str:
+    present = [v for v in values if v is not None]
+    if not present:
+        return "json"
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_)) for v in present):
+        return "i8"
+    if all(isinstance(v, (float, np.floating)) for v in present):
+        return "f8"
+    if all(isinstance(v, pd.Timestamp) and v.tzinfo is None and not pd.isna(v) for v in present):
+        return "ts"
+    return "json"
+
+
+def _encode_table(rows: list, buffers: list, offset: int):
+    """Header entry for a list of dicts, appending its binary columns to `buffers`."""
+    names = list(dict.fromkeys(k for row in rows for k in row))
+    # Key order of each row, as indexes into `names`, so records come back with their keys in order
+    position = {name: n for n, name in enumerate(names)}
+    layouts = list(dict.fromkeys(tuple(position[k] for k in row) for row in rows))
+    layout_of = {layout: n for n, layout in enumerate(layouts)}
+    columns = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        kind = _column_kind(values)
+        column = {"name": name, "kind": kind}
+        if kind == "json":
+            column["values"] = values
+        else:
+            nulls = [n for n, v in enumerate(values) if v is None and name in rows[n]]
+            if nulls:
+                column["nulls"] = nulls
+            if kind == "ts":
+                array = np.array([0 if v is None else v.value for v in values], dtype="<i8")
+            else:
+                array = np.array([0 if v is None else v for v in values], dtype="<" + kind)
+            raw = array.tobytes()
+            column["offset"], column["size"] = offset, len(raw)
+            buffers.append(raw)
+            offset += len(raw)
+        columns.append(column)
+    return {"rows": len(rows), "columns": columns, "layouts": layouts,
+            "layout": [layout_of[tuple(position[k] for k in row)] for row in rows]}, offset
+
+
+def _decode_table(table: dict, body: bytes) -> list:
+    columns = []
+    for column in table["columns"]:
+        kind, nulls = column["kind"], set(column.get("nulls", ()))
+        if kind == "json":
+            values = column["values"]
+        else:
+            array = np.frombuffer(body, dtype="<i8" if kind == "ts" else "<" + kind,
+                                  count=table["rows"], offset=column["offset"])
+            convert = pd.Timestamp if kind == "ts" else int if kind == "i8" else float
+            values = [None if n in nulls else convert(x.item()) for n, x in enumerate(array)]
+        columns.append((column["name"], values))
+    layouts = table["layouts"]
+    return [{columns[c][0]: columns[c][1][n] for c in layouts[layout]} for n, layout in enumerate(table["layout"])]
+
+
+def encode_case_state(state) -> bytes:
+    """Compressed blob of the case keys in `state` (a dict or st.session_state)."""
+    header, buffers, offset = {"values": {}, "tables": {}}, [], 0
+    for key in CASE_STATE_KEYS:
+        if key not in state:
+            continue
+        value = state[key]
+        if key in TABLE_KEYS and isinstance(value, list) and all(isinstance(r, dict) for r in value):
+            header["tables"][key], offset = _encode_table(value, buffers, offset)
+        else:
+            header["values"][key] = value
+    versions = state.get("narrative_versions")
+    if isinstance(versions, VersionStore):
+        header["narrative_versions"] = versions.to_dict()
+    head = json.dumps(header, default=str, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(struct.pack("<I", len(head)) + head + b"".join(buffers))
+
+
+def decode_case_state(blob: bytes) -> dict:
+    """Case keys and values from a blob made by encode_case_state."""
+    raw = zlib.decompress(blob)
+    (size,) = struct.unpack_from("<I", raw)
+    header = json.loads(raw[4:4 + size])
+    body = raw[4 + size:]
+    state = dict(header["values"])
+    for key, table in header["tables"].items():
+        state[key] = _decode_table(table, body)
+    state["narrative_versions"] = VersionStore.from_dict(header.get("narrative_versions", {}))
+    return state
+
+
+def case_status(state) -> str:
+    """Workflow stage of a case, from what its state contains."""
+    if state.get("case_exported"):   # saved with the case: later changes do not undo an export
+        return "exported"
+    if isinstance(state.get("compliance_checklist_results"), dict) and state["compliance_checklist_results"]:
+        return "checked"
+    versions = state.get("narrative_versions")
+    if isinstance(versions, VersionStore) and len(versions) > 1:
+        return "in_review"
+    if state.get("ai_draft_narrative"):
+        return "drafted"
+    return "open"
+
+
+# ---------- store ----------
+class CaseStore:
+    """Thread-safe SQLite case store (one connection shared by the sessions of the process)."""
+
+    def __init__(self, path: str = CASE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, case_id: str, blob: bytes, status: str, customer_id=None, alert_id=None, analyst=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cases (case_id, customer_id, alert_id, analyst, status, created_at, updated_at, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(case_id) DO UPDATE SET "
+                "customer_id=excluded.customer_id, alert_id=excluded.alert_id, analyst=excluded.analyst, "
+                "status=excluded.status, updated_at=excluded.updated_at, state=excluded.state",
+                (case_id, _text(customer_id), _text(alert_id), analyst, status, now, now, blob),
+            )
+
+    def load(self, case_id: str):
+        """(row dict, blob) of a case, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT case_id, customer_id, alert_id, analyst, status, created_at, updated_at, state "
+                "FROM cases WHERE case_id = ?", (case_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("case_id", "customer_id", "alert_id", "analyst", "status", "created_at", "updated_at"), row)), row[7]
+
+    def find(self, customer_id=None, alert_id=None, analyst=None, status=None, limit: int = CASE_LIST_LIMIT) -> list:
+        """Most recently updated cases matching every given field (each served by an index)."""
+        where, params = [], []
+        for column, value in (("customer_id", customer_id), ("alert_id", alert_id), ("analyst", analyst), ("status", status)):
+            if value not in (None, ""):
+                where.append(f"{column} = ?")
+                params.append(_text(value))
+        sql = "SELECT case_id, customer_id, alert_id, analyst, status, created_at, updated_at FROM cases"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit)).fetchall()
+        return [dict(zip(("case_id", "customer_id", "alert_id", "analyst", "status", "created_at", "updated_at"), r))
+                for r in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_case_store(path: str = CASE_STORE_PATH) -> CaseStore:
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CaseStore(path)
+        return _stores[path]
+
+
+# ---------- session helpers ----------
+def discard_export(state) -> None:
+    """Drop the session's prepared export, removing the temp file of a scalable-layout PDF."""
+    pdf_path = (state.get("export_files") or {}).get("pdf_path")
+    if pdf_path:
+        try:
+            os.remove(pdf_path)
+        except OSError:
+            pass
+    for key in EXPORT_STATE_KEYS:
+        if key in state:
+            del state[key]
+
+
+def case_id_for(customer_id, alert_id=None) -> str:
+    """Case identifier, in the form batch_audit uses ("alert-<id>"); customer-based without an alert."""
+    return f"alert-{alert_id}" if alert_id is not None else f"customer-{customer_id}"
+
+
+def autosave_case(state, store: CaseStore = None) -> bool:
+    """Save the session's case if its state changed since the last save. Returns True if written."""
+    case_id = state.get("case_id")
+    if not case_id:
+        return False
+    blob = encode_case_state(state)
+    digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+    if state.get("case_saved_digest") == (case_id, digest):
+        return False
+    (get_case_store() if store is None else store).save(case_id, blob, case_status(state), customer_id=state.get("case_customer_id"),
+                                     alert_id=state.get("case_alert_id"), analyst=state.get("analyst_id"))
+    state["case_saved_digest"] = (case_id, digest)
+    return True
+
+
+def open_case(state, case_id: str, store: CaseStore = None) -> bool:
+    """Replace the session's case state with a saved case. False if there is no such case."""
+    found = (get_case_store() if store is None else store).load(case_id)
+    if found is None:
+        return False
+    row, blob = found
+    for key in CASE_STATE_KEYS:
+        if key in state:
+            del state[key]
+    discard_export(state)
+    for key, value in decode_case_state(blob).items():
+        state[key] = value
+    if row["status"] == "exported":
+        state["case_exported"] = True   # cases saved before the flag was part of the state
+    state["case_id"] = case_id
+    state["case_customer_id"] = row["customer_id"]
+    state["case_alert_id"] = row["alert_id"]
+    state["case_saved_digest"] = (case_id, hashlib.blake2b(blob, digest_size=16).hexdigest())
+    return True
+
+
+def switch_case(state, customer_id, alert_id=None, store: CaseStore = None) -> None:
+    """
+    Make (customer_id, alert_id) the session's case. The previous case has already been autosaved;
+    a case saved before is resumed, a new one starts with no drafts.
+    """
+    case_id = case_id_for(customer_id, alert_id)
+    if state.get("case_id") == case_id:
+        return
+    had_case = bool(state.get("case_id"))
+    if not open_case(state, case_id, store):
+        if had_case:
+            for key in CASE_STATE_KEYS:
+                if key in state and key != "rule_pack":
+                    del state[key]
+            discard_export(state)
+            state["ai_draft_narrative"] = ""
+            state["analyst_edited_narrative"] = ""
+            state["compliance_checklist_results"] = []
+            state["audit_trail"] = []
+            state["narrative_versions"] = VersionStore()
+        state["case_id"] = case_id
+        state["case_customer_id"] = _text(customer_id)
+        state["case_alert_id"] = _text(alert_id)
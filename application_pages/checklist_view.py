@@ -0,0 +1,131 @@
+"""
+Pre-rendered HTML view of a compliance checklist report.
+
+The whole checklist (status header, one row per item with its badge and remediation, and the
+narrative with the offending spans highlighted) is built as a single HTML string, so the page
+emits one element however many rules the pack has. Styling is one shared stylesheet of classes
+rather than inline styles repeated on every row.
+
+Rendered views are cached by a hash of the report and narrative. The same report therefore
+produces byte-identical HTML on every rerun, which also lets Streamlit's message cache send
+only a reference for it once it exceeds the cache's minimum message size.
+"""
+import hashlib
+import html
+import json
+import threading
+from collections import OrderedDict
+
+# ---- Tunables ----
+VIEW_CACHE_SIZE = 64          # rendered views kept in memory (least recently used are evicted)
+MAX_HIGHLIGHT_CHARS = 20000   # longer narratives are shown without the highlighted copy
+
+_STYLE = """<style>
+.sar-ck{font-family:inherit;font-size:0.95rem}
+.sar-ck .hd{margin:0 0 4px;font-size:1.05rem}
+.sar-ck .sub{color:#9ca3af;font-size:0.85rem;margin-bottom:8px}
+.sar-ck .row{display:grid;grid-template-columns:2rem 1fr 1fr;gap:8px;align-items:center;margin:6px 0}
+.sar-ck .ck{font-size:1.2rem;text-align:center}
+.sar-ck .bd{border-radius:6px;padding:8px 10px;font-weight:600;display:inline-block}
+.sar-ck .pass .bd{background:#dcfce7;border:1px solid #22c55e;color:#065f46}
+.sar-ck .fail .bd{background:#fee2e2;border:1px solid #ef4444;color:#7f1d1d}
+.sar-ck .rem{background:#b86600;border-left:4px solid #f59e0b;padding:8px 10px;border-radius:4px;white-space:pre-wrap}
+.sar-ck .ok{color:#aaf0dc}
+.sar-ck details{margin-top:10px}
+.sar-ck .txt{white-space:pre-wrap;border:1px solid #374151;border-radius:6px;padding:10px;line-height:1.5}
+.sar-ck mark{background:#fde68a;color:#111827;border-radius:3px;padding:0 1px}
+</style>"""
+
+
+def report_digest(report: dict, narrative: str = "") -> str:
+    """Stable hash of a report and the narrative it was computed on."""
+    data = json.dumps(report, sort_keys=True, default=str) + "\0" + (narrative or "")
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def item_spans(item: dict) -> list:
+    """(start, end) offsets into the narrative reported in a failed item's details."""
+    if item.get("passed"):
+        return []
+    spans = []
+    for value in (item.get("details") or {}).values():
+        if isinstance(value, list):
+            spans.extend((v["start"], v["end"]) for v in value
+                         if isinstance(v, dict) and isinstance(v.get("start"), int) and isinstance(v.get("end"), int))
+    return spans
+
+
+def _highlight(narrative: str, labelled_spans: list) -> str:
+    """Escaped narrative with overlapping spans merged into one <mark> each (titled with their items)."""
+    merged = []  # [start, end, labels]
+    for start, end, label in sorted(labelled_spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+            if label not in merged[-1][2]:
+                merged[-1][2].append(label)
+        else:
+            merged.append([start, end, [label]])
+    parts, pos = [], 0
+    for start, end, labels in merged:
+        parts.append(html.escape(narrative[pos:start]))
+        parts.append(f'<mark title="{html.escape("; ".join(labels))}">{html.escape(narrative[start:end])}</mark>')
+        pos = end
+    parts.append(html.escape(narrative[pos:]))
+    return "".join(parts)
+
+
+def _render(report: dict, narrative: str) -> str:
+    counts = report.get("five_ws_counts", {})
+    parts = [
+        _STYLE,
+        '<div class="sar-ck">',
+        '<div class="hd"><b>Overall Status:</b> ' + ("✅ <b>PASS</b>" if report["overall"] else "❌ <b>FAIL</b>") + "</div>",
+        '<div class="sub">5Ws Counts — '
+        + ", ".join(f"{w}: {counts.get(w, 0)}" for w in ("Who", "What", "When", "Where", "Why"))
+        + f" | Narrative length: {report['length']} chars</div>",
+    ]
+    labelled_spans = []
+    for item in report["items"]:
+        passed = item["passed"]
+        label = html.escape(item["label"])
+        remediation = (f'<div class="rem"><b>Remediation:</b> {html.escape(item["remediation"])}</div>'
+                       if not passed else '<div class="ok">—</div>')
+        parts.append(
+            f'<div class="row {"pass" if passed else "fail"}">'
+            f'<div class="ck">{"☑" if passed else "☐"}</div>'
+            f'<div><span class="bd">{"PASS" if passed else "FAIL"} — {label}</span></div>'
+            f"{remediation}</div>"
+        )
+        labelled_spans.extend((s, e, item["label"]) for s, e in item_spans(item))
+
+    if labelled_spans and narrative and len(narrative) <= MAX_HIGHLIGHT_CHARS:
+        parts.append(
+            f"<details open><summary>Flagged text ({len(labelled_spans)} highlight"
+            f'{"s" if len(labelled_spans) != 1 else ""})</summary>'
+            f'<div class="txt">{_highlight(narrative, labelled_spans)}</div></details>'
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+_views = OrderedDict()   # report digest -> rendered HTML, shared by every session of the process
+_views_lock = threading.Lock()
+
+
+def render_checklist_html(report: dict, narrative: str = "") -> str:
+    """
+    The checklist for `report` as one HTML fragment (built once per distinct report and narrative).
+    Pass the checked `narrative` to include it with the failing spans highlighted.
+    """
+    key = report_digest(report, narrative)
+    with _views_lock:
+        cached = _views.get(key)
+        if cached is not None:
+            _views.move_to_end(key)
+            return cached
+    rendered = _render(report, narrative or "")
+    with _views_lock:
+        _views[key] = rendered
+        while len(_views) > VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return rendered
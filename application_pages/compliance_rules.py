@@ -0,0 +1,337 @@
+"""
+Compliance checklist rules and an incremental runner.
+
+Rules are built from rule packs (see rule_packs.py) by the factories in RULE_TYPES. Each rule
+declares the inputs it reads ("narrative", "five_ws", "selected_facts") and the rules it depends
+on. `IncrementalChecklist` hashes those inputs on every run and re-evaluates only the rules whose
+inputs changed, which keeps the live checklist on the Compliance page cheap while the analyst
+edits the narrative. This module has no Streamlit dependency so the same rules can be used from
+scripts and worker processes.
+"""
+import hashlib
+import json
+import time
+
+from application_pages.fact_consistency import FactIndex, verify_narrative
+
+REQUIRED_5WS = ["Who", "What", "When", "Where", "Why"]
+
+
+class ComplianceRule:
+    """
+    One checklist item.
+
+    `evaluate` is called with the declared inputs as keyword arguments and returns the item's
+    passed flag, remediation text and (optionally) details. Rules listed in `depends_on` are
+    evaluated first; if any of them fails, this rule is reported as not checked.
+    """
+
+    def __init__(self, key: str, label: str, inputs, evaluate, depends_on=()):
+        self.key = key
+        self.label = label
+        self.inputs = tuple(inputs)
+        self.evaluate = evaluate
+        self.depends_on = tuple(depends_on)
+
+    def run(self, inputs: dict) -> dict:
+        result = self.evaluate(**{name: inputs[name] for name in self.inputs})
+        return {"key": self.key, "label": self.label, **result}
+
+    def not_checked(self, failed_labels) -> dict:
+        return {
+            "key": self.key,
+            "label": self.label,
+            "passed": False,
+            "remediation": "Not checked until these items pass: " + ", ".join(failed_labels) + ".",
+            "details": {"skipped": True},
+        }
+
+
+def normalize_inputs(narrative: str, extracted_5ws: dict, selected_facts=None) -> dict:
+    five_ws = extracted_5ws or {}
+    return {
+        "narrative": narrative or "",
+        "five_ws": {k: (v or []) for k, v in five_ws.items()},
+        "selected_facts": selected_facts,
+    }
+
+
+def _digest(value) -> str:
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# Fact lists are replaced rather than mutated when the case changes, so the last list object
+# identifies its index; holding a reference keeps its id from being reused.
+_last_fact_index = (None, None)
+
+
+def _index_for(selected_facts) -> FactIndex:
+    """FactIndex for the facts, rebuilt only when a different fact list is passed."""
+    global _last_fact_index
+    facts, index = _last_fact_index
+    if facts is not selected_facts:
+        index = FactIndex(selected_facts)
+        _last_fact_index = (selected_facts, index)
+    return index
+
+
+def _describe(mentions, limit=5):
+    shown = ", ".join(m["text"] for m in mentions[:limit])
+    return shown + (f" (+{len(mentions) - limit} more)" if len(mentions) > limit else "")
+
+
+# ---- Rule factories ----
+# Each factory receives the rule's key, formatted label, params, remediation template (None for the
+# default text), the pack's shared compiled resources and the rule's dependencies.
+
+def make_five_ws_rule(key, label, params, remediation, shared, depends_on=()):
+    required = list(params.get("required", REQUIRED_5WS))
+    template = remediation or (
+        "Add missing elements — {missing}.\n"
+        "- Who: legal names, account numbers/IDs.\n"
+        "- What: type of suspicious activity, amounts.\n"
+        "- When: specific dates/times (ISO format preferred).\n"
+        "- Where: locations (branches, cities, countries).\n"
+        "- Why: objective rationale (alerts/rules triggered, patterns)."
+    )
+
+    def evaluate(five_ws):
+        missing = [k for k in required if len(five_ws.get(k, [])) == 0]
+        return {"passed": not missing, "remediation": template.format(missing=", ".join(missing)) if missing else ""}
+
+    return ComplianceRule(key, label, ["five_ws"], evaluate, depends_on)
+
+
+def make_chronology_rule(key, label, params, remediation, shared, depends_on=()):
+    template = remediation or (
+        "Dates out of order: {out_of_order}. "
+        "Reorder events by timestamp (earliest → latest) and ensure dates are parseable. "
+        "Include a brief timeline summary. If multiple same-day events, add times (HH:MM)."
+    )
+
+    def evaluate(narrative):
+        out_of_order = verify_narrative(narrative)["out_of_order"]
+        listed = "; ".join(f"{m['text']} after {m['previous']}" for m in out_of_order[:5])
+        return {
+            "passed": not out_of_order,
+            "remediation": template.format(out_of_order=listed) if out_of_order else "",
+            "details": {"out_of_order": out_of_order},
+        }
+
+    return ComplianceRule(key, label, ["narrative"], evaluate, depends_on)
+
+
+def make_facts_supported_rule(key, label, params, remediation, shared, depends_on=()):
+    template = remediation or (
+        "{problems} Cite amounts and dates exactly as they appear in the case facts, "
+        "or describe aggregates explicitly (e.g. \"totaling\")."
+    )
+
+    def evaluate(narrative, selected_facts):
+        if selected_facts is None:
+            return {"passed": True, "remediation": "", "details": {"checked": False}}
+        result = verify_narrative(narrative, index=_index_for(selected_facts))
+        amounts, dates = result["unsupported_amounts"], result["unsupported_dates"]
+        problems = []
+        if amounts:
+            problems.append("Amounts not found in the selected facts: " + _describe(amounts) + ".")
+        if dates:
+            problems.append("Dates not found in the selected facts: " + _describe(dates) + ".")
+        return {
+            "passed": not problems,
+            "remediation": template.format(problems=" ".join(problems)) if problems else "",
+            "details": {"checked": True, "unsupported_amounts": amounts, "unsupported_dates": dates,
+                        "amounts_checked": result["amounts_checked"], "dates_checked": result["dates_checked"]},
+        }
+
+    return ComplianceRule(key, label, ["narrative", "selected_facts"], evaluate, depends_on)
+
+
+def make_min_length_rule(key, label, params, remediation, shared, depends_on=()):
+    minimum = int(params["min"])
+    template = remediation or (
+        "Expand with concrete facts: who did what, when, where, why it’s suspicious. "
+        "Use short sentences; reduce jargon; prefer specific amounts/dates over generalities."
+    )
+
+    def evaluate(narrative):
+        length = len(narrative.strip())
+        passed = length > minimum
+        return {"passed": passed, "remediation": template.format(length=length) if not passed else ""}
+
+    return ComplianceRule(key, label, ["narrative"], evaluate, depends_on)
+
+
+def make_length_bounds_rule(key, label, params, remediation, shared, depends_on=()):
+    minimum, maximum = int(params["min"]), int(params["max"])
+    too_short = (remediation or {}).get("too_short") or (
+        "Current length {length} chars. "
+        "Add details (timeline, amounts, counterparties, alert triggers) to reach minimum."
+    )
+    too_long = (remediation or {}).get("too_long") or (
+        "Current length {length} chars. "
+        "Tighten the narrative: remove repetition and non-essential commentary to stay concise."
+    )
+
+    def evaluate(narrative):
+        length = len(narrative.strip())
+        if length < minimum:
+            return {"passed": False, "remediation": too_short.format(length=length)}
+        if length > maximum:
+            return {"passed": False, "remediation": too_long.format(length=length)}
+        return {"passed": True, "remediation": ""}
+
+    return ComplianceRule(key, label, ["narrative"], evaluate, depends_on)
+
+
+def make_forbidden_phrases_rule(key, label, params, remediation, shared, depends_on=()):
+    # Every forbidden-phrase rule in a pack shares one merged matcher (see rule_packs.PhraseScanner)
+    scanner = shared["phrases"]
+    template = remediation or (
+        "Remove these phrases: {hits}. State only observable facts (what occurred), not intent or assumptions."
+    )
+
+    def evaluate(narrative):
+        stripped = narrative.strip()
+        lead = len(narrative) - len(narrative.lstrip())  # spans refer to the unstripped narrative
+        spans = [{"start": s + lead, "end": e + lead, "phrase": p} for s, e, p in scanner.hits(stripped, key)]
+        hits = sorted({h["phrase"] for h in spans})
+        return {
+            "passed": not hits,
+            "remediation": template.format(hits=", ".join(hits)) if hits else "",
+            "details": {"spans": spans},
+        }
+
+    return ComplianceRule(key, label, ["narrative"], evaluate, depends_on)
+
+
+RULE_TYPES = {
+    "five_ws_present": make_five_ws_rule,
+    "chronology": make_chronology_rule,
+    "facts_supported": make_facts_supported_rule,
+    "min_length": make_min_length_rule,
+    "length_bounds": make_length_bounds_rule,
+    "forbidden_phrases": make_forbidden_phrases_rule,
+}
+
+
+def default_rules():
+    """Rules of the active default rule pack (reloaded when the pack file changes)."""
+    from application_pages.rule_packs import get_pack
+    return get_pack().rules
+
+
+def evaluation_order(rules) -> list:
+    """Rules ordered so that each comes after the rules it depends on. Raises ValueError on cycles."""
+    by_key = {r.key: r for r in rules}
+    ordered, state = [], {}
+
+    def visit(rule, path):
+        if state.get(rule.key) == "done":
+            return
+        if state.get(rule.key) == "visiting":
+            raise ValueError("Rule dependency cycle: " + " -> ".join(path + [rule.key]))
+        state[rule.key] = "visiting"
+        for dep in rule.depends_on:
+            if dep not in by_key:
+                raise ValueError(f"Rule '{rule.key}' depends on unknown rule '{dep}'")
+            visit(by_key[dep], path + [rule.key])
+        state[rule.key] = "done"
+        ordered.append(rule)
+
+    for rule in rules:
+        visit(rule, [])
+    return ordered
+
+
+def build_report(items: list, inputs: dict) -> dict:
+    five_ws = inputs["five_ws"]
+    return {
+        "overall": all(i["passed"] for i in items),
+        "length": len(inputs["narrative"].strip()),
+        "five_ws_counts": {k: len(five_ws.get(k, [])) for k in REQUIRED_5WS},
+        "items": items,
+    }
+
+
+def _evaluate(rules, order, run_rule) -> list:
+    """Evaluate `order` (dependencies first) with `run_rule`; returns items in `rules` order."""
+    results = {}
+    for rule in order:
+        failed = [results[d]["label"] for d in rule.depends_on if not results[d]["passed"]]
+        results[rule.key] = rule.not_checked(failed) if failed else run_rule(rule)
+    return [results[r.key] for r in rules]
+
+
+def run_compliance_checklist(narrative: str, extracted_5ws: dict, selected_facts=None, rules=None) -> dict:
+    """
+    Compute compliance checks and return a structured report with per-item pass/fail + remediation text.
+    Amounts and dates are verified against `selected_facts` when given. Defaults to the active rule pack.
+    """
+    if rules is None:
+        from application_pages.rule_packs import get_pack
+        pack = get_pack()
+        rules, order = pack.rules, pack.order
+    else:
+        order = evaluation_order(rules)
+    inputs = normalize_inputs(narrative, extracted_5ws, selected_facts)
+    return build_report(_evaluate(rules, order, lambda rule: rule.run(inputs)), inputs)
+
+
+class IncrementalChecklist:
+    """
+    Runs the checklist repeatedly, re-evaluating only rules whose inputs changed since the last run.
+
+    Without `rules`, each run uses the active default rule pack, so an edited pack takes effect on
+    the next run. After each `run`, `last_run` holds the elapsed milliseconds and which rules were
+    evaluated or reused from cache.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = list(rules) if rules is not None else None
+        self._cache = {}    # rule key -> (rule, input digests, item)
+        self._digests = {}  # input name -> (object, digest) for non-text inputs, reused while the same object is passed
+        self._order = (None, None)
+        self.last_run = {"elapsed_ms": 0.0, "evaluated": [], "reused": []}
+
+    def run(self, narrative: str, extracted_5ws: dict, selected_facts=None, rules=None) -> dict:
+        start = time.perf_counter()
+        if rules is None:
+            rules = self.rules if self.rules is not None else default_rules()
+        if self._order[0] is not rules:
+            self._order = (rules, evaluation_order(rules))
+        inputs = normalize_inputs(narrative, extracted_5ws, selected_facts)
+        digests = {name: self._input_digest(name, value) for name, value in inputs.items()}
+        evaluated, reused = [], []
+
+        def run_rule(rule):
+            key = tuple(digests[name] for name in rule.inputs)
+            cached = self._cache.get(rule.key)
+            # A recompiled pack has new rule objects, so its rules are evaluated afresh
+            if cached is not None and cached[0] is rule and cached[1] == key:
+                reused.append(rule.key)
+                return cached[2]
+            item = rule.run(inputs)
+            self._cache[rule.key] = (rule, key, item)
+            evaluated.append(rule.key)
+            return item
+
+        items = [dict(item) for item in _evaluate(rules, self._order[1], run_rule)]
+        report = build_report(items, inputs)
+        self.last_run = {"elapsed_ms": (time.perf_counter() - start) * 1000, "evaluated": evaluated, "reused": reused}
+        return report
+
+    def _input_digest(self, name, value) -> str:
+        if isinstance(value, str):
+            return _digest(value)
+        # Large inputs such as the fact list are replaced, not mutated, between reruns
+        previous = self._digests.get(name)
+        if previous is not None and previous[0] is value:
+            return previous[1]
+        digest = _digest(value)
+        self._digests[name] = (value, digest)
+        return digest
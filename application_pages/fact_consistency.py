@@ -0,0 +1,202 @@
+"""
+Checks that the amounts and dates cited in a SAR narrative are backed by the selected facts.
+
+Amounts and dates are pulled from the narrative with one combined regex pass and looked up in a
+`FactIndex` built once per fact set: a hash set of amounts (in cents) and a sorted array of fact
+dates, used for membership and for suggesting the nearest supported date.
+"""
+import re
+from bisect import bisect_left
+from datetime import date, datetime
+
+import pandas as pd
+
+# ---- Tunables ----
+# Amounts preceded by these words are aggregates (totals, ranges) and are not matched against single facts
+DERIVED_AMOUNT_CUES = ("total", "totaling", "totalling", "totaled", "aggregate", "aggregating", "sum of", "combined", "approximately")
+DERIVED_CUE_WINDOW = 30   # characters before an amount searched for a cue
+
+_MONTHS = "january|february|march|april|may|june|july|august|september|october|november|december"
+# Every alternative starts with a backtick, "$" or a digit, so the engine skips other characters
+# cheaply. Dates are checked for a preceding word character, and "March 5, 2023" for its month
+# name, in Python after the match, which keeps those checks out of the scan.
+_MENTION_RE = re.compile(
+    r"`(?:\$\d[\d,]*(?:\.\d{1,2})?|\d[\d,]*\.\d{2})`"
+    r"|\$\d[\d,]*(?:\.\d{1,2})?"
+    r"|\d(?:(?P<iso>\d{3}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)"
+    r"|(?P<us>\d?/\d{1,2}/\d{4})"
+    r"|(?P<long>\d?,\s*\d{4}))(?![\w/-])"
+)
+_MONTH_BEFORE_RE = re.compile(r"\b(?:" + _MONTHS + r")\s+$", re.I)
+_DATE_FORMATS = {"us": "%m/%d/%Y", "long": "%B %d, %Y"}
+_RANGE_RE = re.compile(r"\b(?:between|from)\s*$", re.I)
+_CUE_RE = re.compile(r"\b(?:" + "|".join(re.escape(c) for c in DERIVED_AMOUNT_CUES) + r")\b[^.`$]*$", re.I)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+
+def _to_cents(value) -> int:
+    return int(round(float(value) * 100))
+
+
+def _parse_date(kind: str, text: str):
+    try:
+        if kind == "iso":
+            return date.fromisoformat(text[:10])
+        return datetime.strptime(re.sub(r"\s*,\s*|\s+", lambda m: m.group().strip() + " ", text), _DATE_FORMATS[kind]).date()
+    except ValueError:
+        return None
+
+
+def _fact_date(value):
+    """Calendar date of a fact timestamp (Timestamp, datetime, date or string), or None."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):  # includes pd.Timestamp
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.strip()).date()
+        except ValueError:
+            pass
+    # Other string formats are rare; let pandas work them out
+    ts = pd.to_datetime(value, errors="coerce")
+    return None if pd.isnull(ts) else ts.date()
+
+
+class FactIndex:
+    """Amount and date indexes over a list of fact dicts."""
+
+    def __init__(self, selected_facts):
+        facts = [f for f in (selected_facts or []) if isinstance(f, dict)]
+        self.amounts = {
+            _to_cents(v) for f in facts for k, v in f.items()
+            if "amount" in k and isinstance(v, (int, float)) and not isinstance(v, bool) and pd.notnull(v)
+        }
+        self._date_set = {
+            _fact_date(v) for f in facts for k, v in f.items() if k == "timestamp" or k.endswith("date")
+        }
+        self._date_set.discard(None)
+        self.dates = sorted(self._date_set)
+
+    def has_amount(self, cents: int) -> bool:
+        return cents in self.amounts
+
+    def has_date(self, d: date) -> bool:
+        return d in self._date_set
+
+    def nearest_date(self, d: date):
+        """Closest fact date to `d` (sorted-index lookup), or None when there are no dated facts."""
+        if not self.dates:
+            return None
+        i = bisect_left(self.dates, d)
+        candidates = self.dates[max(0, i - 1):i + 1]
+        return min(candidates, key=lambda c: abs((c - d).days))
+
+
+_last_mentions = {}
+
+
+def extract_mentions(narrative: str) -> list:
+    """
+    Amounts and dates cited in the narrative, in text order.
+
+    Each mention is a dict with kind ("amount" or "date"), start, end, text and value (cents or a
+    date), plus `derived` for aggregate amounts and `range_start` for dates opening a
+    "between X and Y" / "from X to Y" range.
+    """
+    narrative = narrative or ""
+    cached = _last_mentions.get(narrative)
+    if cached is not None:
+        return cached
+    mentions = []
+    for m in _MENTION_RE.finditer(narrative):
+        start, end = m.span()
+        kind = m.lastgroup
+        if kind is None:
+            before = narrative[max(0, start - DERIVED_CUE_WINDOW):start]
+            number = m.group().strip("`").lstrip("$").replace(",", "")
+            mentions.append({"kind": "amount", "start": start, "end": end, "text": m.group(),
+                             "value": _to_cents(number), "derived": bool(_CUE_RE.search(before))})
+            continue
+        if start and (narrative[start - 1].isalnum() or narrative[start - 1] in "_/-"):
+            continue
+        if kind == "long":
+            month = _MONTH_BEFORE_RE.search(narrative, max(0, start - 12), start)
+            if month is None:
+                continue
+            start = month.start()
+        value = _parse_date(kind, narrative[start:end])
+        if value is not None:
+            before = narrative[max(0, start - DERIVED_CUE_WINDOW):start]
+            mentions.append({"kind": "date", "start": start, "end": end, "text": narrative[start:end],
+                             "value": value, "range_start": bool(_RANGE_RE.search(before))})
+    # Several rules verify the same narrative in a row
+    _last_mentions.clear()
+    _last_mentions[narrative] = mentions
+    return mentions
+
+
+def _paragraph_ids(narrative: str, mentions: list) -> list:
+    breaks = [m.start() for m in _PARAGRAPH_RE.finditer(narrative)]
+    ids, p = [], 0
+    for mention in mentions:
+        while p < len(breaks) and breaks[p] < mention["start"]:
+            p += 1
+        ids.append(p)
+    return ids
+
+
+def verify_narrative(narrative: str, selected_facts=None, index: FactIndex = None) -> dict:
+    """
+    Verify the narrative's amounts and dates against the facts and check event order.
+
+    Dates must be non-decreasing within each paragraph; the closing date of a "between X and Y"
+    range is exempt, since the events inside the range are usually listed after it. Without facts
+    (no `selected_facts` and no `index`) only the ordering is checked.
+
+    Returns:
+        dict: unsupported_amounts, unsupported_dates and out_of_order (lists of mentions),
+        plus counts of checked amounts and dates.
+    """
+    narrative = narrative or ""
+    if index is None and selected_facts is not None:
+        index = FactIndex(selected_facts)
+    mentions = extract_mentions(narrative)
+
+    unsupported_amounts, unsupported_dates, out_of_order = [], [], []
+    amounts_checked = dates_checked = 0
+    last_by_paragraph = {}
+    skip_next_date = False
+    for mention, paragraph in zip(mentions, _paragraph_ids(narrative, mentions)):
+        if mention["kind"] == "amount":
+            if index is not None and not mention["derived"]:
+                amounts_checked += 1
+                if not index.has_amount(mention["value"]):
+                    unsupported_amounts.append(mention)
+            continue
+
+        if index is not None:
+            dates_checked += 1
+            if not index.has_date(mention["value"]):
+                nearest = index.nearest_date(mention["value"])
+                unsupported_dates.append({**mention, "nearest": nearest})
+
+        if skip_next_date:
+            skip_next_date = False
+            continue
+        previous = last_by_paragraph.get(paragraph)
+        if previous is not None and mention["value"] < previous["value"]:
+            out_of_order.append({**mention, "previous": previous["text"]})
+        else:
+            last_by_paragraph[paragraph] = mention
+        skip_next_date = mention["range_start"]
+
+    return {
+        "unsupported_amounts": unsupported_amounts,
+        "unsupported_dates": unsupported_dates,
+        "out_of_order": out_of_order,
+        "amounts_checked": amounts_checked,
+        "dates_checked": dates_checked,
+    }
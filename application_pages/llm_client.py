@@ -0,0 +1,307 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import json
+import requests
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+LLM_API_URL = os.getenv("LLM_API_URL", "https://api.openai.com/v1/chat/completions")
+LLM_API_KEY = os.getenv("LLM_API_KEY", os.environ.get("OPENAI_API_KEY"))
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")   # configure per your provider, e.g., "gpt-4o-mini", "gemini-pro"
+
+# ---- Tunables ----
+DEFAULT_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "45"))   # total budget per request, across retries
+MAX_ATTEMPTS = 3
+BACKOFF_MIN_S, BACKOFF_MAX_S = 1, 8                              # exponential backoff between attempts
+HEDGE_MIN_SAMPLES = 20       # successful calls needed before the p95 is trusted as hedge delay
+HEDGE_DEFAULT_DELAY_S = 10.0 # hedge delay until then
+LATENCY_WINDOW = 500         # most recent samples kept per endpoint
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+BREAKER_FAILURE_THRESHOLD = 3  # consecutive failed requests that open the circuit
+BREAKER_RESET_S = 30.0         # how long the circuit stays open before one trial request
+
+# Requests run on a shared pool so a hedge can race the primary request
+_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm")
+
+
+class LLMUnavailable(Exception):
+    """Base class for failures where callers should fall back instead of waiting on the LLM."""
+
+
+class DeadlineExceeded(LLMUnavailable):
+    """Raised when an LLM request cannot complete before its deadline."""
+
+
+class CircuitOpen(LLMUnavailable):
+    """Raised without contacting the provider while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+    After `threshold` consecutive failures the circuit opens and requests fail fast for `reset_s`;
+    then a single trial request is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, reset_s: float = BREAKER_RESET_S):
+        self.threshold = threshold
+        self.reset_s = reset_s
+        self._lock = threading.Lock()
+        self._failures = defaultdict(int)
+        self._opened_at = {}
+        self._trial_running = set()
+
+    def before_request(self, endpoint: str):
+        with self._lock:
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return
+            if time.monotonic() - opened_at < self.reset_s or endpoint in self._trial_running:
+                raise CircuitOpen(f"{endpoint} is unavailable; retrying after a cool-down")
+            self._trial_running.add(endpoint)
+
+    def record_success(self, endpoint: str):
+        with self._lock:
+            self._failures[endpoint] = 0
+            self._opened_at.pop(endpoint, None)
+            self._trial_running.discard(endpoint)
+
+    def record_failure(self, endpoint: str):
+        with self._lock:
+            self._failures[endpoint] += 1
+            if endpoint in self._trial_running or self._failures[endpoint] >= self.threshold:
+                self._opened_at[endpoint] = time.monotonic()
+            self._trial_running.discard(endpoint)
+
+    def is_open(self, endpoint: str) -> bool:
+        with self._lock:
+            return endpoint in self._opened_at
+
+
+class LatencyTracker:
+    """Thread-safe rolling latency samples and counters per endpoint."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counters = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._samples[endpoint].append(seconds)
+            self._counters[endpoint]["requests"] += 1
+
+    def incr(self, endpoint: str, counter: str):
+        with self._lock:
+            self._counters[endpoint][counter] += 1
+
+    def percentile(self, endpoint: str, q: float):
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if not samples:
+            return None
+        # Nearest-rank percentile
+        rank = max(1, int(round(q / 100 * len(samples) + 0.5 - 1e-9)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def sample_count(self, endpoint: str) -> int:
+        with self._lock:
+            return len(self._samples.get(endpoint, ()))
+
+    def snapshot(self) -> list:
+        """Return one row per endpoint with p50/p95/p99 (seconds) and counters."""
+        with self._lock:
+            endpoints = sorted(set(self._samples) | set(self._counters))
+            counters = {e: dict(self._counters.get(e, {})) for e in endpoints}
+        rows = []
+        for e in endpoints:
+            c = counters[e]
+            rows.append({
+                "endpoint": e,
+                "requests": c.get("requests", 0),
+                "p50_s": self.percentile(e, 50),
+                "p95_s": self.percentile(e, 95),
+                "p99_s": self.percentile(e, 99),
+                "hedged": c.get("hedged", 0),
+                "hedge_wins": c.get("hedge_wins", 0),
+                "retries": c.get("retries", 0),
+                "deadline_exceeded": c.get("deadline_exceeded", 0),
+            })
+        return rows
+
+
+latency_tracker = LatencyTracker()
+circuit_breaker = CircuitBreaker()
+
+
+def hedge_delay(endpoint: str) -> float:
+    """Delay before a duplicate request is sent: the endpoint's p95 once enough samples exist."""
+    if latency_tracker.sample_count(endpoint) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_S
+    return latency_tracker.percentile(endpoint, 95)
+
+
+def _post(url: str, payload: dict, timeout: float, endpoint: str) -> dict:
+    headers = {"Authorization": f"Bearer {LLM_API_KEY}", "Content-Type": "application/json"}
+    start = time.monotonic()
+    r = requests.post(url, headers=headers, json=payload, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    latency_tracker.record(endpoint, time.monotonic() - start)
+    return data
+
+
+def _attempt(url: str, payload: dict, deadline: float, endpoint: str, hedge: bool) -> dict:
+    # One attempt = primary request, plus a duplicate if the primary is slower than the hedge delay.
+    remaining = deadline - time.monotonic()
+    futures = [_pool.submit(_post, url, payload, remaining, endpoint)]
+    delay = hedge_delay(endpoint) if hedge else None
+    if delay is not None and delay < remaining:
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            latency_tracker.incr(endpoint, "hedged")
+            futures.append(_pool.submit(_post, url, payload, deadline - time.monotonic(), endpoint))
+
+    pending, error = set(futures), None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                if fut is not futures[0]:
+                    latency_tracker.incr(endpoint, "hedge_wins")
+                # The losing request finishes in the background and is ignored
+                return fut.result()
+            error = fut.exception()
+    if error is not None and not pending:
+        raise error
+    raise DeadlineExceeded(f"No response from {endpoint} before the deadline")
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, requests.RequestException)
+
+
+def _record_outcome(endpoint: str, exc: Exception) -> None:
+    # Only provider trouble (timeouts, connection errors, 429/5xx, deadlines) counts toward opening the
+    # circuit. A 4xx or a malformed body is a problem of that one request: the provider answered.
+    if isinstance(exc, DeadlineExceeded) or _retryable(exc):
+        circuit_breaker.record_failure(endpoint)
+    else:
+        circuit_breaker.record_success(endpoint)
+
+
+def chat_completion(prompt: str, temperature: float = 0.2, max_tokens: int = 600,
+                    deadline_s: float = None, endpoint: str = None, hedge: bool = True) -> str:
+    """
+    Send one chat-completion request with a deadline that covers every retry and hedge.
+
+    - Each attempt's HTTP timeout is the time left until the deadline.
+    - If an attempt is slower than the endpoint's p95, a duplicate request is sent and the first answer wins.
+    - Retryable failures (timeouts, connection errors, 429/5xx) back off exponentially, but never past the deadline.
+
+    Requests always go to LLM_API_URL. `endpoint` is only a label: it keys the latency metrics,
+    the hedge delay and the circuit breaker, so callers with different traffic (pages, batch jobs)
+    do not share them. Only timeouts, connection errors, 429/5xx and deadlines count toward
+    opening the circuit; other errors (4xx, malformed responses) are raised without tripping it.
+
+    Raises DeadlineExceeded when no answer can arrive in time, and CircuitOpen while the provider
+    is failing; both are LLMUnavailable so callers can degrade gracefully.
+    """
+    endpoint = endpoint or LLM_API_URL
+    circuit_breaker.before_request(endpoint)
+    try:
+        text = _chat_completion(prompt, temperature, max_tokens, deadline_s, endpoint, hedge)
+    except Exception as e:
+        _record_outcome(endpoint, e)
+        raise
+    circuit_breaker.record_success(endpoint)
+    return text
+
+
+def _chat_completion(prompt, temperature, max_tokens, deadline_s, endpoint, hedge):
+    deadline = time.monotonic() + (DEFAULT_DEADLINE_S if deadline_s is None else deadline_s)
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            data = _attempt(LLM_API_URL, payload, deadline, endpoint, hedge)
+            # Adjust the path below to your provider’s response schema:
+            return data["choices"][0]["message"]["content"].strip()
+        except DeadlineExceeded:
+            latency_tracker.incr(endpoint, "deadline_exceeded")
+            raise
+        except Exception as e:
+            if not _retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            backoff = min(BACKOFF_MAX_S, max(BACKOFF_MIN_S, 2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                latency_tracker.incr(endpoint, "deadline_exceeded")
+                raise DeadlineExceeded(f"No time left to retry {endpoint} after: {e}") from e
+            latency_tracker.incr(endpoint, "retries")
+            time.sleep(backoff)
+
+
+def stream_chat_completion(prompt: str, temperature: float = 0.2, max_tokens: int = 600,
+                           deadline_s: float = None, endpoint: str = None):
+    """
+    Stream one chat completion, yielding text deltas as they arrive (OpenAI-style server-sent events).
+
+    The deadline bounds the whole stream. Streams are not retried or hedged; failures raise
+    (LLMUnavailable for deadline/circuit problems). As in chat_completion, `endpoint` is only the
+    metrics and circuit-breaker label, and only provider trouble counts against the breaker.
+    """
+    endpoint = endpoint or LLM_API_URL
+    circuit_breaker.before_request(endpoint)
+    deadline = time.monotonic() + (DEFAULT_DEADLINE_S if deadline_s is None else deadline_s)
+    headers = {"Authorization": f"Bearer {LLM_API_KEY}", "Content-Type": "application/json"}
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+    start = time.monotonic()
+    try:
+        with requests.post(LLM_API_URL, headers=headers, json=payload, stream=True,
+                           timeout=deadline - start) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline:
+                    raise DeadlineExceeded(f"{endpoint} stream did not finish before the deadline")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+    except GeneratorExit:
+        # The caller stopped reading; the provider itself did not fail
+        circuit_breaker.record_success(endpoint)
+        raise
+    except requests.Timeout as e:
+        circuit_breaker.record_failure(endpoint)
+        latency_tracker.incr(endpoint, "deadline_exceeded")
+        raise DeadlineExceeded(f"{endpoint} stream timed out") from e
+    except Exception as e:
+        _record_outcome(endpoint, e)
+        raise
+    circuit_breaker.record_success(endpoint)
+    latency_tracker.record(endpoint, time.monotonic() - start)
@@ -0,0 +1,81 @@
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from application_pages.audit_store import QUERY_LIMIT, get_audit_store
+
+ANY = "(any)"
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _date_range(key: str):
+    """Optional (since, until) date filters as ISO strings."""
+    c1, c2 = st.columns(2)
+    since = c1.date_input("From", value=date.today() - timedelta(days=90), key=f"{key}_since")
+    until = c2.date_input("To", value=date.today(), key=f"{key}_until")
+    return (since.isoformat() if since else None), (until.isoformat() if until else None)
+
+
+def _show(rows: list, elapsed_ms: float, total: int = None, name: str = "audit_query"):
+    shown = f"{len(rows)}" if total is None or total == len(rows) else f"{len(rows)} of {total}"
+    st.caption(f"{shown} result{'s' if len(rows) != 1 else ''} in {elapsed_ms:.0f} ms")
+    if rows:
+        df = pd.DataFrame(rows)
+        st.dataframe(df, hide_index=True)
+        st.download_button("⬇️ Download results (CSV)", df.to_csv(index=False).encode("utf-8"),
+                           file_name=f"{name}.csv", mime="text/csv")
+
+
+def run_page():
+    st.markdown("# Audit Trail Query")
+    st.markdown("""
+Every auditable action in the application (drafts, edits, checklist runs, AI fixes, version restores and exports) is recorded in a tamper-evident audit log. This page searches that log across **all cases**, for example *all exports by one analyst last quarter*, or *cases where an AI fix was applied after a failed checklist run*.
+""")
+
+    store = get_audit_store()
+    with st.spinner("Indexing new audit events..."):
+        store.sync()
+    st.caption(f"{len(store):,} events indexed" + ("" if store.has_fts else " (full-text index unavailable: text search scans)"))
+
+    events = store.distinct("event")
+    analysts = store.distinct("analyst_id")
+    mode = st.radio("Question", ["Find events", "Find cases where one event followed another"], horizontal=True)
+
+    if mode == "Find events":
+        c1, c2 = st.columns(2)
+        event = c1.multiselect("Event type", events, key="aq_event")
+        analyst = c2.selectbox("Analyst", [ANY, *analysts], key="aq_analyst")
+        c3, c4 = st.columns(2)
+        case_id = c3.text_input("Case ID", key="aq_case").strip()
+        status = c4.selectbox("Status", [ANY, "PASS", "FAIL"], key="aq_status")
+        since, until = _date_range("aq")
+        text = st.text_input("Text search (event type and details, e.g. Chronology)", key="aq_text").strip()
+        limit = st.number_input("Maximum rows", min_value=10, max_value=100_000, value=QUERY_LIMIT, step=100)
+        filters = dict(event=event or None, analyst_id=None if analyst == ANY else analyst, case_id=case_id or None,
+                       status=None if status == ANY else status, since=since, until=until, text=text or None, sync=False)
+        try:
+            rows, elapsed = _timed(store.query, limit=int(limit), **filters)
+            total, count_ms = _timed(store.count, **filters)
+        except sqlite3.OperationalError as e:   # e.g. a malformed full-text query
+            st.error(f"Query failed: {e}")
+            return
+        _show(rows, elapsed + count_ms, total, "audit_events")
+    else:
+        c1, c2, c3 = st.columns(3)
+        default_first = events.index("Compliance checklist run") if "Compliance checklist run" in events else 0
+        default_then = events.index("AI fix applied") if "AI fix applied" in events else 0
+        first = c1.selectbox("First event", events or ["Compliance checklist run"], index=default_first, key="aq_first")
+        first_status = c2.selectbox("with status", [ANY, "PASS", "FAIL"], index=2, key="aq_first_status")
+        then = c3.selectbox("Followed by", events or ["AI fix applied"], index=default_then, key="aq_then")
+        since, until = _date_range("aq_seq")
+        rows, elapsed = _timed(store.cases_with_sequence, first, then, first_status=None if first_status == ANY else first_status,
+                               since=since, until=until, sync=False)
+        _show(rows, elapsed, name="audit_cases")
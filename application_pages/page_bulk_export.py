@@ -0,0 +1,75 @@
+import json
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from application_pages.bulk_export import (
+    BULK_EXPORT_DIR, EXPORT_FORMATS, FINISHED_STATUSES, finished_case_ids, run_bulk_export, verify_export,
+)
+from application_pages.case_store import CASE_STATUSES, get_case_store
+
+
+def run_page():
+    st.markdown("# Bulk Export")
+    st.markdown("""
+Month-end filing usually means exporting many finished SARs at once. This page exports a batch of saved cases (by default every case whose compliance checklist has been run and that has not been exported yet) in parallel: each case's JSON bundle, audit trail (CSV), final narrative (TXT) and PDF report are written to its own folder in the output directory, together with a **manifest** listing every file with its size and SHA-256 checksum, and the throughput of the job. An *Export prepared* event is added to the audit log and to the case's saved audit trail for each exported case, and the case's status becomes *exported*.
+""")
+
+    store = get_case_store()
+    c1, c2 = st.columns(2)
+    statuses = c1.multiselect("Case status", list(CASE_STATUSES), default=list(FINISHED_STATUSES), key="bulk_statuses")
+    mine = c2.checkbox("Only my cases", key="bulk_mine")
+    typed = st.text_area("Or export these case IDs (one per line or comma-separated)", key="bulk_case_ids")
+    case_ids = [c for c in re.split(r"[\s,]+", typed) if c]
+    if not case_ids:
+        case_ids = finished_case_ids(store, statuses, analyst=st.session_state.get("analyst_id") if mine else None)
+    st.caption(f"{len(case_ids)} case{'s' if len(case_ids) != 1 else ''} selected")
+
+    c1, c2, c3 = st.columns(3)
+    out_dir = c1.text_input("Output directory", value=BULK_EXPORT_DIR, key="bulk_out_dir",
+                            help="Each export is written to a new folder inside this directory.").strip()
+    workers = c2.number_input("Worker processes", min_value=1, max_value=64, value=os.cpu_count() or 1, key="bulk_workers")
+    formats = c3.multiselect("Formats", list(EXPORT_FORMATS), default=list(EXPORT_FORMATS), key="bulk_formats")
+
+    if st.button(f"📦 Export {len(case_ids)} cases", type="primary", disabled=not case_ids or not formats or not out_dir):
+        progress = st.progress(0.0, text="Exporting...")
+        out_dir = os.path.join(out_dir, f"bulk-{datetime.now():%Y%m%d_%H%M%S}")
+        job = run_bulk_export(
+            case_ids, out_dir, store_path=store.path, workers=int(workers), formats=formats,
+            analyst_id=st.session_state.get("analyst_id"),
+            on_progress=lambda done, total: progress.progress(done / total, text=f"Exported {done} of {total} cases"),
+        )
+        st.session_state.bulk_export_job = {"out_dir": out_dir, **job}
+
+    job = st.session_state.get("bulk_export_job")
+    if not job:
+        return
+    st.divider()
+    st.success(
+        f"Exported {job['exported']} of {job['cases']} cases ({job['files']} files, {job['bytes'] / 1e6:.1f} MB) "
+        f"to `{job['out_dir']}` in {job['elapsed_s']:.1f} s: {job['cases_per_s']} cases/s, "
+        f"{job['mb_per_s']} MB/s with {job['workers']} worker{'s' if job['workers'] != 1 else ''}."
+    )
+    manifest_path = os.path.join(job["out_dir"], "manifest.json")
+    if not os.path.exists(manifest_path):
+        st.warning("The manifest of this export is no longer in the output directory.")
+        return
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["errors"]:
+        n = len(manifest["errors"])
+        st.warning(f"{n} case{'s' if n != 1 else ''} could not be exported:")
+        st.dataframe(pd.DataFrame(manifest["errors"]), hide_index=True)
+    st.markdown("### Manifest")
+    st.dataframe(pd.DataFrame(manifest["files"], columns=["case_id", "file", "bytes", "sha256"]), hide_index=True)
+    st.download_button("⬇️ Download manifest (JSON)", json.dumps(manifest, indent=2).encode("utf-8"),
+                       file_name=f"{job['job_id']}_manifest.json", mime="application/json")
+    if st.button("Verify files against the manifest"):
+        mismatched = verify_export(job["out_dir"])
+        if mismatched:
+            st.error(f"{len(mismatched)} files are missing or changed: " + ", ".join(mismatched[:20]))
+        else:
+            st.success(f"All {len(manifest['files'])} files match their checksums.")
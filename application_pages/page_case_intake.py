@@ -304,8 +304,44 @@ These metrics are vital for an AML analyst to quickly size up a case, identify p
         
 
         st.write("Now head over to the `Explore Data` page to explore the data.")
-        
-        
+
+    if 'data' in st.session_state:
+        render_prefetch_controls(st.session_state.data)
+
+
+def render_prefetch_controls(data):
+    """Controls and progress for background pre-drafting of the alert queue."""
+    from application_pages.prefetch import (
+        start_prefetch, get_prefetch_worker, draft_cache, PREFETCH_CONCURRENCY, PREFETCH_TOKEN_BUDGET,
+    )
+
+    st.divider()
+    st.markdown('''
+### Background Pre-drafting
+
+Drafts can be generated in the background for the alert queue, highest customer risk score first and oldest alert first within the same score. When an analyst later opens one of these cases, the Draft SAR page shows the pre-drafted narrative instantly instead of waiting for the LLM.
+''')
+    col1, col2 = st.columns(2)
+    with col1:
+        concurrency = st.number_input("Concurrent LLM calls", min_value=1, max_value=32, value=PREFETCH_CONCURRENCY)
+    with col2:
+        budget = st.number_input("Token budget for this run (estimated)", min_value=0, value=PREFETCH_TOKEN_BUDGET, step=10000)
+
+    worker = get_prefetch_worker()
+    running = worker is not None and worker.is_running()
+    if st.button("Stop pre-drafting" if running else "Start background pre-drafting"):
+        if running:
+            worker.stop()
+        else:
+            worker = start_prefetch(data, max_concurrency=concurrency, token_budget=budget)
+
+    if worker is not None:
+        status = worker.snapshot()
+        st.caption(
+            f"Status: {status['state']} | drafted {status['drafted']} of {status['queued']} alerts "
+            f"({status['cached']} already cached, {status['failed']} failed) | "
+            f"~{status['tokens_spent']:,} tokens committed | {len(draft_cache)} drafts in cache"
+        )
 
 if __name__ == "__main__":
     run_page()
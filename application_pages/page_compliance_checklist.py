@@ -2,36 +2,34 @@ import streamlit as st
 import re
 import pandas as pd
 
-import re, html
+import re
 import pandas as pd
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
+import json
 import requests
+from application_pages.llm_client import chat_completion, LLMUnavailable
+from application_pages.audit_log import log_event, log_revision
+from application_pages.case_store import discard_export
+from application_pages.checklist_view import render_checklist_html
+from application_pages.compliance_rules import IncrementalChecklist, run_compliance_checklist
+from application_pages.rule_packs import DEFAULT_RULE_PACK, get_pack, list_packs
 
 # Load environment variables
 load_dotenv()
 LLM_API_URL = os.getenv("LLM_API_URL", "https://api.openai.com/v1/chat/completions")
 LLM_API_KEY = os.getenv("LLM_API_KEY", os.environ.get("OPENAI_API_KEY"))
+FIX_DEADLINE_S = float(os.getenv("SAR_FIX_DEADLINE_S", "45"))  # per fix request, retries included
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-def call_llm(prompt: str) -> str:
+def call_llm(prompt: str, max_tokens: int = 1000) -> str:
     if not LLM_API_KEY or LLM_API_KEY == "":
         print("Warning: LLM_API_URL or LLM_API_KEY not set. Using a dummy response.")
         return "AI-assisted fixed draft:\nThis is a placeholder fixed narrative. In a real scenario, the LLM would generate a corrected version based on the compliance failures."
-    
-    headers = {"Authorization": f"Bearer {LLM_API_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": "gpt-4o",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.2,
-        "max_tokens": 1000
-    }
-    r = requests.post(LLM_API_URL, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    return data["choices"][0]["message"]["content"].strip()
+
+    # Retries, hedging and the deadline are handled by the shared client
+    return chat_completion(prompt, temperature=0.2, max_tokens=max_tokens,
+                           deadline_s=FIX_DEADLINE_S, endpoint="compliance_fix")
 
 def build_fix_prompt(narrative: str, compliance_report: dict) -> str:
     """
@@ -79,193 +77,149 @@ PROVIDE ONLY the fixed SAR narrative below, starting with "AI-assisted fixed dra
     return prompt
 
 # ---- Tunables ----
-SPECULATIVE_PHRASES = [
-    "may have been", "might have been", "could have been",
-    "it is believed", "suggests that", "appears to", "possibly", "likely"
-]
-MIN_LEN = 100
-MAX_LEN = 1000
-
-def run_compliance_checklist(narrative: str, extracted_5ws: dict) -> dict:
+# Rules and their thresholds live in the rule packs (see rule_packs.py).
+LIVE_CHECK_BUDGET_MS = 50   # target time for re-checking the narrative on each edit
+
+_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?]+(?=\s|$)|(?=\n)|\Z)', re.S)
+
+
+def split_sentences(text: str):
+    """Return (start, end) character spans of the sentences in `text`.
+
+    A sentence ends at ., ! or ? followed by whitespace, or at a line break, so
+    amounts such as `$480.43` are not split.
     """
-    Compute compliance checks and return a structured report with per-item pass/fail + remediation text.
+    return [m.span() for m in _SENTENCE_RE.finditer(text or "")]
+
+
+def _is_sentence_local(item: dict) -> bool:
+    # Items that report the offending spans (e.g. forbidden phrases) can be repaired by
+    # rewriting just the sentences containing them (see build_targeted_fix_prompt)
+    return bool(item.get("details", {}).get("spans"))
+
+
+def find_flagged_sentences(narrative: str, compliance_report: dict) -> list:
     """
-    narrative = (narrative or "").strip()
-    five_ws = extracted_5ws or {}
-    five_ws = {k: (v or []) for k, v in five_ws.items()}
-
-    # 1) 5Ws presence
-    required_keys = ["Who", "What", "When", "Where", "Why"]
-    missing_5ws = [k for k in required_keys if len(five_ws.get(k, [])) == 0]
-    has_all_5ws = len(missing_5ws) == 0
-
-    # 2) Chronology
-    chronology_ok = True
-    parsed_when = []
-    chronology_error = None
-    if len(five_ws.get("When", [])) > 0:
-        try:
-            parsed_when = [pd.to_datetime(t, errors="coerce") for t in five_ws["When"]]
-            parsed_when = [t for t in parsed_when if pd.notnull(t)]
-            if len(parsed_when) <= 1:
-                chronology_ok = True
-            else:
-                chronology_ok = all(parsed_when[i] <= parsed_when[i+1] for i in range(len(parsed_when)-1))
-        except Exception as e:
-            chronology_ok = True
-            chronology_error = str(e)
-    else:
-        chronology_ok = True  # explicitly fail if no "When" available
-
-    # 3) Clarity (light heuristic)
-    clarity_ok = len(narrative) > 50
-
-    # 4) No speculation
-    lower = narrative.lower()
-    speculative_hits = sorted({p for p in SPECULATIVE_PHRASES if re.search(r"\b" + re.escape(p) + r"\b", lower)})
-    no_speculation = (len(speculative_hits) == 0)
-
-    # 5) Length bounds
-    length_ok = (MIN_LEN <= len(narrative) <= MAX_LEN)
-
-    items = []
-
-    # Build items with remediation text
-    items.append({
-        "key": "5Ws_present",
-        "label": "All 5Ws captured (Who / What / When / Where / Why)",
-        "passed": has_all_5ws,
-        "remediation": (
-            "Add missing elements — "
-            + ", ".join(missing_5ws)
-            + ".\n"
-            "- Who: legal names, account numbers/IDs.\n"
-            "- What: type of suspicious activity, amounts.\n"
-            "- When: specific dates/times (ISO format preferred).\n"
-            "- Where: locations (branches, cities, countries).\n"
-            "- Why: objective rationale (alerts/rules triggered, patterns)."
-        ) if not has_all_5ws else ""
-    })
-
-    items.append({
-        "key": "chronology",
-        "label": "Events presented in chronological order",
-        "passed": True,
-        "remediation": (
-            "Reorder events by timestamp (earliest → latest) and ensure dates are parseable. "
-            "Include a brief timeline summary. If multiple same-day events, add times (HH:MM)."
-        ) if not chronology_ok else "",
-        "details": {
-            "first": parsed_when[0] if parsed_when else None,
-            "last": parsed_when[-1] if parsed_when else None,
-            "error": chronology_error
-        }
-    })
-
-    items.append({
-        "key": "clarity",
-        "label": "Narrative is clear and substantive",
-        "passed": clarity_ok,
-        "remediation": (
-            "Expand with concrete facts: who did what, when, where, why it’s suspicious. "
-            "Use short sentences; reduce jargon; prefer specific amounts/dates over generalities."
-        ) if not clarity_ok else ""
-    })
-
-    items.append({
-        "key": "no_speculation",
-        "label": "No speculative or conjectural language",
-        "passed": no_speculation,
-        "remediation": (
-            "Remove speculative phrases: " + ", ".join(speculative_hits) + ". "
-            "State only observable facts (what occurred), not intent or assumptions."
-        ) if not no_speculation else ""
-    })
-
-    items.append({
-        "key": "length_bounds",
-        "label": f"Narrative length within {MIN_LEN}–{MAX_LEN} characters",
-        "passed": length_ok,
-        "remediation": (
-            f"Current length {len(narrative)} chars. "
-            + ("Add details (timeline, amounts, counterparties, alert triggers) to reach minimum."
-               if len(narrative) < MIN_LEN else
-               "Tighten the narrative: remove repetition and non-essential commentary to stay concise.")
-        ) if not length_ok else ""
-    })
-
-    overall = all(i["passed"] for i in items)
-
-    return {
-        "overall": overall,
-        "length": len(narrative),
-        "five_ws_counts": {k: len(five_ws.get(k, [])) for k in required_keys},
-        "items": items,
-    }
-
-
-def render_compliance_checklist_ui(narrative: str, extracted_5ws: dict):
+    Locate the sentences responsible for sentence-local checklist failures.
+    Returns one entry per flagged sentence: id, start, end, text and the issues found in it.
     """
-    Streamlit UI:
-      - Disabled checkbox per item shows PASS (checked) / FAIL (unchecked).
-      - Color-coded badge (green/red) next to each checkbox.
-      - Inline remediation text shown on the same row when an item fails.
+    # (start, end, phrase, label) for every hit of every failed sentence-local item, in text order
+    spans = [
+        (span["start"], span["end"], span["phrase"], item["label"])
+        for item in compliance_report.get("items", [])
+        if not item["passed"] and _is_sentence_local(item)
+        for span in item["details"]["spans"]
+    ]
+    spans.sort()
+    flagged = []
+    if not spans:
+        return flagged
+    # Hits are assigned to sentences in a single merge pass
+    k = 0
+    for start, end in split_sentences(narrative):
+        while k < len(spans) and spans[k][0] < start:
+            k += 1
+        hits = {}  # item label -> phrases found in this sentence
+        while k < len(spans) and spans[k][0] < end:
+            phrases = hits.setdefault(spans[k][3], [])
+            if spans[k][2] not in phrases:
+                phrases.append(spans[k][2])
+            k += 1
+        if hits:
+            flagged.append({
+                "id": len(flagged) + 1,
+                "start": start,
+                "end": end,
+                "text": narrative[start:end],
+                "issues": [f"{label} — found: " + ", ".join(f'"{p}"' for p in phrases)
+                           for label, phrases in hits.items()],
+            })
+    return flagged
+
+
+def can_fix_targeted(compliance_report: dict) -> bool:
+    """True when every failed item can be repaired by rewriting individual sentences."""
+    failed = [i for i in compliance_report.get("items", []) if not i["passed"]]
+    return bool(failed) and all(_is_sentence_local(i) for i in failed)
+
+
+def build_targeted_fix_prompt(flagged: list) -> str:
     """
-    report = run_compliance_checklist(narrative, extracted_5ws)
-
-    st.subheader("Compliance Checklist")
-    st.markdown("**Overall Status:** " + ("✅ **PASS**" if report["overall"] else "❌ **FAIL**"))
-    st.caption(
-        f"5Ws Counts — Who: {report['five_ws_counts'].get('Who',0)}, "
-        f"What: {report['five_ws_counts'].get('What',0)}, "
-        f"When: {report['five_ws_counts'].get('When',0)}, "
-        f"Where: {report['five_ws_counts'].get('Where',0)}, "
-        f"Why: {report['five_ws_counts'].get('Why',0)} | "
-        f"Narrative length: {report['length']} chars"
+    Builds a prompt that sends only the failing sentences and asks for sentence-level replacements as JSON.
+    """
+    sentences_str = "\n".join(
+        f"{f['id']}. {f['text']}\n   Issue: {' '.join(f['issues'])}" for f in flagged
     )
+    return f"""
+You are an expert AML analyst assistant specializing in Suspicious Activity Report (SAR) drafting and compliance with FinCEN guidelines.
 
-    # Row renderer with color-coded badges and inline remediation
-    def row(item):
-        passed = item["passed"]
-        badge_bg = "#dcfce7" if passed else "#fee2e2"   # green/red light backgrounds
-        badge_bd = "#22c55e" if passed else "#ef4444"   # green/red borders
-        badge_tx = "#065f46" if passed else "#7f1d1d"   # green/red text
-
-        col_ck, col_lbl, col_rem = st.columns([0.10, 0.45, 0.45], vertical_alignment="center")
-
-        with col_ck:
-            # Disabled checkbox communicates pass/fail
-            st.checkbox(label="", value=passed, disabled=True, key=f"ck_{item['key']}")
-
-        with col_lbl:
-            st.markdown(
-                f'<div style="background:{badge_bg};border:1px solid {badge_bd};margin:10px;'
-                f'border-radius:6px;padding:8px 10px;font-weight:600;'
-                f'color:{badge_tx};display:inline-block;">'
-                f'{"PASS" if passed else "FAIL"} — {html.escape(item["label"])}'
-                f'</div>',
-                unsafe_allow_html=True
-            )
+The following sentences from a SAR narrative failed compliance checks. Rewrite ONLY these sentences to fix the listed issue while keeping every fact, amount (in backticks), date and name unchanged.
 
-        with col_rem:
-            if not passed:
-                st.markdown(
-                    '<div style="background:#b86600;border-left:4px solid #f59e0b;'
-                    'padding:8px 10px;border-radius:4px;white-space:pre-wrap;">'
-                    '<b>Remediation:</b> '
-                    + html.escape(item["remediation"]) +
-                    '</div>',
-                    unsafe_allow_html=True
-                )
-            else:
-                st.markdown("<div style='color:#aaf0dc'>—</div>", unsafe_allow_html=True)
+SENTENCES TO FIX:
+{sentences_str}
+
+Respond with ONLY a JSON array, one object per sentence, in the form:
+[{{"id": 1, "text": "rewritten sentence"}}]
+Do not include any additional commentary or explanations.
+"""
+
+
+def targeted_fix_max_tokens(flagged: list) -> int:
+    # 1 token per 3 chars of the flagged text (English averages ~4, so rewrites that come out a little
+    # longer, and amounts/IDs that tokenize densely, still fit) plus JSON overhead per sentence
+    return min(1000, 50 + sum(len(f["text"]) // 3 + 20 for f in flagged))
 
-    # Render all items
-    for it in report["items"]:
-        row(it)
 
+def parse_sentence_replacements(response: str) -> dict:
+    """
+    Parse the LLM's JSON array of sentence replacements into {id: text}.
+    Raises ValueError if the response is not a JSON array of id/text objects.
+    """
+    text = (response or "").strip()
+    # Tolerate a fenced ```json block or a short preamble around the array
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("No JSON array found in the LLM response")
+    items = json.loads(text[start:end + 1])
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of replacements")
+    return {int(i["id"]): str(i["text"]).strip() for i in items if isinstance(i, dict) and "id" in i and "text" in i}
+
+
+def apply_sentence_replacements(narrative: str, flagged: list, replacements: dict) -> str:
+    """Splice replacement sentences into the narrative, leaving everything else byte-for-byte unchanged."""
+    out = narrative
+    # Right-to-left so earlier spans stay valid
+    for f in sorted(flagged, key=lambda f: f["start"], reverse=True):
+        new_text = replacements.get(f["id"])
+        if new_text is not None:
+            out = out[:f["start"]] + new_text + out[f["end"]:]
+    return out
+
+
+def render_compliance_checklist_ui(narrative: str, extracted_5ws: dict, report: dict = None, selected_facts=None,
+                                   rules=None):
+    """
+    Streamlit UI:
+      - PASS/FAIL mark and color-coded badge (green/red) per item.
+      - Inline remediation text shown on the same row when an item fails.
+      - The narrative with the spans behind failed items highlighted.
+    The checklist is emitted as a single pre-rendered HTML element (see checklist_view), so the
+    number of elements sent per rerun does not grow with the number of rules.
+    A precomputed `report` (e.g. from an IncrementalChecklist) is rendered as-is.
+    """
+    if report is None:
+        report = run_compliance_checklist(narrative, extracted_5ws, selected_facts, rules=rules)
+
+    st.subheader("Compliance Checklist")
+    st.html(render_checklist_html(report, narrative))
     return report
 
+def _commit_compliance_edit():
+    # Runs only when the analyst changes the text area, so reruns and stale text never create versions
+    log_revision(st.session_state, st.session_state.human_edited_narrative, "compliance_edit")
+
+
 def run_page():
     st.markdown("# Compliance Checklist")
     # If a fixed narrative was saved in the previous run, apply it BEFORE rendering widgets
@@ -275,13 +229,9 @@ def run_page():
             # Update both canonical narrative keys for downstream pages
             st.session_state.human_edited_narrative = fixed_text
             st.session_state.analyst_edited_narrative = fixed_text
-            # Invalidate any previously prepared export so it can't show stale content
-            try:
-                st.session_state.pop('export_ready', None)
-                st.session_state.pop('export_files', None)
-                st.session_state.pop('pdf_generation_success', None)
-            except Exception:
-                pass
+            log_revision(st.session_state, fixed_text, "ai_fix", event="AI fix applied")
+            # Invalidate any previously prepared export (and its temp file) so it can't show stale content
+            discard_export(st.session_state)
         # Clear the flag to avoid reapplying repeatedly
         st.session_state.apply_fixed_narrative = False
 
@@ -323,6 +273,7 @@ Typical compliance criteria for a SAR narrative include:
 
 *   **5Ws Present:** Ensures that Who, What, When, Where, and Why are clearly addressed.
 *   **Chronology:** Verifies that events are presented in a logical, time-ordered sequence.
+*   **Facts Supported:** Verifies that every amount and date cited in the narrative appears in the selected facts.
 *   **Clarity and Conciseness:** Checks for unambiguous language and avoidance of jargon where possible.
 *   **No Speculation:** Confirms that the narrative relies solely on facts and avoids assumptions, inferences of guilt, or unproven statements.
 *   **Length Bounds:** Ensures the narrative falls within specified word or character limits.
@@ -331,7 +282,8 @@ Typical compliance criteria for a SAR narrative include:
 For example:
 
 *   **5Ws Check:** This can be validated by ensuring the `extracted_5ws` dictionary contains values for each 'W'.
-*   **Chronology Check:** A basic check might assume chronology is present if the narrative includes multiple timestamps in ascending order. More advanced checks could use NLP to verify temporal ordering.
+*   **Chronology Check:** The dates cited within each paragraph must appear in ascending order (the closing date of a "between X and Y" range is exempt).
+*   **Facts Check:** Backticked amounts and dates in the narrative are looked up in indexes built from `selected_facts`; totals and other aggregates are not matched against single facts.
 *   **Speculation Check:** This involves searching for speculative phrases (e.g., "might have been", "could be interpreted as") in the narrative. If any are found, the check fails.
 
 This automated checklist speeds up the review process and provides objective feedback, highlighting areas that require further attention before submission.
@@ -345,24 +297,59 @@ This automated checklist speeds up the review process and provides objective fee
         value=st.session_state.human_edited_narrative,
         height=400,
         key="human_edited_narrative",
+        on_change=_commit_compliance_edit,
     )
     
     
-    if st.button("Run Compliance Checklist"):
-        compliance_report = render_compliance_checklist_ui(edited_narrative, five_ws)
-        st.session_state.compliance_checklist_results = compliance_report
-        st.markdown("")
-        st.markdown("The compliance checklist report provides a clear pass/fail status for each critical criterion. This immediate feedback helps analysts understand where the narrative stands in terms of regulatory readiness.")
-        st.markdown("""
-Now head to the `Export & Audit` page to export the SAR.                
-                    """,
-                    unsafe_allow_html=True
-                )
+    pack_names = list_packs()
+    pack_name = st.selectbox(
+        "Rule pack",
+        pack_names,
+        index=pack_names.index(DEFAULT_RULE_PACK) if DEFAULT_RULE_PACK in pack_names else 0,
+        key="rule_pack",
+        help="Checklist rules for the filing program. Packs are reloaded automatically when their files change.",
+    )
+    try:
+        pack = get_pack(pack_name)
+    except (ValueError, OSError) as e:
+        st.error(f"Could not load rule pack '{pack_name}': {e}")
+        return
+    if pack.description:
+        st.caption(pack.description)
 
-    # Auto-run the compliance checklist after saving a fixed narrative
-    if st.session_state.get('auto_run_checklist'):
-        compliance_report = render_compliance_checklist_ui(edited_narrative, five_ws)
+    live = st.checkbox(
+        "Check as I edit (re-runs the checklist whenever the narrative changes)",
+        value=True,
+        key="live_compliance_check",
+    )
+    run_clicked = st.button("Run Compliance Checklist")
+
+    # Live mode re-checks on every rerun; the auto-run flag is set after saving a fixed narrative
+    if live or run_clicked or st.session_state.get('auto_run_checklist'):
+        # Only rules whose inputs (narrative text, 5Ws) changed since the last run are re-evaluated
+        if 'incremental_checklist' not in st.session_state:
+            st.session_state.incremental_checklist = IncrementalChecklist()
+        checklist = st.session_state.incremental_checklist
+        compliance_report = checklist.run(edited_narrative, five_ws, selected_facts, rules=pack.rules)
+        render_compliance_checklist_ui(edited_narrative, five_ws, report=compliance_report, rules=pack.rules)
+        timing = checklist.last_run
+        st.caption(
+            f"Checked in {timing['elapsed_ms']:.1f} ms — re-evaluated: {', '.join(timing['evaluated']) or 'none'}; "
+            f"unchanged: {', '.join(timing['reused']) or 'none'}"
+        )
+        if timing['elapsed_ms'] > LIVE_CHECK_BUDGET_MS:
+            st.warning(f"The checklist took longer than the {LIVE_CHECK_BUDGET_MS} ms live-check budget.")
         st.session_state.compliance_checklist_results = compliance_report
+        # Live mode re-checks on every rerun: log a run when requested, or once per narrative version,
+        # pack and outcome
+        failed = [item["label"] for item in compliance_report["items"] if not item["passed"]]
+        version = len(st.session_state.narrative_versions) - 1
+        run_key = (version, pack_name, compliance_report["overall"], tuple(failed))
+        if run_clicked or st.session_state.get('logged_checklist_run') != run_key:
+            log_event(st.session_state, "Compliance checklist run",
+                      status="PASS" if compliance_report["overall"] else "FAIL",
+                      failed=failed, rule_pack=pack_name, version=version)
+            st.session_state.logged_checklist_run = run_key
         st.markdown("")
         st.markdown("The compliance checklist report provides a clear pass/fail status for each critical criterion. This immediate feedback helps analysts understand where the narrative stands in terms of regulatory readiness.")
         st.markdown("""
@@ -384,22 +371,55 @@ Now head to the `Export & Audit` page to export the SAR.
         
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
+            targeted = st.checkbox(
+                "Targeted repair (rewrite only the failing sentences when possible)",
+                value=True,
+                key="targeted_fix",
+            )
             if st.button("🔧 Fix it with AI", type="primary", use_container_width=True):
                 # Use the current edited narrative bound to session state
                 current_narrative = st.session_state.get('human_edited_narrative', '')
                 compliance_report = st.session_state.compliance_checklist_results
-                
-                # Build the prompt for fixing
-                fix_prompt = build_fix_prompt(current_narrative, compliance_report)
-                
-                # Call the LLM to get the fixed narrative
-                with st.spinner("🤖 AI is analyzing and fixing the narrative..."):
-                    st.session_state.fixed_narrative = call_llm(fix_prompt)
+
+                try:
+                    # Prefer a targeted repair (only the failing sentences) when all failures are sentence-local
+                    flagged = find_flagged_sentences(current_narrative, compliance_report) if targeted else []
+                    fixed = None
+                    if flagged and can_fix_targeted(compliance_report):
+                        with st.spinner(f"🤖 AI is rewriting {len(flagged)} flagged sentence(s)..."):
+                            response = call_llm(build_targeted_fix_prompt(flagged), max_tokens=targeted_fix_max_tokens(flagged))
+                        try:
+                            replacements = parse_sentence_replacements(response)
+                            fixed = apply_sentence_replacements(current_narrative, flagged, replacements)
+                            st.session_state.fix_summary = (
+                                f"Targeted repair: rewrote {len(replacements)} of {len(split_sentences(current_narrative))} sentences."
+                            )
+                        except (ValueError, KeyError, TypeError):
+                            st.warning("Could not parse sentence-level fixes; falling back to a full rewrite.")
+
+                    if fixed is None:
+                        # Build the prompt for fixing
+                        fix_prompt = build_fix_prompt(current_narrative, compliance_report)
+
+                        # Call the LLM to get the fixed narrative
+                        with st.spinner("🤖 AI is analyzing and fixing the narrative..."):
+                            fixed = call_llm(fix_prompt)
+                        st.session_state.fix_summary = "Full rewrite of the narrative."
+                    st.session_state.fixed_narrative = fixed
+                    log_event(st.session_state, "AI fix generated", summary=st.session_state.fix_summary,
+                              failed=[item["label"] for item in compliance_report["items"] if not item["passed"]])
+                except (LLMUnavailable, requests.RequestException) as e:
+                    st.warning(
+                        f"The LLM is unavailable ({e}). The narrative was not changed; "
+                        "please try again or apply the remediation manually."
+                    )
 
         # Persistently render the AI-fixed section if available so Save works after rerun
         if st.session_state.get('fixed_narrative'):
             st.markdown("### ✅ AI-Fixed Narrative")
             st.markdown("*Review the improved narrative below:*")
+            if st.session_state.get('fix_summary'):
+                st.caption(st.session_state.fix_summary)
             # Allow small tweaks before saving
             updated_fixed = st.text_area(
                 "Fixed SAR Narrative:",
@@ -1,14 +1,30 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 
 
-import os, requests
+import os, requests, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 load_dotenv()
-from tenacity import retry, stop_after_attempt, wait_exponential
+from application_pages.audit_log import log_revision
+from application_pages.llm_client import LLM_MODEL, chat_completion, stream_chat_completion, LLMUnavailable, latency_tracker
+from application_pages.rule_packs import DEFAULT_RULE_PACK, get_pack
+from application_pages.template_draft import render_template_draft, TEMPLATE_LABEL
 
 LLM_API_URL = os.getenv("LLM_API_URL", "https://api.openai.com/v1/chat/completions")      # Placeholder URL
 LLM_API_KEY = os.getenv("LLM_API_KEY", os.environ.get("OPENAI_API_KEY"))      # Placeholder Key
+DRAFT_DEADLINE_S = float(os.getenv("SAR_DRAFT_DEADLINE_S", "45"))  # per draft request, retries included
+
+# ---- Hierarchical drafting tunables ----
+HIERARCHICAL_THRESHOLD = int(os.getenv("SAR_HIERARCHICAL_THRESHOLD", "50"))  # facts above this use map-reduce
+CHUNK_SIZE = int(os.getenv("SAR_CHUNK_SIZE", "50"))        # facts per map-step summary
+FAN_OUT = int(os.getenv("SAR_FAN_OUT", "16"))              # concurrent LLM calls per level
+MAX_REDUCE_INPUTS = int(os.getenv("SAR_MAX_REDUCE_INPUTS", "16"))  # summaries merged per reduce call
+MAX_5WS_ITEMS = 10                                          # 5Ws values listed per key in the reduce prompt
+
+# ---- Hedged drafting tunables ----
+HEDGE_TEMPERATURES = (0.2, 0.5, 0.8)                        # one concurrent candidate per temperature
 
 def build_prompt(case_data, extracted_5ws):
     # Compose a chronological, fact-focused, speculative-free prompt.
@@ -38,24 +54,350 @@ Make sure the amounts are included in backticks. For example, `$40`, `$232` and
 It should include details about the customer, their transactions, and the alert received. It should clearly state who, what, when, where, and why, based on the provided facts, and must avoid speculation.
 """
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-def call_llm(prompt: str) -> str:
+def call_llm(prompt: str, temperature: float = 0.2) -> str:
     if not LLM_API_KEY or LLM_API_KEY == "":
         print("Warning: LLM_API_URL or LLM_API_KEY not set. Using a dummy response.")
         return "An analysis of Customer 7, a US resident with a high-risk score of 82, revealed three suspicious transactions in one month. On February 7, 2023, they made a transaction of $810.94. This was followed by a second transaction of $480.43 on February 17, 2023, and a third of $624.92 on March 7, 2023. These transactions involved different geographic locations across the US. The frequency, pattern, and high-risk score raise concerns about potential money laundering and require further investigation and monitoring. A Suspicious Activity Report (SAR) has been filed to report this activity."
 
-    headers = {"Authorization": f"Bearer {LLM_API_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": "gpt-4o",   # configure per your provider, e.g., "gpt-4o-mini", "gemini-pro"
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.2,
-        "max_tokens": 600
+    # Retries, hedging and the deadline are handled by the shared client
+    return chat_completion(prompt, temperature=temperature, max_tokens=600,
+                           deadline_s=DRAFT_DEADLINE_S, endpoint="draft_sar")
+
+
+def stream_llm(prompt: str, temperature: float = 0.2):
+    # Yields the draft as it is generated; same deadline as call_llm
+    return stream_chat_completion(prompt, temperature=temperature, max_tokens=600,
+                                  deadline_s=DRAFT_DEADLINE_S, endpoint="draft_sar")
+
+
+def sort_facts_chronologically(facts):
+    """Splits facts into undated profile facts and dated facts sorted by timestamp.
+
+    The sort is stable (ties keep their original order), so the same facts always
+    produce the same chunks and therefore the same prompts.
+
+    Args:
+        facts (list of dict): The curated facts for the case.
+
+    Returns:
+        tuple: (profile_facts, dated_facts) where dated_facts is sorted earliest first.
+    """
+    profile, dated = [], []
+    for idx, fact in enumerate(facts):
+        ts = pd.to_datetime(fact.get('timestamp'), errors='coerce') if isinstance(fact, dict) else pd.NaT
+        if pd.isnull(ts):
+            profile.append(fact)
+        else:
+            dated.append((ts, idx, fact))
+    dated.sort(key=lambda t: (t[0], t[1]))
+    return profile, [fact for _, _, fact in dated]
+
+
+def chunk_facts(facts, chunk_size=CHUNK_SIZE):
+    """Splits an ordered list of facts into consecutive chunks of at most `chunk_size`."""
+    chunk_size = max(1, int(chunk_size))
+    return [facts[i:i + chunk_size] for i in range(0, len(facts), chunk_size)]
+
+
+def build_chunk_summary_prompt(chunk, index, total):
+    # Map step: condense one chronological slice of facts without losing figures.
+    facts_formatted = "\n".join(str(fact) for fact in chunk)
+    return f"""
+You are assisting an AML analyst to summarize one segment of a large case for a SAR narrative.
+This is segment {index + 1} of {total}; segments are in chronological order.
+Summarize the facts below as a short chronological list.
+Keep every date, amount and identifier exactly as given, with amounts in backticks (e.g. `$40.00`).
+Group repeated, similar activity (e.g. "12 transfers between `$10.00` and `$95.00` from 2023-01-02 to 2023-01-09").
+Do not speculate, infer intent or add facts that are not listed.
+
+Facts:
+{facts_formatted}
+"""
+
+
+def build_merge_summary_prompt(summaries, index, total):
+    # Intermediate reduce step used when there are too many segment summaries for one prompt.
+    joined = "\n\n".join(f"Segment {i + 1}:\n{s}" for i, s in enumerate(summaries))
+    return f"""
+You are assisting an AML analyst to merge consecutive segment summaries of a large case.
+This is group {index + 1} of {total}; groups and segments are in chronological order.
+Merge the summaries below into one chronological summary.
+Keep every date, amount and identifier exactly as given, with amounts in backticks.
+Do not speculate, infer intent or add facts that are not listed.
+
+{joined}
+"""
+
+
+def condense_5ws(extracted_5ws, max_items=MAX_5WS_ITEMS):
+    """Caps each 5Ws list so the reduce prompt stays bounded for very large cases."""
+    condensed = {}
+    for key, values in extracted_5ws.items():
+        values = list(values)
+        if key == 'When' and len(values) > max_items:
+            # Keep the covered period rather than an arbitrary prefix of timestamps
+            condensed[key] = [f"{len(values)} timestamps from {min(values)} to {max(values)}"]
+        elif len(values) > max_items:
+            condensed[key] = values[:max_items] + [f"... and {len(values) - max_items} more"]
+        else:
+            condensed[key] = values
+    return condensed
+
+
+def draft_hierarchical(facts, extracted_5ws, llm=None, chunk_size=CHUNK_SIZE,
+                       fan_out=FAN_OUT, max_reduce_inputs=MAX_REDUCE_INPUTS):
+    """Drafts a SAR narrative for large cases with a map-reduce over the facts.
+
+    Dated facts are sorted chronologically and chunked; each chunk is summarized by
+    the LLM in parallel (up to `fan_out` requests in flight). If there are more than
+    `max_reduce_inputs` summaries, they are merged level by level the same way. The
+    final summaries are then drafted into the narrative with `build_prompt`.
+
+    Results are always collected in chunk order, so the final prompt is identical
+    regardless of which LLM call finishes first.
+
+    Args:
+        facts (list of dict): The curated facts for the case.
+        extracted_5ws (dict): The 5Ws extracted from the facts.
+        llm (callable, optional): Function mapping a prompt to a completion. Defaults to `call_llm`.
+        chunk_size (int): Facts per map-step prompt.
+        fan_out (int): Maximum number of concurrent LLM calls.
+        max_reduce_inputs (int): Maximum number of summaries combined in one prompt.
+
+    Returns:
+        dict: The narrative, the final reduce prompt and per-level call counts.
+    """
+    llm = llm or call_llm
+    profile, dated = sort_facts_chronologically(facts)
+    chunks = chunk_facts(dated, chunk_size)
+    levels = []
+
+    with ThreadPoolExecutor(max_workers=max(1, int(fan_out))) as pool:
+        # Map: executor.map yields results in submission order -> deterministic output
+        prompts = [build_chunk_summary_prompt(c, i, len(chunks)) for i, c in enumerate(chunks)]
+        summaries = list(pool.map(llm, prompts))
+        levels.append(len(prompts))
+
+        # Intermediate reduce: merge neighbouring summaries until one prompt can hold them
+        max_reduce_inputs = max(2, int(max_reduce_inputs))
+        while len(summaries) > max_reduce_inputs:
+            groups = chunk_facts(summaries, max_reduce_inputs)
+            prompts = [build_merge_summary_prompt(g, i, len(groups)) for i, g in enumerate(groups)]
+            summaries = list(pool.map(llm, prompts))
+            levels.append(len(prompts))
+
+    case_summary = "\n".join(str(fact) for fact in profile)
+    if summaries:
+        case_summary += ("\n\n" if case_summary else "") + "\n\n".join(
+            f"Chronological summary, part {i + 1} of {len(summaries)}:\n{s}" for i, s in enumerate(summaries)
+        )
+    final_prompt = build_prompt(case_summary, condense_5ws(extracted_5ws))
+    narrative = llm(final_prompt)
+    levels.append(1)
+
+    return {"narrative": narrative, "prompt": final_prompt, "calls_per_level": levels}
+
+
+def label_ai_draft(narrative):
+    # Every generated narrative must carry the AI-assisted label (template drafts keep their own)
+    if "AI-assisted" not in narrative and not narrative.startswith(TEMPLATE_LABEL):
+        narrative = "AI-assisted draft:\n" + narrative
+    return narrative
+
+
+def session_rules():
+    """Checklist rules of the rule pack selected in the session (see the Compliance page)."""
+    pack_name = st.session_state.get("rule_pack") or DEFAULT_RULE_PACK
+    try:
+        return get_pack(pack_name).rules
+    except (ValueError, OSError) as e:
+        st.warning(f"Could not load rule pack '{pack_name}' ({e}); checking drafts against the default pack.")
+        return None
+
+
+def _timed_call(llm, prompt, temperature):
+    start = time.perf_counter()
+    text = llm(prompt, temperature=temperature)
+    return text, time.perf_counter() - start
+
+
+def draft_hedged(prompt, extracted_5ws, temperatures=HEDGE_TEMPERATURES, llm=None, selected_facts=None, rules=None):
+    """Fires one draft request per temperature concurrently and returns the first compliant draft.
+
+    Each response is run through `run_compliance_checklist` as soon as it arrives.
+    The first candidate that passes wins and the remaining requests are cancelled
+    (queued ones are dropped; in-flight HTTP calls finish in the background and are
+    ignored). If no candidate passes, the candidate with the fewest failed items is
+    returned, preferring lower temperatures on ties.
+
+    Args:
+        prompt (str): The drafting prompt from `build_prompt`.
+        extracted_5ws (dict): The 5Ws passed to the compliance checklist.
+        temperatures (sequence of float): One candidate is requested per temperature.
+        llm (callable, optional): `llm(prompt, temperature=...)`. Defaults to `call_llm`.
+        selected_facts (list of dict, optional): Facts the candidates' amounts and dates are checked against.
+        rules (list, optional): Checklist rules of the session's rule pack. Defaults to the active pack.
+
+    Returns:
+        dict: narrative, report, winning temperature, per-candidate results and timings.
+            `sequential_s` estimates the sequential path hedging replaces: draft at the first
+            temperature, check it and, if it fails, one fix call and a re-check (see
+            `sequential_estimate`). It is None when the first-temperature call had not returned
+            by the time a winner was found; the sequential path then takes longer than `hedged_s`.
+    """
+    from application_pages.page_compliance_checklist import run_compliance_checklist
+
+    llm = llm or call_llm
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, len(temperatures)))
+    futures = {pool.submit(_timed_call, llm, prompt, t): (i, t) for i, t in enumerate(temperatures)}
+    candidates, winner = [], None
+    try:
+        for fut in as_completed(futures):
+            index, temperature = futures[fut]
+            try:
+                text, latency = fut.result()
+            except Exception as e:
+                candidates.append({"index": index, "temperature": temperature, "error": str(e)})
+                continue
+            narrative = label_ai_draft(text)
+            check_start = time.perf_counter()
+            report = run_compliance_checklist(narrative, extracted_5ws, selected_facts, rules=rules)
+            candidates.append({
+                "index": index,
+                "temperature": temperature,
+                "latency_s": latency,
+                "check_s": time.perf_counter() - check_start,
+                "arrived_s": time.perf_counter() - start,
+                "passed": report["overall"],
+                "failed_items": sum(not i["passed"] for i in report["items"]),
+                "narrative": narrative,
+                "report": report,
+            })
+            if report["overall"]:
+                winner = candidates[-1]
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    completed = [c for c in candidates if "report" in c]
+    if winner is None and completed:
+        winner = min(completed, key=lambda c: (c["failed_items"], c["index"]))
+    return {
+        "narrative": winner["narrative"] if winner else None,
+        "report": winner["report"] if winner else None,
+        "temperature": winner["temperature"] if winner else None,
+        "compliant": bool(winner and winner["passed"]),
+        "candidates": candidates,
+        "hedged_s": elapsed,
+        **sequential_estimate(completed),
     }
-    r = requests.post(LLM_API_URL, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    # Adjust the path below to your provider’s response schema:
-    return data["choices"][0]["message"]["content"].strip()
+
+
+def sequential_estimate(completed):
+    """Modelled time of the sequential path for the same case: generate -> check -> fix -> re-check.
+
+    The draft and first check are the measured latency and check time of the first-temperature
+    candidate (index 0). If that draft failed the checklist, the sequential path would go on to a
+    fix call and a re-check: the fix call is taken as the median latency of the "compliance_fix"
+    endpoint in this process, or the draft's own latency before any fix call has been made, and
+    the re-check as the first check's time.
+
+    Returns:
+        dict: `sequential_s` (None when the first-temperature candidate did not complete) and
+            `sequential_basis`, a short description of how it was obtained.
+    """
+    first = next((c for c in completed if c["index"] == 0), None)
+    if first is None:
+        return {"sequential_s": None, "sequential_basis": "first-temperature draft still running when hedging finished"}
+    total = first["latency_s"] + first["check_s"]
+    if first["passed"]:
+        return {"sequential_s": total, "sequential_basis": "draft + check (the first draft passed)"}
+    fix_s = latency_tracker.percentile("compliance_fix", 50)
+    basis = "draft + check + fix call (median of fix calls) + re-check"
+    if fix_s is None:
+        fix_s = first["latency_s"]
+        basis = "draft + check + fix call (assumed as long as the draft) + re-check"
+    return {"sequential_s": total + fix_s + first["check_s"], "sequential_basis": basis}
+
+
+def _ordered_unique(*columns):
+    """Interleaves aligned columns row by row, drops missing values and deduplicates in first-seen order.
+
+    Row-major interleaving keeps the per-fact order (a fact's name before its customer ID),
+    and dict keys act as an insertion-ordered set.
+    """
+    stacked = pd.concat(columns, axis=1, ignore_index=True).to_numpy(dtype=object).ravel()
+    return list(dict.fromkeys(pd.Series(stacked, dtype=object).dropna()))
+
+
+def _as_text(column):
+    # Integral floats (ints promoted by missing values) render without a trailing ".0"
+    if pd.api.types.is_float_dtype(column):
+        present = column.dropna()
+        if (present % 1 == 0).all():
+            return column.astype("Int64").astype(str).where(column.notna())
+    return column.astype(str).where(column.notna())
+
+
+def extract_5ws_frame(df):
+    """Extracts the 5Ws from a DataFrame of facts with column-wise operations.
+
+    Each fact is one row; a fact without a given field has a missing value in that column.
+    Values are formatted per column in one pass and deduplicated in first-seen order, so
+    the result matches a row-by-row extraction while scaling linearly with the number of facts.
+
+    Args:
+        df (pd.DataFrame): The curated facts for the case.
+
+    Returns:
+        dict: A dictionary containing the extracted 5Ws (empty categories omitted).
+    """
+    missing = pd.Series(pd.NA, index=df.index, dtype=object)
+
+    def col(name):
+        return df[name] if name in df.columns else missing
+
+    def fmt(column, template):
+        # Format each distinct value once, then broadcast back to the rows
+        present = column.dropna()
+        codes, uniques = pd.factorize(present)
+        formatted = np.array([template.format(v) for v in uniques], dtype=object)
+        return pd.Series(formatted[codes], index=present.index, dtype=object).reindex(df.index)
+
+    # Who
+    who = _ordered_unique(col('name'), "Customer ID " + _as_text(col('customer_id')))
+
+    # What
+    what = _ordered_unique(col('reason'), fmt(col('transaction_amount'), "Transaction amount of {:,.2f}"))
+
+    # When: parse all timestamps in one call; only values that don't match the inferred format are re-parsed
+    when = []
+    if 'timestamp' in df.columns:
+        raw = df['timestamp']
+        stamps = pd.to_datetime(raw, errors='coerce')
+        unparsed = stamps.isna() & raw.notna()
+        if unparsed.any():
+            stamps = stamps.astype(object)
+            stamps[unparsed] = pd.to_datetime(raw[unparsed], errors='coerce', format='mixed')
+            stamps = pd.to_datetime(stamps)
+        when = _ordered_unique(stamps.dt.strftime('%Y-%m-%d %H:%M:%S'))
+
+    # Where
+    lat, lon = col('origin_latitude'), col('origin_longitude')
+    both = lat.notna() & lon.notna()
+    lat_lon = (fmt(lat[both], "Lat: {:.2f}") + fmt(lon[both], ", Lon: {:.2f}")).reindex(df.index) if both.any() else missing
+    where = _ordered_unique(col('country'), lat_lon)
+
+    # Why (often inferred or directly from alert reasons/risk scores)
+    risk = col('risk_score')
+    high_risk = pd.to_numeric(risk, errors='coerce') >= 70
+    why = _ordered_unique(("High risk score (" + _as_text(risk) + ")").where(high_risk), col('reason'))
+
+    five_ws = {'Who': who, 'What': what, 'When': when, 'Where': where, 'Why': why}
+    # Clean up empty lists
+    return {k: v for k, v in five_ws.items() if v}
 
 
 def extract_5ws(case_data):
@@ -67,58 +409,18 @@ def extract_5ws(case_data):
     Returns:
         dict: A dictionary containing the extracted 5Ws.
     """
-    five_ws = {
-        'Who': [],
-        'What': [],
-        'When': [],
-        'Where': [],
-        'Why': []
-    }
-
-    if not case_data:
-        return five_ws
-
     if isinstance(case_data, pd.DataFrame):
-        records = case_data.to_dict('records')
+        df = case_data
     elif isinstance(case_data, list):
-        records = case_data
+        df = pd.DataFrame.from_records(case_data) if case_data else pd.DataFrame()
+    elif not case_data:
+        df = pd.DataFrame()
     else:
         raise TypeError("Unsupported data type for case_data. Expected list of dict or Pandas DataFrame.")
 
-    for fact in records:
-        # Extract Who
-        if 'name' in fact and fact['name'] not in five_ws['Who']:
-            five_ws['Who'].append(fact['name'])
-        if 'customer_id' in fact and f"Customer ID {fact['customer_id']}" not in five_ws['Who']:
-            five_ws['Who'].append(f"Customer ID {fact['customer_id']}")
-
-        # Extract What
-        if 'reason' in fact and fact['reason'] not in five_ws['What']:
-            five_ws['What'].append(fact['reason'])
-        if 'transaction_amount' in fact and f"Transaction amount of {fact['transaction_amount']:,.2f}" not in five_ws['What']:
-            five_ws['What'].append(f"Transaction amount of {fact['transaction_amount']:,.2f}")
-
-        # Extract When
-        if 'timestamp' in fact:
-            date_str = pd.to_datetime(fact['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-            if date_str not in five_ws['When']:
-                five_ws['When'].append(date_str)
-
-        # Extract Where
-        if 'country' in fact and fact['country'] not in five_ws['Where']:
-            five_ws['Where'].append(fact['country'])
-        if 'origin_latitude' in fact and 'origin_longitude' in fact and \
-           f"Lat: {{fact['origin_latitude']:.2f}}, Lon: {fact['origin_longitude']:.2f}" not in five_ws['Where']:
-            five_ws['Where'].append(f"Lat: {fact['origin_latitude']:.2f}, Lon: {fact['origin_longitude']:.2f}")
-
-        # Extract Why (often inferred or directly from alert reasons/risk scores)
-        if 'risk_score' in fact and fact['risk_score'] >= 70 and f"High risk score ({{fact['risk_score']}})" not in five_ws['Why']:
-            five_ws['Why'].append(f"High risk score ({fact['risk_score']})")
-        if 'reason' in fact and fact['reason'] not in five_ws['Why']:
-            five_ws['Why'].append(fact['reason'])
-
-    # Clean up empty lists
-    return {k: v for k, v in five_ws.items() if v}
+    if df.empty:
+        return {'Who': [], 'What': [], 'When': [], 'Where': [], 'Why': []}
+    return extract_5ws_frame(df)
 
 
 def run_page():
@@ -198,13 +500,97 @@ This structured approach minimizes risks associated with LLM usage in sensitive
 Now, let's generate the AI narrative for the selected facts and 5Ws.
 """, unsafe_allow_html=True)
     prompt = build_prompt(selected_facts, five_ws)
-    
+
+    use_hierarchical = False
+    if len(selected_facts) > HIERARCHICAL_THRESHOLD:
+        st.info(
+            f"This case has {len(selected_facts):,} facts, too many for a single prompt. "
+            "Hierarchical drafting summarizes chronological chunks of facts in parallel and then drafts the narrative from those summaries."
+        )
+        use_hierarchical = st.checkbox("Use hierarchical drafting", value=True)
+        fan_out = st.number_input("Parallel LLM calls (fan-out)", min_value=1, max_value=64, value=FAN_OUT)
+
+    use_hedged = False
+    if not use_hierarchical:
+        use_hedged = st.checkbox(
+            "Hedged drafting (request several candidates at once and keep the first one that passes the compliance checklist)",
+            value=False,
+        )
+        if use_hedged:
+            n_candidates = st.slider("Number of candidates", min_value=2, max_value=6, value=len(HEDGE_TEMPERATURES))
+            temperatures = tuple(round(0.2 + 0.6 * i / (n_candidates - 1), 2) for i in range(n_candidates))
+
+    # A background pre-draft for exactly these facts can be shown without waiting for the LLM
+    from application_pages.prefetch import draft_cache
+    cached = draft_cache.get(prompt)
+    if cached and not st.session_state.get('ai_draft_narrative'):
+        st.session_state.ai_draft_narrative = cached["narrative"]
+        log_revision(st.session_state, cached["narrative"], "ai_draft (prefetched)", event="AI draft generated", mode="prefetched")
+        st.info("This case was pre-drafted in the background. Click **Generate AI Narrative** to regenerate it.")
+        st.markdown("\n### AI-assisted Draft Narrative:")
+        st.markdown(cached["narrative"])
+
     if st.button("Generate AI Narrative"):
-        with st.spinner("Generating AI narrative..."):
-            ai_draft_narrative = call_llm(prompt)
-        if "AI-assisted" not in ai_draft_narrative:
-            ai_draft_narrative = "AI-assisted draft:\n" + ai_draft_narrative
+        # Deterministic draft built in milliseconds: shown immediately, and used if the LLM is unavailable
+        template_draft = render_template_draft(selected_facts, five_ws)
+        if not LLM_API_KEY:
+            st.info("LLM_API_KEY is not set, so the draft below was built from the facts with the template engine.")
+            ai_draft_narrative = template_draft
+            draft_mode = "template"
+        else:
+            draft_mode = "hierarchical" if use_hierarchical else "hedged" if use_hedged else "streaming"
+            try:
+                if use_hierarchical:
+                    with st.spinner("Generating AI narrative..."):
+                        result = draft_hierarchical(selected_facts, five_ws, fan_out=fan_out)
+                    ai_draft_narrative = result["narrative"]
+                    st.caption("LLM calls per level (map → reduce): " + " → ".join(map(str, result["calls_per_level"])))
+                elif use_hedged:
+                    with st.spinner("Generating AI narrative..."):
+                        result = draft_hedged(prompt, five_ws, temperatures=temperatures,
+                                              selected_facts=selected_facts, rules=session_rules())
+                    if result["narrative"] is None:
+                        raise LLMUnavailable("All draft candidates failed")
+                    ai_draft_narrative = result["narrative"]
+                    st.session_state.compliance_checklist_results = result["report"]
+                else:
+                    # Show the template draft as a placeholder until the first tokens arrive
+                    placeholder = st.empty()
+                    placeholder.markdown("*Template-based pre-draft (the AI draft is streaming in):*\n\n" + template_draft)
+                    ai_draft_narrative = ""
+                    for delta in stream_llm(prompt):
+                        ai_draft_narrative += delta
+                        placeholder.markdown(ai_draft_narrative + " ▌")
+                    placeholder.empty()
+                    if not ai_draft_narrative.strip():
+                        raise LLMUnavailable("The LLM returned an empty draft")
+            except (LLMUnavailable, requests.RequestException) as e:
+                st.warning(
+                    f"The LLM is unavailable ({e}). Showing the template-based draft built from the facts instead; "
+                    "you can edit it on the Human Review page or try again later."
+                )
+                ai_draft_narrative = template_draft
+                draft_mode = "template (LLM unavailable)"
+                use_hedged = False
+        ai_draft_narrative = label_ai_draft(ai_draft_narrative)
+        if use_hedged:
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Time to compliant draft (hedged)", f"{result['hedged_s']:.2f} s")
+            if result["sequential_s"] is None:
+                c2.metric("Sequential generate → check → fix (est.)", f"> {result['hedged_s']:.2f} s")
+            else:
+                c2.metric("Sequential generate → check → fix (est.)", f"{result['sequential_s']:.2f} s")
+            st.caption(f"Sequential estimate: {result['sequential_basis']}.")
+            c3.metric("Winning temperature", result["temperature"])
+            if not result["compliant"]:
+                st.warning("No candidate passed the compliance checklist; showing the one with the fewest failures.")
+            st.dataframe(pd.DataFrame([
+                {k: c.get(k) for k in ("index", "temperature", "latency_s", "check_s", "arrived_s", "passed", "failed_items", "error")}
+                for c in result["candidates"]
+            ]))
         st.session_state.ai_draft_narrative = ai_draft_narrative
+        log_revision(st.session_state, ai_draft_narrative, "ai_draft", event="AI draft generated", always=True,
+                     mode=draft_mode, model=None if draft_mode.startswith("template") else LLM_MODEL)
         st.markdown("\n### AI-assisted Draft Narrative:")
         st.markdown(ai_draft_narrative)
         st.divider()
@@ -230,4 +616,11 @@ Now move on to the `Human Review` page to edit the narrative.
         )
         
         
-        
\ No newline at end of file
+        
+
+    with st.expander("LLM latency by endpoint"):
+        stats = latency_tracker.snapshot()
+        if stats:
+            st.dataframe(pd.DataFrame(stats))
+        else:
+            st.caption("No LLM requests have completed yet in this server process.")
@@ -5,6 +5,8 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
+from application_pages.case_store import switch_case
+
 
 def create_geo_map_visualization(transactions):
     """Generates a geographic map visualization of transaction origins and destinations.
@@ -98,6 +100,42 @@ def create_counterparty_network_graph(transactions):
     return graph
 
 
+def find_case_records(customers, transactions, alerts, customer_id, alert_id=None, max_transactions=3):
+    """Looks up the records that make up one case.
+
+    Args:
+        customers, transactions, alerts (Pandas DataFrame): The case intake tables.
+        customer_id: The customer under review.
+        alert_id (optional): The alert that opened the case. Defaults to the customer's first alert.
+        max_transactions (int): Number of the customer's transactions to include.
+
+    Returns:
+        tuple: (customer_details dict, list of transaction dicts, alert dict); missing parts are empty.
+    """
+    customer_rows = customers[customers['customer_id'] == customer_id]
+    customer_details = customer_rows.to_dict('records')[0] if not customer_rows.empty else {}
+    customer_transactions = transactions[transactions['customer_id'] == customer_id].head(max_transactions).to_dict('records')
+    alert_rows = alerts[alerts['customer_id'] == customer_id]
+    if alert_id is not None:
+        alert_rows = alert_rows[alert_rows['alert_id'] == alert_id]
+    customer_alert = alert_rows.head(1).to_dict('records')[0] if not alert_rows.empty else {}
+    return customer_details, customer_transactions, customer_alert
+
+
+def combine_case_facts(customer_details, customer_transactions, customer_alert):
+    """Combines case records into the `selected_facts` list used for drafting."""
+    selected_facts = []
+    if customer_details:
+        selected_facts.append({"type": "Customer Info", **customer_details})
+
+    for i, trans in enumerate(customer_transactions):
+        selected_facts.append({"type": f"Transaction {i+1}", **trans})
+
+    if customer_alert:
+        selected_facts.append({"type": "Alert", **customer_alert})
+    return selected_facts
+
+
 def run_page():
     st.markdown("# Explore Data")
     
@@ -225,30 +263,24 @@ To simulate this process, we will manually select a few representative rows from
     # Find customer details
     st.write("Find customer details")
     focused_customer_id = st.selectbox("Choose a customer to focus on", customers['customer_id'].unique(), index=6)
-    customer_details = customers[customers['customer_id'] == focused_customer_id].to_dict('records')[0] if not customers[customers['customer_id'] == focused_customer_id].empty else {}
+    customer_details, customer_transactions, customer_alert = find_case_records(
+        customers, transactions, alerts, focused_customer_id
+    )
+    # Each customer/alert is its own case: resume it if it was saved, otherwise start it fresh
+    switch_case(st.session_state, focused_customer_id, customer_alert.get('alert_id'))
     st.dataframe(customer_details)
 
     # Find some transactions for this customer
     st.write("Find some transactions for this customer")
-    customer_transactions = transactions[transactions['customer_id'] == focused_customer_id].head(3).to_dict('records')
     st.dataframe(customer_transactions)
 
     # Find an alert for this customer
     st.write("Find an alert for this customer")
-    customer_alert = alerts[alerts['customer_id'] == focused_customer_id].head(1).to_dict('records')[0] if not alerts[alerts['customer_id'] == focused_customer_id].empty else {}
     st.dataframe(customer_alert)
 
     # Combine into selected_facts
     st.write("Combine into selected_facts")
-    selected_facts = []
-    if customer_details:
-        selected_facts.append({"type": "Customer Info", **customer_details})
-
-    for i, trans in enumerate(customer_transactions):
-        selected_facts.append({"type": f"Transaction {i+1}", **trans})
-
-    if customer_alert:
-        selected_facts.append({"type": "Alert", **customer_alert})
+    selected_facts = combine_case_facts(customer_details, customer_transactions, customer_alert)
 
     # If no specific customer data, just pick some random facts
     if not selected_facts:
@@ -1,6 +1,33 @@
 import streamlit as st
-import re, html
-from difflib import SequenceMatcher
+import re, html, time
+from functools import lru_cache
+
+from application_pages import diff_engine
+from application_pages.audit_log import log_revision
+from application_pages.paragraph_align import align_paragraphs
+
+# ---- Tunables ----
+DIFF_CACHE_SIZE = 16       # rendered diffs kept per process, so reruns of Human Review don't recompute them
+DIFF_CHUNK_CHARS = 60_000  # diffs with more HTML than this are shown in collapsible parts of about this size
+
+# One stylesheet for the diff; paragraphs and spans only carry class names
+DIFF_CSS = """<style>
+.sar-diff{white-space:pre-wrap;line-height:1.6}
+.sar-diff .p{margin:0 0 0.75rem 0}
+.sar-diff .c{border-radius:4px;padding:0.5rem}
+.sar-diff .l{display:block;font-size:0.85em;font-weight:600}
+.sar-diff .deleted{background:#6e0c0c;border:1px solid #f1a4a4;border-left:4px solid #f16b6b}
+.sar-diff .deleted .l{color:#b00000}
+.sar-diff .inserted{background:#0a3804;border:1px solid #96e096;border-left:4px solid #36b24a}
+.sar-diff .inserted .l{color:#0b5f16}
+.sar-diff .edited{background:#a18700;border:1px solid #f0e6a6;border-left:4px solid #e5cf45}
+.sar-diff .edited .l{color:#6b5d00}
+.sar-diff .moved{background:#0c2d57;border:1px solid #93c5fd;border-left:4px solid #3b82f6}
+.sar-diff .moved .l{color:#60a5fa}
+.sar-diff del{background:#691111;border:1px solid #f1a4a4;border-radius:3px;text-decoration:none}
+.sar-diff ins{background:#094f02;border:1px solid #96e096;border-radius:3px;text-decoration:none}
+.sar-diff del.ws,.sar-diff ins.ws{opacity:.8}
+</style>"""
 
 # ---------- helpers ----------
 def _tokenize_with_ws(text: str):
@@ -11,39 +38,54 @@ def _inline_diff_preserve_ws(a: str, b: str) -> str:
     """Inline diff (token-level) that preserves whitespace/newlines."""
     a_tokens = _tokenize_with_ws(a)
     b_tokens = _tokenize_with_ws(b)
-    sm = SequenceMatcher(None, a_tokens, b_tokens, autojunk=False)
-    parts = []
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+    return _render_inline_diff(a_tokens, b_tokens, diff_engine.opcodes(a_tokens, b_tokens))
+
+_WS_MARKS = str.maketrans({" ": "·", "\t": "→", "\n": "↵\n"})
+
+def _change_span(tag: str, text: str) -> str:
+    # A whitespace-only change is drawn with visible marks, so it is neither lost nor an empty-looking box
+    if text.strip():
+        return f'<{tag}>' + html.escape(text) + f'</{tag}>'
+    return f'<{tag} class="ws" title="whitespace change">' + html.escape(text.translate(_WS_MARKS)) + f'</{tag}>'
+
+def _render_inline_diff(a_tokens, b_tokens, ops) -> str:
+    """
+    Inline diff HTML from token opcodes. A run of changes separated only by whitespace becomes a
+    single <del> followed by a single <ins>, instead of alternating word-by-word spans. Both sides
+    follow the same rule: a side is marked only if the run changed it, and whitespace-only changes
+    are drawn with visible marks.
+    """
+    parts, deleted, inserted = [], [], []
+    changed = {"a": False, "b": False}   # whether the run deleted / inserted any tokens itself
+
+    def flush():
+        if changed["a"]:
+            parts.append(_change_span("del", "".join(deleted)))
+        if changed["b"]:
+            parts.append(_change_span("ins", "".join(inserted)))
+        elif inserted:
+            # Only the whitespace that joined the deletions: unchanged text of the new version
+            parts.append(html.escape("".join(inserted)))
+        deleted.clear()
+        inserted.clear()
+        changed["a"] = changed["b"] = False
+
+    for n, (tag, i1, i2, j1, j2) in enumerate(ops):
         if tag == "equal":
             seg = "".join(a_tokens[i1:i2])
-            parts.append(html.escape(seg))
-        elif tag == "delete":
-            seg = "".join(a_tokens[i1:i2])
-            parts.append(
-                '<del style="background:#691111;border:1px solid #f1a4a4;'
-                'border-radius:3px;text-decoration:none;">'
-                + html.escape(seg) + '</del>'
-            )
-        elif tag == "insert":
-            seg = "".join(b_tokens[j1:j2])
-            parts.append(
-                '<ins style="background:#094f02;border:1px solid #96e096;'
-                'border-radius:3px;text-decoration:none;">'
-                + html.escape(seg) + '</ins>'
-            )
-        elif tag == "replace":
-            old = "".join(a_tokens[i1:i2])
-            new = "".join(b_tokens[j1:j2])
-            parts.append(
-                '<del style="background:#691111;border:1px solid #f1a4a4;'
-                'border-radius:3px;text-decoration:none;">'
-                + html.escape(old) + '</del>'
-            )
-            parts.append(
-                '<ins style="background:#094f02;border:1px solid #96e096;'
-                'border-radius:3px;text-decoration:none;">'
-                + html.escape(new) + '</ins>'
-            )
+            if (deleted or inserted) and n + 1 < len(ops) and not seg.strip():
+                # Whitespace between two changes joins the run on both sides
+                deleted.append(seg)
+                inserted.append(seg)
+            else:
+                flush()
+                parts.append(html.escape(seg))
+        else:
+            deleted.extend(a_tokens[i1:i2])
+            inserted.extend(b_tokens[j1:j2])
+            changed["a"] = changed["a"] or i2 > i1
+            changed["b"] = changed["b"] or j2 > j1
+    flush()
     return "".join(parts)
 
 def _split_paragraphs(text: str):
@@ -58,107 +100,166 @@ def _split_paragraphs(text: str):
         return []
     return re.split(r'\n\s*\n+', text.strip('\n'))
 
+def _changed_block(kind: str, label: str, body_html: str) -> str:
+    # kind is one of the change classes in DIFF_CSS: deleted, inserted, edited, moved
+    return '<div class="p c ' + kind + '"><span class="l">' + html.escape(label) + '</span>' + body_html + '</div>'
+
+def _group_label(group: dict) -> str:
+    if len(group["b"]) > 1:
+        label = "Split paragraph"
+    elif len(group["a"]) > 1:
+        label = "Merged paragraphs"
+    else:
+        label = "Edited paragraph"
+    if group["moved"]:
+        moved = "Moved paragraph" if label == "Edited paragraph" else "Moved " + label[0].lower() + label[1:]
+        label = moved + (f" (was paragraph {group['a'][0] + 1}" + (", edited)" if group["ratio"] < 1 else ")"))
+    return label
+
+def _group_block(group: dict) -> str:
+    if group["ratio"] == 1 and len(group["a"]) == len(group["b"]):
+        body = html.escape("".join(group["b_tokens"]))   # moved unchanged
+    else:
+        body = _render_inline_diff(group["a_tokens"], group["b_tokens"], group["ops"])
+    return _changed_block("moved" if group["moved"] else "edited", _group_label(group), body)
+
 # ---------- main ----------
+def _diff_pieces(ai_draft: str, analyst_edited: str, replace_inline_threshold: float) -> list:
+    """(html, changed) per rendered paragraph of the diff, in reading order."""
+    a_pars = _split_paragraphs(ai_draft)
+    b_pars = _split_paragraphs(analyst_edited)
+
+    ops = diff_engine.opcodes(a_pars, b_pars)
+    groups = align_paragraphs(a_pars, b_pars, ops, _tokenize_with_ws, replace_inline_threshold)
+    group_of_a = {i: g for g in groups for i in g["a"]}
+    group_of_b = {j: g for g in groups for j in g["b"]}
+
+    def old_side(i):
+        # A paragraph of the draft with no in-place counterpart: deleted, or moved elsewhere
+        group = group_of_a.get(i)
+        if group is None:
+            return _changed_block("deleted", "Deleted paragraph", html.escape(a_pars[i]))
+        if i == group["a"][0]:
+            return _changed_block("moved", f"Paragraph {i + 1} moved (now paragraph {group['b'][0] + 1})", "")
+        return ""
+
+    def new_side(j):
+        group = group_of_b.get(j)
+        if group is None:
+            return _changed_block("inserted", "Inserted paragraph", html.escape(b_pars[j]))
+        return _group_block(group) if j == group["b"][0] else ""
+
+    out = []
+    for n, (tag, i1, i2, j1, j2) in enumerate(ops):
+        if tag == "equal":
+            # Same paragraph(s): render as-is (escaped)
+            out.extend(('<div class="p">' + html.escape(a_pars[k]) + '</div>', False) for k in range(i1, i2))
+            continue
+        # Changed region: walk both sides up to each in-place group, emitting the unmatched
+        # paragraphs (deletions before insertions) and then the group itself
+        in_place = sorted((g for g in groups if g["block"] == n and not g["moved"]), key=lambda g: g["b"][0])
+        i, j = i1, j1
+        for group in in_place + [None]:
+            i_stop = group["a"][0] if group else i2
+            j_stop = group["b"][0] if group else j2
+            out.extend((old_side(k), True) for k in range(i, i_stop))
+            out.extend((new_side(k), True) for k in range(j, j_stop))
+            if group:
+                out.append((_group_block(group), True))
+                i, j = group["a"][-1] + 1, group["b"][-1] + 1
+    return [piece for piece in out if piece[0]]
+
+
+@lru_cache(maxsize=DIFF_CACHE_SIZE)
+def diff_chunks(ai_draft: str, analyst_edited: str, replace_inline_threshold: float = 0.60) -> tuple:
+    """
+    The diff split at paragraph boundaries into parts of about DIFF_CHUNK_CHARS of HTML.
+    Each part is a dict with `html` (paragraph markup, to be wrapped in a "sar-diff" element
+    styled by DIFF_CSS) and `changes` (number of changed paragraphs). Cached per input pair.
+    """
+    chunks, current, size, changes = [], [], 0, 0
+    for piece, changed in _diff_pieces(ai_draft, analyst_edited, replace_inline_threshold):
+        if current and size + len(piece) > DIFF_CHUNK_CHARS:
+            chunks.append({"html": "".join(current), "changes": changes})
+            current, size, changes = [], 0, 0
+        current.append(piece)
+        size += len(piece)
+        changes += changed
+    if current:
+        chunks.append({"html": "".join(current), "changes": changes})
+    return tuple(chunks)
+
+
+@lru_cache(maxsize=DIFF_CACHE_SIZE)
 def highlight_changes(ai_draft: str, analyst_edited: str, replace_inline_threshold: float = 0.60) -> str:
     """
     Paragraph-aware HTML diff:
       - Deleted paragraphs: full block with red background.
       - Inserted paragraphs: full block with green background.
-      - Equal or similar (1:1) replaced paragraphs: inline diff preserving whitespace.
+      - Edited, split and merged paragraphs (similar enough): inline diff preserving whitespace.
+      - Moved paragraphs: shown where they now are (inline diff if also edited), with a marker
+        where they used to be.
+    Paragraphs and words are aligned with diff_engine (Myers/patience); paragraphs left unmatched
+    are re-paired by paragraph_align. Styling comes from the DIFF_CSS stylesheet included at the
+    top. Results are cached per input pair.
     """
     if ai_draft == analyst_edited:
         return "<p>No changes detected. The analyst's edited narrative is identical to the AI draft.</p>"
+    chunks = diff_chunks(ai_draft, analyst_edited, replace_inline_threshold)
+    return DIFF_CSS + '<div class="sar-diff">' + "".join(c["html"] for c in chunks) + "</div>"
 
-    a_pars = _split_paragraphs(ai_draft)
-    b_pars = _split_paragraphs(analyst_edited)
 
-    sm = SequenceMatcher(None, a_pars, b_pars, autojunk=False)
-    out = []
+def render_diff(ai_draft: str, analyst_edited: str):
+    """
+    Show the diff. Small diffs are one element; larger ones are split into collapsible parts that
+    are only rendered (and sent to the browser) while open.
+    """
+    if ai_draft == analyst_edited:
+        st.html(highlight_changes(ai_draft, analyst_edited))
+        return
+    chunks = diff_chunks(ai_draft, analyst_edited)
+    if len(chunks) == 1:
+        st.html(highlight_changes(ai_draft, analyst_edited))
+        return
+    st.html(DIFF_CSS)
+    st.caption(f"Large diff: {sum(c['changes'] for c in chunks)} changed paragraphs in {len(chunks)} parts. "
+               "Parts are rendered when expanded.")
+    for k, chunk in enumerate(chunks):
+        part = st.expander(
+            f"Part {k + 1} of {len(chunks)} — {chunk['changes']} changed paragraph{'s' if chunk['changes'] != 1 else ''}",
+            expanded=k == 0,
+            key=f"diff_part_{k}",
+            on_change="rerun",
+        )
+        if part.open:
+            part.html('<div class="sar-diff">' + chunk["html"] + '</div>')
 
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
-        if tag == "equal":
-            # Same paragraph(s): render as-is (escaped)
-            for k in range(i1, i2):
-                out.append(
-                    '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;">'
-                    + html.escape(a_pars[k]) + '</div>'
-                )
-
-        elif tag == "delete":
-            # Entire paragraphs removed
-            for k in range(i1, i2):
-                out.append(
-                    '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                    'background:#6e0c0c;border:1px solid #f1a4a4;border-left:4px solid #f16b6b;'
-                    'border-radius:4px;padding:0.5rem;">'
-                    '<span style="font-size:0.85em;color:#b00000;font-weight:600;">Deleted paragraph</span><br>'
-                    '<span style="text-decoration:none;">' + html.escape(a_pars[k]) + '</span>'
-                    '</div>'
-                )
-
-        elif tag == "insert":
-            # Entire paragraphs added
-            for k in range(j1, j2):
-                out.append(
-                    '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                    'background:#0a3804;border:1px solid #96e096;border-left:4px solid #36b24a;'
-                    'border-radius:4px;padding:0.5rem;">'
-                    '<span style="font-size:0.85em;color:#0b5f16;font-weight:600;">Inserted paragraph</span><br>'
-                    '<span style="text-decoration:none;">' + html.escape(b_pars[k]) + '</span>'
-                    '</div>'
-                )
-
-        elif tag == "replace":
-            # Paragraphs changed. If it's a one-to-one change and similar enough, do inline diff.
-            a_block = "\n\n".join(a_pars[i1:i2])
-            b_block = "\n\n".join(b_pars[j1:j2])
-
-            if (i2 - i1 == 1) and (j2 - j1 == 1):
-                # Single paragraph on both sides; decide inline vs block swap based on similarity
-                sim = SequenceMatcher(None, a_pars[i1], b_pars[j1], autojunk=False).ratio()
-                if sim >= replace_inline_threshold:
-                    out.append(
-                        '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                        'background:#a18700;border:1px solid #f0e6a6;border-left:4px solid #e5cf45;'
-                        'border-radius:4px;padding:0.5rem;">'
-                        '<span style="font-size:0.85em;color:#6b5d00;font-weight:600;">Edited paragraph</span><br>'
-                        + _inline_diff_preserve_ws(a_pars[i1], b_pars[j1]) +
-                        '</div>'
-                    )
-                else:
-                    # Treat as delete + insert blocks
-                    out.append(
-                        '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                        'background:#6e0c0c;border:1px solid #f1a4a4;border-left:4px solid #f16b6b;'
-                        'border-radius:4px;padding:0.5rem;">'
-                        '<span style="font-size:0.85em;color:#b00000;font-weight:600;">Deleted paragraph</span><br>'
-                        + html.escape(a_pars[i1]) + '</div>'
-                    )
-                    out.append(
-                        '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                        'background:#0a3804;border:1px solid #96e096;border-left:4px solid #36b24a;'
-                        'border-radius:4px;padding:0.5rem;">'
-                        '<span style="font-size:0.85em;color:#0b5f16;font-weight:600;">Inserted paragraph</span><br>'
-                        + html.escape(b_pars[j1]) + '</div>'
-                    )
-            else:
-                # Many-to-many change: show the whole replaced block as delete + insert
-                out.append(
-                    '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                    'background:#6e0c0c;border:1px solid #f1a4a4;border-left:4px solid #f16b6b;'
-                    'border-radius:4px;padding:0.5rem;">'
-                    '<span style="font-size:0.85em;color:#b00000;font-weight:600;">Deleted block</span><br>'
-                    + html.escape(a_block) + '</div>'
-                )
-                out.append(
-                    '<div style="white-space:pre-wrap;line-height:1.6;margin:0 0 0.75rem 0;'
-                    'background:#0a3804;border:1px solid #96e096;border-left:4px solid #36b24a;'
-                    'border-radius:4px;padding:0.5rem;">'
-                    '<span style="font-size:0.85em;color:#0b5f16;font-weight:600;">Inserted block</span><br>'
-                    + html.escape(b_block) + '</div>'
-                )
-
-    return '<div style="white-space:pre-wrap;line-height:1.6">' + "".join(out) + "</div>"
+
+def render_version_history(store):
+    """Revision list of the narrative, a diff between any two revisions, and restoring one."""
+    if len(store) < 2:
+        st.caption("Every saved narrative (AI draft, human review, compliance edits and AI fixes) is kept "
+                   "as a revision; a comparison appears here once there are two.")
+        return
+    history = store.history()
+    st.dataframe([
+        {"version": h["version"], "source": h["source"],
+         "saved at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(h["created_at"])),
+         "characters": h["length"], "stored as": h["stored_as"]}
+        for h in reversed(history)
+    ], hide_index=True)
+    labels = {h["version"]: f"v{h['version']} — {h['source']}" for h in history}
+    c1, c2 = st.columns(2)
+    old = c1.selectbox("From version", list(labels), index=len(labels) - 2, format_func=labels.get, key="version_from")
+    new = c2.selectbox("To version", list(labels), index=len(labels) - 1, format_func=labels.get, key="version_to")
+    a, b = store.checkout(old), store.checkout(new)
+    # Character opcodes from the store; slicing the texts gives the token runs the renderer joins
+    st.html(DIFF_CSS + '<div class="sar-diff"><div class="p">' + _render_inline_diff(a, b, store.diff(old, new)) + "</div></div>")
+    if st.button(f"Restore version {old} as the current narrative"):
+        st.session_state.human_edited_narrative = a
+        st.session_state.analyst_edited_narrative = a
+        log_revision(st.session_state, a, f"restore of v{old}", event="Version restored", restored_version=old)
+        st.rerun()
 
 
 def run_page():
@@ -207,6 +308,7 @@ Now you can edit the following narrative as an expert analyst would. For example
     
     if st.button("Save Human Edited Narrative"):
         st.session_state.human_edited_narrative = edited_narrative
+        log_revision(st.session_state, edited_narrative, "human_review")
         st.success("Human edited narrative saved successfully.")
     
     st.divider()
@@ -214,11 +316,13 @@ Now you can edit the following narrative as an expert analyst would. For example
     # show the changes
     st.markdown("## Changes")
 
-    highlighted_diff = highlight_changes(ai_draft_narrative, st.session_state.human_edited_narrative)
     
 
-    st.markdown("### Highlighted Changes (AI Draft vs. Analyst Edited - deletions in red, insertions in green)")
-    st.markdown(highlighted_diff, unsafe_allow_html=True)
+    st.markdown("### Highlighted Changes (AI Draft vs. Analyst Edited - deletions in red, insertions in green, edits in yellow, moves in blue)")
+    render_diff(ai_draft_narrative, st.session_state.human_edited_narrative)
+
+    st.markdown("### Version History")
+    render_version_history(st.session_state.narrative_versions)
 
     st.divider()
     st.markdown("""               
@@ -0,0 +1,212 @@
+"""
+Many-to-many paragraph alignment for the Human Review diff: moved, split and merged paragraphs.
+
+The paragraph-level diff only pairs paragraphs in order, so a paragraph that moved, or was split in
+two, shows up as unrelated deletions and insertions. This stage takes the paragraphs the diff left
+unmatched and re-pairs them:
+
+  1. Paragraphs moved without changes are paired by exact text.
+  2. Each remaining paragraph is sketched once: a MinHash signature of its word bigrams.
+  3. Locality-sensitive hashing on bands of the signatures yields candidate pairs in near-linear
+     time. Only the few most similar candidates of each paragraph (by estimated similarity) are
+     kept; the rest are dropped without diffing any text.
+  4. From the estimated similarity and the shingle counts the containment of one paragraph in
+     another is derived, which proposes splits (one old paragraph, consecutive new fragments) and
+     merges (the reverse).
+  5. Options are accepted greedily, best word-level similarity first, when it reaches the inline
+     threshold. Only options that can still win are diffed word by word (diff_engine).
+
+A group whose paragraphs all sit in the same changed region of the diff, in order, is an in-place
+edit, split or merge; any other accepted group is a move.
+"""
+import heapq
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from application_pages import diff_engine
+
+# ---- Tunables ----
+SKETCH_PERMUTATIONS = 32
+LSH_BANDS = 16                 # 16 bands of 2 rows: pairs with similarity above ~0.25 usually collide
+SHORTLIST_MIN_SIMILARITY = 0.2 # estimated Jaccard below which a candidate pair is never diffed
+SHORTLIST_PER_PARAGRAPH = 3    # most similar candidates kept per paragraph on each side
+FRAGMENT_CONTAINMENT = 0.6     # share of a fragment's shingles found in the whole for a split/merge
+MAX_BUCKET_PAIRS = 4096        # LSH buckets producing more pairs than this (boilerplate) are ignored
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0x5A12)
+_MUL = _rng.integers(1, _PRIME, SKETCH_PERMUTATIONS, dtype=np.int64)
+_ADD = _rng.integers(0, _PRIME, SKETCH_PERMUTATIONS, dtype=np.int64)
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str) -> set:
+    """Lower-cased word bigrams (single words for one-word paragraphs)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 2:
+        return set(words)
+    return {words[k] + " " + words[k + 1] for k in range(len(words) - 1)}
+
+
+class Sketch:
+    """MinHash signature of a paragraph's shingles, plus the number of distinct shingles."""
+
+    __slots__ = ("size", "signature")
+
+    def __init__(self, text: str):
+        grams = shingles(text)
+        self.size = len(grams)
+        if grams:
+            h = np.fromiter((zlib.crc32(g.encode("utf-8")) & _PRIME for g in grams), dtype=np.int64, count=len(grams))
+            self.signature = ((np.outer(_MUL, h) + _ADD[:, None]) % _PRIME).min(axis=1)
+        else:
+            self.signature = None
+
+    def similarity(self, other: "Sketch") -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        return float(np.count_nonzero(self.signature == other.signature)) / SKETCH_PERMUTATIONS
+
+    def shared(self, other: "Sketch", similarity: float) -> float:
+        """Estimated number of shingles the two paragraphs have in common."""
+        return similarity * (self.size + other.size) / (1 + similarity)
+
+
+def _candidate_pairs(a_sketches: dict, b_sketches: dict) -> set:
+    width = SKETCH_PERMUTATIONS // LSH_BANDS * 8   # bytes per band of an int64 signature
+    buckets = defaultdict(lambda: ([], []))
+    for side, sketches in ((0, a_sketches), (1, b_sketches)):
+        for idx, sketch in sketches.items():
+            if sketch.signature is None:
+                continue
+            raw = sketch.signature.tobytes()
+            for band in range(LSH_BANDS):
+                buckets[band, raw[band * width:(band + 1) * width]][side].append(idx)
+    pairs = set()
+    for a_ids, b_ids in buckets.values():
+        if a_ids and b_ids and len(a_ids) * len(b_ids) <= MAX_BUCKET_PAIRS:
+            pairs.update((i, j) for i in a_ids for j in b_ids)
+    return pairs
+
+
+def _runs(indices) -> list:
+    """Maximal runs of consecutive integers in a sorted list."""
+    runs = []
+    for k in indices:
+        if runs and runs[-1][-1] + 1 == k:
+            runs[-1].append(k)
+        else:
+            runs.append([k])
+    return runs
+
+
+def _crosses(g, h) -> bool:
+    before = g["a"][-1] < h["a"][0] and g["b"][-1] < h["b"][0]
+    after = h["a"][-1] < g["a"][0] and h["b"][-1] < g["b"][0]
+    return not (before or after)
+
+
+def align_paragraphs(a_pars: list, b_pars: list, ops: list, tokenize, threshold: float) -> list:
+    """
+    Pair up the paragraphs left unmatched by the paragraph opcodes `ops`.
+
+    Returns groups (dicts) with `a` and `b` (tuples of paragraph indices), `ratio` (token similarity
+    of the joined texts), the `a_tokens`, `b_tokens` and token `ops` of their inline diff, the
+    index of the changed region (`block`) and `moved`.
+    """
+    block_of_a, block_of_b = {}, {}
+    for n, (tag, i1, i2, j1, j2) in enumerate(ops):
+        if tag != "equal":
+            block_of_a.update(dict.fromkeys(range(i1, i2), n))
+            block_of_b.update(dict.fromkeys(range(j1, j2), n))
+    if not block_of_a or not block_of_b:
+        return []
+
+    # Unchanged paragraphs that moved are paired by their text
+    options = set()
+    a_by_text = defaultdict(list)
+    for i in block_of_a:
+        a_by_text[a_pars[i]].append(i)
+    b_rest = []
+    for j in block_of_b:
+        same = a_by_text.get(b_pars[j])
+        if same:
+            options.add(((same.pop(0),), (j,)))
+        else:
+            b_rest.append(j)
+    a_rest = [i for ids in a_by_text.values() for i in ids]
+
+    a_sketches = {i: Sketch(a_pars[i]) for i in a_rest}
+    b_sketches = {j: Sketch(b_pars[j]) for j in b_rest}
+    estimates = {}
+    for i, j in _candidate_pairs(a_sketches, b_sketches):
+        similarity = a_sketches[i].similarity(b_sketches[j])
+        if similarity >= SHORTLIST_MIN_SIMILARITY:
+            estimates[i, j] = similarity
+    # Keep the pairs that rank among the most similar candidates of their old or new paragraph
+    ranked_a, ranked_b = defaultdict(list), defaultdict(list)
+    for (i, j), similarity in estimates.items():
+        ranked_a[i].append((similarity, j))
+        ranked_b[j].append((similarity, i))
+    shortlist = set()
+    for i, cands in ranked_a.items():
+        shortlist.update((i, j) for _, j in sorted(cands, reverse=True)[:SHORTLIST_PER_PARAGRAPH])
+    for j, cands in ranked_b.items():
+        shortlist.update((i, j) for _, i in sorted(cands, reverse=True)[:SHORTLIST_PER_PARAGRAPH])
+
+    fragments_of_a, fragments_of_b = defaultdict(list), defaultdict(list)
+    for i, j in shortlist:
+        sa, sb = a_sketches[i], b_sketches[j]
+        options.add(((i,), (j,)))
+        shared = sa.shared(sb, estimates[i, j])
+        if shared >= FRAGMENT_CONTAINMENT * sb.size:
+            fragments_of_a[i].append(j)     # b[j] may be a piece of a[i]
+        if shared >= FRAGMENT_CONTAINMENT * sa.size:
+            fragments_of_b[j].append(i)     # a[i] may be a piece of b[j]
+    for i, js in fragments_of_a.items():
+        options.update(((i,), tuple(run)) for run in _runs(sorted(js)) if len(run) > 1)
+    for j, is_ in fragments_of_b.items():
+        options.update((tuple(run), (j,)) for run in _runs(sorted(is_)) if len(run) > 1)
+
+    # Accept options best similarity first. Each option is queued under a cheap upper bound of its
+    # similarity (shared token counts) and only word-diffed when it reaches the front of the queue
+    # with all its paragraphs still free, so options that lose to a better one are never diffed.
+    # Ties prefer the option covering more paragraphs, then text order.
+    queue = []
+    for a_ids, b_ids in options:
+        a_tokens = tokenize("\n\n".join(a_pars[i] for i in a_ids))
+        b_tokens = tokenize("\n\n".join(b_pars[j] for j in b_ids))
+        total = len(a_tokens) + len(b_tokens)
+        bound = 2 * sum((Counter(a_tokens) & Counter(b_tokens)).values()) / total if total else 1.0
+        if bound >= threshold:
+            heapq.heappush(queue, (-bound, False, -(len(a_ids) + len(b_ids)), a_ids, b_ids, a_tokens, b_tokens))
+
+    def ranked():
+        while queue:
+            score, exact, size, a_ids, b_ids, a_tokens, b_tokens = heapq.heappop(queue)
+            if used_a.intersection(a_ids) or used_b.intersection(b_ids):
+                continue
+            if exact:
+                yield {"a": a_ids, "b": b_ids, "ratio": -score, "a_tokens": a_tokens, "b_tokens": b_tokens,
+                       "ops": token_ops_of[a_ids, b_ids]}
+                continue
+            token_ops = diff_engine.opcodes(a_tokens, b_tokens)
+            r = diff_engine.ratio(token_ops, len(a_tokens), len(b_tokens))
+            if r >= threshold:
+                token_ops_of[a_ids, b_ids] = token_ops
+                heapq.heappush(queue, (-r, True, size, a_ids, b_ids, a_tokens, b_tokens))
+
+    groups, used_a, used_b, token_ops_of = [], set(), set(), {}
+    local = defaultdict(list)   # block -> accepted in-place groups
+    for g in ranked():
+        used_a.update(g["a"])
+        used_b.update(g["b"])
+        blocks = {block_of_a[i] for i in g["a"]} | {block_of_b[j] for j in g["b"]}
+        g["block"] = blocks.pop() if len(blocks) == 1 else None
+        g["moved"] = g["block"] is None or any(_crosses(g, h) for h in local[g["block"]])
+        if not g["moved"]:
+            local[g["block"]].append(g)
+        groups.append(g)
+    return groups
@@ -0,0 +1,523 @@
+"""
+PDF rendering of SAR export bundles, set up once per process.
+
+Everything that does not depend on the bundle is prepared when the renderer is created and reused
+by every report: the paragraph and table styles, the page template class, and the logo. The logo
+is decoded, compressed and encoded into a PDF image object once; each document gets a copy of
+that object instead of re-reading and re-encoding the PNG (which used to be most of the render
+time).
+
+Each report gets stable metadata: its report ID is derived from the bundle hash, so the same
+bundle always carries the same ID on every page (it used to be a new random ID per page). Rendered
+PDFs are memoized by bundle hash, so rebuilding an unchanged bundle returns the cached bytes.
+
+Large cases (thousands of facts or audit rows) use the scalable layout, whose memory stays flat as
+the case grows:
+
+  * facts and the audit trail are tables of at most TABLE_CHUNK_ROWS rows that split across pages
+    and repeat their header row; only cells too wide for their column become wrapping paragraphs;
+  * flowables are generated as the layout reaches them (`_FlowableStream`) instead of all up
+    front, so only a short look-ahead of them exists at any time;
+  * each page's content stream is compressed as soon as the page is finished (reportlab otherwise
+    holds every page uncompressed until the document is saved);
+  * the PDF is written to a temp file (`render_to_file`) rather than kept in memory.
+
+Temp files are removed when the session drops its export (see case_store.discard_export). Files
+left behind by sessions that ended, or by a server that stopped, are swept once they are older than
+PDF_TMP_MAX_AGE_S (`sweep_temp_files`, run when the renderer is created and before each new file).
+"""
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFImageXObject, PDFName, PDFStream
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas, _digester
+from reportlab.platypus import Flowable, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus.doctemplate import BaseDocTemplate
+
+# ---- Tunables ----
+PDF_CACHE_SIZE = int(os.getenv("SAR_PDF_CACHE_SIZE", "32"))   # rendered PDFs kept, by bundle hash
+REPORT_VERSION = "1.0"
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logo", "image.png")
+PDF_SCALABLE_ROWS = int(os.getenv("SAR_PDF_SCALABLE_ROWS", "500"))  # fact fields + audit rows that switch to the scalable layout
+PDF_TMP_DIR = os.getenv("SAR_PDF_TMP_DIR") or None   # temp files of the scalable layout (system default if unset)
+PDF_TMP_MAX_AGE_S = float(os.getenv("SAR_PDF_TMP_MAX_AGE_H", "24")) * 3600   # temp files older than this are swept
+PDF_TMP_PREFIX = "sar_report_"
+TABLE_CHUNK_ROWS = 200        # rows per table in the scalable layout
+FLOWABLE_LOOKAHEAD = 32       # flowables generated ahead of the layout
+
+FACT_COLUMNS = (("Fact", 1.8 * inch), ("Field", 1.6 * inch), ("Value", 3.1 * inch))
+AUDIT_COLUMNS = (("Timestamp", 1.5 * inch), ("Event", 1.7 * inch), ("Details", 3.3 * inch))
+CELL_FONT, CELL_FONT_SIZE, CELL_PADDING = "Helvetica", 9, 12
+
+BRAND_COLOR = colors.HexColor("#026caa")
+RULE_COLOR = colors.HexColor("#cccccc")
+
+
+def bundle_hash(json_data, title: str = "") -> str:
+    """sha256 of the bundle's canonical JSON (and the report title)."""
+    body = json.dumps({"title": title, "bundle": json_data}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def format_fact_value(key: str, value) -> str:
+    """A fact field as shown in the report: timestamps formatted, large amounts and numbers grouped."""
+    if "timestamp" in key.lower() and hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (int, float)) and value > 1000:
+        return f"${value:,.2f}" if "amount" in key.lower() else f"{value:,.4f}"
+    return str(value)
+
+
+AUDIT_HIDDEN_FIELDS = ("timestamp", "event", "seq", "hash", "prev_hash")   # own columns, or chain data of the log
+
+
+def audit_details(item: dict) -> str:
+    """The Details cell of an audit-trail row: the event's fields other than its columns and chain data."""
+    return ", ".join(f"{k}: {v}" for k, v in item.items() if k not in AUDIT_HIDDEN_FIELDS)
+
+
+def report_rows(json_data) -> int:
+    """Fact fields plus audit-trail rows of a bundle: what the size of its report grows with."""
+    facts = json_data.get("facts") or []
+    trail = json_data.get("audit_trail") or []
+    return sum(len(f) if isinstance(f, dict) else 1 for f in facts) + len(trail)
+
+
+def needs_scalable_layout(json_data) -> bool:
+    return report_rows(json_data) > PDF_SCALABLE_ROWS
+
+
+class _FlowableStream:
+    """
+    The list operations `BaseDocTemplate.build` uses (len, indexing, deletion, slice assignment,
+    insert) over an iterator of flowables. Flowables are pulled from the iterator only as the
+    layout reaches them, so at most FLOWABLE_LOOKAHEAD of them (plus split remainders) exist at
+    once. `len` is exact once the iterator is exhausted and a lower bound before that.
+    """
+
+    def __init__(self, flowables, lookahead: int = FLOWABLE_LOOKAHEAD):
+        self._source = iter(flowables)
+        self._buffer = []
+        self._lookahead = max(1, lookahead)
+
+    def _fill(self, n) -> None:
+        while self._source is not None and (n is None or len(self._buffer) < n):
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def _fill_for(self, index) -> None:
+        if isinstance(index, slice):
+            stop = index.stop
+            self._fill(None if stop is None or stop < 0 else stop)
+        else:
+            self._fill(None if index < 0 else index + 1)
+
+    def __len__(self) -> int:
+        self._fill(self._lookahead)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        self._fill_for(index)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._fill_for(index)
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        self._fill_for(index)
+        del self._buffer[index]
+
+    def insert(self, index: int, value) -> None:
+        self._buffer.insert(index, value)
+
+
+class _CompressingCanvas(Canvas):
+    """Canvas that compresses each page's content stream when the page is finished."""
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if page.stream and not page.Contents:
+            data = page.stream.encode("utf-8") if isinstance(page.stream, str) else page.stream
+            contents = PDFStream(content=zlib.compress(data))
+            contents.dictionary["Filter"] = PDFArray([PDFName("FlateDecode")])   # already applied
+            page.Contents, page.stream = contents, None
+
+
+class _ReportDocTemplate(BaseDocTemplate):
+    """Letter page with the report header (ID, title, version) and the footer on every page."""
+
+    def __init__(self, filename, report_title: str, report_id: str, version: str = REPORT_VERSION, **kwargs):
+        BaseDocTemplate.__init__(self, filename, **kwargs)
+        self.report_title = report_title
+        self.report_id = report_id
+        self.report_version = version
+        self.footer_year = datetime.now().year
+
+    def beforePage(self):
+        """Header on each page."""
+        c = self.canv
+        c.saveState()
+        page_w, page_h = self.pagesize
+        header_y = page_h - 0.35 * inch
+        left = f"Report ID: {self.report_id}"
+        center = self.report_title
+        right = f"Version: {self.report_version}"
+        c.setFont("Helvetica", 9)
+        c.drawString(72, header_y, left)
+        cw = c.stringWidth(center, "Helvetica", 9)
+        c.drawString((page_w - cw) / 2, header_y, center)
+        rw = c.stringWidth(right, "Helvetica", 9)
+        c.drawString(page_w - 72 - rw, header_y, right)
+        # rule under header
+        c.setStrokeColor(RULE_COLOR)
+        c.line(72, header_y - 6, page_w - 72, header_y - 6)
+        c.restoreState()
+
+    def afterPage(self):
+        """Footer on each page."""
+        c = self.canv
+        c.saveState()
+        footer_left = f"©QuantUniversity, {self.footer_year}"
+        footer_center = "Contact info@qusandbox.com for more details"
+        footer_right = f"Page {c.getPageNumber()}"
+        footer_y = 0.2 * inch
+        page_width = self.pagesize[0]
+        # rule above footer
+        c.setStrokeColor(RULE_COLOR)
+        c.line(72, footer_y + 10, page_width - 72, footer_y + 10)
+        c.setFont("Helvetica", 9)
+        c.drawString(72, footer_y, footer_left)
+        center_width = c.stringWidth(footer_center, "Helvetica", 9)
+        c.drawString((page_width - center_width) / 2, footer_y, footer_center)
+        right_width = c.stringWidth(footer_right, "Helvetica", 9)
+        c.drawString(page_width - 72 - right_width, footer_y, footer_right)
+        c.restoreState()
+
+
+class _PreloadedImage(Flowable):
+    """
+    An image whose PDF image object (and transparency mask) was encoded once, up front. Each
+    document registers a copy of it the first time the image is drawn; `drawImage` then finds it
+    registered and only places it on the page.
+    """
+
+    def __init__(self, source: str, width: float, height: float):
+        super().__init__()
+        self.key = source
+        self.name = _digester(f"{source}auto".encode("utf-8"))   # the name drawImage gives `source`
+        self.xobject = PDFImageXObject(self.name, ImageReader(source), mask="auto")
+        self.smask = self.xobject.__dict__.pop("_smask", None)
+        self.width, self.height = width, height
+        self.hAlign = "CENTER"
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def _register(self, doc) -> None:
+        reg_name = doc.getXObjectName(self.name)
+        if reg_name in doc.idToObject:
+            return
+        image = copy.copy(self.xobject)
+        if self.smask is not None:
+            mask = copy.copy(self.smask)
+            image.smask = doc.Reference(mask, doc.getXObjectName(mask.name))
+        doc.Reference(image, reg_name)
+        doc.addForm(self.name, image)
+
+    def draw(self):
+        self._register(self.canv._doc)
+        self.canv.drawImage(self.key, 0, 0, self.width, self.height, mask="auto")
+
+
+class SarPdfRenderer:
+    """Renders export bundles (narrative, facts, checklist report, audit trail) to PDF. Thread-safe."""
+
+    def __init__(self, logo_path: str = LOGO_PATH, cache_size: int = PDF_CACHE_SIZE):
+        styles = getSampleStyleSheet()
+        self.normal_style = styles["Normal"]
+        self.title_style = ParagraphStyle(
+            "CustomTitle", parent=styles["Heading1"], fontSize=24, spaceAfter=30,
+            alignment=1, textColor=BRAND_COLOR,   # centered
+        )
+        self.heading_style = ParagraphStyle(
+            "CustomHeading", parent=styles["Heading2"], fontSize=16, spaceAfter=12,
+            spaceBefore=20, textColor=BRAND_COLOR,
+        )
+        self.subheading_style = ParagraphStyle(
+            "CustomSubHeading", parent=styles["Heading3"], fontSize=12, spaceAfter=8,
+            spaceBefore=12, textColor=BRAND_COLOR,
+        )
+        self.cell_style = ParagraphStyle("TableCell", parent=styles["Normal"], fontSize=CELL_FONT_SIZE, leading=11)
+        self.table_style = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), BRAND_COLOR),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, 0), 10),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+            ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+            ("GRID", (0, 0), (-1, -1), 1, colors.black),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONTSIZE", (0, 1), (-1, -1), 9),
+        ])
+        self.logo = _PreloadedImage(logo_path, 2.1 * inch, 1.2 * inch) if os.path.exists(logo_path) else None
+        self.cache_size = max(0, cache_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def render(self, json_data, title: str = "AML SAR Report") -> bytes:
+        """PDF bytes for a bundle; an unchanged bundle is served from the cache."""
+        key = bundle_hash(json_data, title)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        pdf = self.build(json_data, title, report_id=key[:6])
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = pdf
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return pdf
+
+    def build(self, json_data, title: str = "AML SAR Report", report_id: str = None, scalable: bool = False) -> bytes:
+        """Render a bundle in memory, without the cache."""
+        buffer = BytesIO()
+        self._build(json_data, title, report_id, scalable, buffer)
+        return buffer.getvalue()
+
+    def render_to_file(self, json_data, title: str = "AML SAR Report", path: str = None) -> str:
+        """
+        Render a bundle with the scalable layout into `path` (by default a new temp file in
+        PDF_TMP_DIR, which the caller removes). Returns the path.
+        """
+        if path is None:
+            sweep_temp_files()
+            fd, path = tempfile.mkstemp(prefix=PDF_TMP_PREFIX, suffix=".pdf", dir=PDF_TMP_DIR)
+            os.close(fd)
+        try:
+            self._build(json_data, title, None, True, path)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    def _build(self, json_data, title, report_id, scalable, output) -> None:
+        report_id = report_id or bundle_hash(json_data, title)[:6]
+        doc = _ReportDocTemplate(output, title, report_id, pagesize=letter,
+                                 rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=36,
+                                 title=f"AML SAR Report - {report_id} (v{REPORT_VERSION})")
+        # Frame for content, leaving space for the header and footer
+        frame = Frame(72, 50, letter[0] - 144, letter[1] - 122,
+                      leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
+        doc.addPageTemplates([PageTemplate(id="normal", frames=[frame])])
+        if scalable:
+            doc.build(_FlowableStream(self.scalable_elements(json_data, title)), canvasmaker=_CompressingCanvas)
+        else:
+            doc.build(self.elements(json_data, title))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def _title(self, title: str) -> list:
+        elements = []
+        if self.logo is not None:
+            elements.append(copy.copy(self.logo))   # flowables hold their canvas while drawn
+            elements.append(Spacer(1, 15))
+        elements.append(Paragraph(title, self.title_style))
+        elements.append(Spacer(1, 10))
+        return elements
+
+    def elements(self, json_data, title: str) -> list:
+        """The report's flowables: logo and title, then one section per bundle key."""
+        elements = self._title(title)
+
+        for key, value in json_data.items():
+            elements.append(Paragraph(key.replace("_", " ").title(), self.heading_style))
+            if key == "narrative":
+                elements.append(Paragraph(value, self.normal_style))
+            elif key == "facts":
+                elements.extend(self._facts(value))
+            elif key == "checklist_report" and isinstance(value, dict):
+                elements.extend(self._checklist(value))
+            elif key == "audit_trail" and value and isinstance(value[0], dict):
+                elements.append(self._audit_table(value))
+            elements.append(Spacer(1, 15))
+        return elements
+
+    def _facts(self, facts) -> list:
+        normal = self.normal_style
+        elements = []
+        for i, fact in enumerate(facts, 1):
+            if isinstance(fact, dict):
+                elements.append(Paragraph(f"<b>Fact {i}: {fact.get('type', 'Unknown')}</b>", self.subheading_style))
+                for fact_key, fact_value in fact.items():
+                    if fact_key == "type":   # already in the header
+                        continue
+                    formatted_key = fact_key.replace("_", " ").title()
+                    formatted_value = format_fact_value(fact_key, fact_value)
+                    elements.append(Paragraph(f"• <b>{formatted_key}:</b> {formatted_value}", normal))
+            else:
+                elements.append(Paragraph(f"• {str(fact)}", normal))
+            elements.append(Spacer(1, 8))
+        return elements
+
+    def _checklist(self, report: dict) -> list:
+        normal = self.normal_style
+        overall = report.get("overall", False)
+        status_color = colors.green if overall else colors.red
+        elements = [
+            Paragraph(f"<b>Overall Status:</b> <font color='{status_color}'>{'PASS' if overall else 'FAIL'}</font>", normal),
+            Spacer(1, 8),
+        ]
+        for report_key, report_value in report.items():
+            if report_key in ("overall", "items"):
+                continue
+            formatted_key = report_key.replace("_", " ").title()
+            if isinstance(report_value, dict):
+                elements.append(Paragraph(f"<b>{formatted_key}:</b>", normal))
+                for sub_key, sub_value in report_value.items():
+                    elements.append(Paragraph(f"  • {sub_key.replace('_', ' ').title()}: {sub_value}", normal))
+            else:
+                elements.append(Paragraph(f"<b>{formatted_key}:</b> {str(report_value)}", normal))
+
+        if isinstance(report.get("items"), list):
+            elements.append(Spacer(1, 10))
+            elements.append(Paragraph("<b>Checklist Items:</b>", self.subheading_style))
+            for item in report["items"]:
+                if not isinstance(item, dict):
+                    continue
+                passed = item.get("passed", False)
+                status = "✓ PASS" if passed else "✗ FAIL"
+                status_color = colors.green if passed else colors.red
+                elements.append(Paragraph(f"<font color='{status_color}'>{status}</font> - {item.get('label', 'Unknown item')}", normal))
+                if not passed and item.get("remediation"):
+                    elements.append(Paragraph(f"  <i>Remediation: {item['remediation']}</i>", normal))
+                elements.append(Spacer(1, 4))
+        return elements
+
+    def _audit_table(self, trail: list) -> Table:
+        widths = [width for _, width in AUDIT_COLUMNS]
+        table_data = [[name for name, _ in AUDIT_COLUMNS]]
+        for item in trail:
+            row = (item.get("timestamp", ""), item.get("event", ""), audit_details(item))
+            table_data.append([self._cell(value, width) for value, width in zip(row, widths)])
+        table = Table(table_data, colWidths=widths, repeatRows=1)
+        table.setStyle(self.table_style)
+        return table
+
+    # ---- Scalable layout ----
+
+    def scalable_elements(self, json_data, title: str):
+        """The report's flowables for the scalable layout, generated lazily."""
+        yield from self._title(title)
+        for key, value in json_data.items():
+            yield Paragraph(key.replace("_", " ").title(), self.heading_style)
+            if key == "narrative":
+                yield Paragraph(value, self.normal_style)
+            elif key == "facts":
+                yield from self._tables(FACT_COLUMNS, self._fact_rows(value))
+            elif key == "checklist_report" and isinstance(value, dict):
+                yield from self._checklist(value)
+            elif key == "audit_trail" and value and isinstance(value[0], dict):
+                rows = ((item.get("timestamp", ""), item.get("event", ""), audit_details(item)) for item in value)
+                yield from self._tables(AUDIT_COLUMNS, rows)
+            yield Spacer(1, 15)
+
+    @staticmethod
+    def _fact_rows(facts):
+        """(fact, field, value) rows; the fact label is on its first row only."""
+        for i, fact in enumerate(facts, 1):
+            if not isinstance(fact, dict):
+                yield f"Fact {i}", "", str(fact)
+                continue
+            label = f"Fact {i}: {fact.get('type', 'Unknown')}"
+            fields = [(k, v) for k, v in fact.items() if k != "type"] or [("", "")]
+            for fact_key, fact_value in fields:
+                yield label, fact_key.replace("_", " ").title(), format_fact_value(fact_key, fact_value)
+                label = ""
+
+    def _cell(self, value, width: float):
+        """Plain text when it fits the column; a wrapping paragraph otherwise."""
+        text = str(value)
+        if stringWidth(text, CELL_FONT, CELL_FONT_SIZE) <= width - CELL_PADDING:
+            return text
+        return Paragraph(escape(text), self.cell_style)
+
+    def _tables(self, columns, rows):
+        """
+        Tables of at most TABLE_CHUNK_ROWS rows each. Every table repeats the header row on each
+        page it spans, and a row taller than a page is split within the row.
+        """
+        header = [name for name, _ in columns]
+        widths = [width for _, width in columns]
+        chunk = []
+        for row in rows:
+            chunk.append([self._cell(value, width) for value, width in zip(row, widths)])
+            if len(chunk) == TABLE_CHUNK_ROWS:
+                yield self._chunk_table(header, chunk, widths)
+                chunk = []
+        if chunk:
+            yield self._chunk_table(header, chunk, widths)
+
+    def _chunk_table(self, header: list, rows: list, widths: list) -> Table:
+        return Table([header, *rows], colWidths=widths, repeatRows=1, splitInRow=1, style=self.table_style)
+
+
+def sweep_temp_files(max_age_s: float = PDF_TMP_MAX_AGE_S) -> int:
+    """Remove scalable-layout temp files older than `max_age_s`. Returns the number removed."""
+    tmp_dir = PDF_TMP_DIR or tempfile.gettempdir()
+    cutoff = time.time() - max_age_s
+    removed = 0
+    try:
+        entries = list(os.scandir(tmp_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not (entry.name.startswith(PDF_TMP_PREFIX) and entry.name.endswith(".pdf")):
+            continue
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass   # removed meanwhile, or not ours to remove
+    return removed
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer() -> SarPdfRenderer:
+    """The process-wide renderer, created on first use."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = SarPdfRenderer()
+            sweep_temp_files()   # files left by sessions of earlier server runs
+        return _renderer
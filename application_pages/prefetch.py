@@ -0,0 +1,190 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from application_pages.page_draft_sar import (
+    LLM_API_KEY, build_prompt, call_llm, extract_5ws, label_ai_draft,
+)
+from application_pages.page_explore_data import find_case_records, combine_case_facts
+from application_pages.template_draft import render_template_draft
+
+# ---- Tunables ----
+PREFETCH_CONCURRENCY = int(os.getenv("SAR_PREFETCH_CONCURRENCY", "4"))        # LLM calls in flight
+PREFETCH_TOKEN_BUDGET = int(os.getenv("SAR_PREFETCH_TOKEN_BUDGET", "200000"))  # estimated tokens per run
+PREFETCH_MAX_TOKENS = 600      # completion tokens reserved per draft (matches call_llm)
+DRAFT_CACHE_SIZE = 1000        # drafts kept in memory (least recently used are evicted)
+
+
+def prompt_key(prompt: str) -> str:
+    """Cache key for a drafting prompt: identical facts and 5Ws produce identical prompts."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(prompt: str) -> int:
+    # ~4 characters per token for the prompt, plus the completion we may be billed for
+    return len(prompt) // 4 + PREFETCH_MAX_TOKENS
+
+
+class DraftCache:
+    """Thread-safe LRU cache of drafted narratives keyed by prompt hash."""
+
+    def __init__(self, max_entries: int = DRAFT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, prompt: str):
+        key = prompt_key(prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, prompt: str, narrative: str, **meta):
+        key = prompt_key(prompt)
+        with self._lock:
+            self._entries[key] = {"narrative": narrative, "created_at": time.time(), **meta}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, prompt: str) -> bool:
+        with self._lock:
+            return prompt_key(prompt) in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# Shared by every session of the server process
+draft_cache = DraftCache()
+
+
+def prioritized_alerts(alerts, customers):
+    """Alerts ordered by customer risk score (highest first), then alert age (oldest first)."""
+    ranked = alerts.merge(customers[['customer_id', 'risk_score']], on='customer_id', how='left')
+    ranked['risk_score'] = ranked['risk_score'].fillna(-1)
+    return ranked.sort_values(['risk_score', 'timestamp', 'alert_id'], ascending=[False, True, True], kind='mergesort')
+
+
+def build_alert_prompt(data, alert):
+    """Assembles the facts for one alert exactly as the Explore Data page does and builds its prompt."""
+    details, txns, alert_record = find_case_records(
+        data['customers'], data['transactions'], data['alerts'], alert['customer_id'], alert_id=alert['alert_id']
+    )
+    facts = combine_case_facts(details, txns, alert_record)
+    five_ws = extract_5ws(facts)
+    return facts, five_ws, build_prompt(facts, five_ws)
+
+
+class PrefetchWorker:
+    """
+    Background worker that drafts narratives for alerts before an analyst opens them.
+
+    Alerts are walked in `prioritized_alerts` order. Each alert's prompt is built the same way as
+    an interactive case, so the Draft SAR page finds the result in `draft_cache` by prompt.
+    At most `max_concurrency` LLM calls run at once, and the run stops once the estimated token
+    spend would exceed `token_budget`.
+    """
+
+    def __init__(self, data, cache: DraftCache = draft_cache, llm=None,
+                 max_concurrency: int = PREFETCH_CONCURRENCY, token_budget: int = PREFETCH_TOKEN_BUDGET):
+        self.data = data
+        self.cache = cache
+        self.llm = llm or call_llm
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.token_budget = int(token_budget)
+        self.use_template = llm is None and not LLM_API_KEY
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.status = {"state": "idle", "queued": 0, "drafted": 0, "cached": 0, "failed": 0,
+                       "tokens_spent": 0, "started_at": None, "finished_at": None}
+
+    def _bump(self, **counts):
+        with self._lock:
+            for k, v in counts.items():
+                self.status[k] += v
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sar-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.status)
+
+    def _draft_one(self, alert, prompt, facts, five_ws):
+        if self._stop.is_set():
+            return
+        try:
+            if self.use_template:
+                narrative = render_template_draft(facts, five_ws)
+            else:
+                narrative = label_ai_draft(self.llm(prompt))
+        except Exception:
+            # LLMUnavailable, HTTP errors, ...: leave the alert for on-demand drafting
+            self._bump(failed=1)
+            return
+        self.cache.put(prompt, narrative, alert_id=int(alert['alert_id']),
+                       customer_id=int(alert['customer_id']), source="prefetch")
+        self._bump(drafted=1)
+
+    def _run(self):
+        with self._lock:
+            self.status.update(state="running", started_at=time.time(), finished_at=None)
+        queue = prioritized_alerts(self.data['alerts'], self.data['customers'])
+        self._bump(queued=len(queue))
+        spent = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="prefetch") as pool:
+            for alert in queue.to_dict('records'):
+                if self._stop.is_set():
+                    break
+                facts, five_ws, prompt = build_alert_prompt(self.data, alert)
+                if prompt in self.cache:
+                    self._bump(cached=1)
+                    continue
+                cost = 0 if self.use_template else estimate_tokens(prompt)
+                if spent + cost > self.token_budget:
+                    with self._lock:
+                        self.status["state"] = "budget exhausted"
+                    break
+                spent += cost
+                self._bump(tokens_spent=cost)
+                pool.submit(self._draft_one, alert, prompt, facts, five_ws)
+        with self._lock:
+            if self.status["state"] == "running":
+                self.status["state"] = "stopped" if self._stop.is_set() else "done"
+            self.status["finished_at"] = time.time()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_prefetch(data, **kwargs) -> PrefetchWorker:
+    """Start (or return the already running) process-wide prefetch worker."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_running():
+            _worker = PrefetchWorker(data, **kwargs)
+            _worker.start()
+        return _worker
+
+
+def get_prefetch_worker():
+    return _worker
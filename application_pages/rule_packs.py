@@ -0,0 +1,214 @@
+"""
+Data-driven compliance rule packs.
+
+A rule pack is a JSON (or YAML, if PyYAML is installed) file describing the checklist for a
+filing program: shared thresholds, phrase lexicons and a list of rules. Each rule names one of the
+types in compliance_rules.RULE_TYPES:
+
+    {
+      "name": "default",
+      "thresholds": {"min_length": 100, "max_length": 1000},
+      "lexicons": {"speculative": ["may have been", "likely"]},
+      "rules": [
+        {"key": "length_bounds", "type": "length_bounds",
+         "label": "Narrative length within {min}–{max} characters",
+         "params": {"min": "$min_length", "max": "$max_length"}},
+        {"key": "no_speculation", "type": "forbidden_phrases", "label": "No speculative language",
+         "params": {"lexicon": "speculative"}, "depends_on": ["length_bounds"]}
+      ]
+    }
+
+Params of the form "$name" refer to thresholds and are resolved when the pack is compiled; labels
+are formatted with the resolved params. All forbidden-phrase lexicons of a pack are merged into one
+matcher, so the narrative is scanned once however many such rules there are, and rules are put in
+dependency order once. Compiled packs are cached per process and recompiled when the pack file (or a
+lexicon file it uses) changes, so edits take effect without restarting the app.
+
+Packs are looked up by name in SAR_RULE_PACK_DIR (if set) and then in the built-in
+application_pages/compliance_packs/ directory; SAR_RULE_PACK selects the default pack.
+"""
+import json
+import os
+import threading
+
+from application_pages.compliance_rules import RULE_TYPES, evaluation_order
+from application_pages.speculation import SpeculationMatcher, load_lexicon, normalize_phrase
+
+try:
+    import yaml
+except ImportError:  # YAML packs are optional
+    yaml = None
+
+# ---- Tunables ----
+BUILTIN_PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compliance_packs")
+RULE_PACK_DIR = os.getenv("SAR_RULE_PACK_DIR", "")
+DEFAULT_RULE_PACK = os.getenv("SAR_RULE_PACK", "default")
+PACK_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class PhraseScanner:
+    """One merged matcher for every forbidden-phrase rule of a pack; hits are attributed per rule."""
+
+    def __init__(self, phrases_by_rule: dict):
+        self._rules_by_phrase = {}
+        for rule_key, phrases in phrases_by_rule.items():
+            for phrase in phrases:
+                self._rules_by_phrase.setdefault(normalize_phrase(phrase), set()).add(rule_key)
+        self.matcher = SpeculationMatcher(self._rules_by_phrase)
+        self._last = (None, None)  # (text, hits) of the last scan, shared by the rules of one run
+
+    def hits(self, text: str, rule_key: str) -> list:
+        last_text, hits = self._last
+        if last_text != text:
+            hits = list(self.matcher.finditer(text))
+            self._last = (text, hits)
+        return [h for h in hits if rule_key in self._rules_by_phrase.get(h[2], ())]
+
+
+class CompiledPack:
+    def __init__(self, name, description, path, rules, order, thresholds, lexicons, watched_files):
+        self.name = name
+        self.description = description
+        self.path = path
+        self.rules = rules            # display order
+        self.order = order            # evaluation order (dependencies first)
+        self.thresholds = thresholds
+        self.lexicons = lexicons
+        self.watched_files = watched_files   # pack and lexicon files; a change to any triggers a recompile
+        self.signature = _mtimes(watched_files)
+
+
+def _read(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        if yaml is None:
+            raise ValueError(f"Rule pack {path} is YAML but PyYAML is not installed")
+        return yaml.safe_load(f)
+
+
+def _resolve(value, thresholds):
+    if isinstance(value, str) and value.startswith("$"):
+        name = value[1:]
+        if name not in thresholds:
+            raise ValueError(f"Unknown threshold '{name}'")
+        return thresholds[name]
+    return value
+
+
+def _lexicon_files(spec: dict, base_dir: str) -> list:
+    """Lexicon files a pack reads, so changes to them also trigger a recompile."""
+    files = []
+    for rule in spec.get("rules", []):
+        params = rule.get("params", {})
+        for path in params.get("lexicon_files", []):
+            files.append(os.path.join(base_dir, path))
+        env_path = os.getenv(params.get("lexicon_env", ""), "") if params.get("lexicon_env") else ""
+        if env_path:
+            files.append(env_path)
+    return files
+
+
+def _mtimes(files) -> tuple:
+    return tuple(os.path.getmtime(f) if os.path.exists(f) else None for f in files)
+
+
+def compile_pack(spec: dict, path: str = None) -> CompiledPack:
+    """Validate a pack spec and build its rules. Raises ValueError for invalid packs."""
+    base_dir = os.path.dirname(path) if path else BUILTIN_PACK_DIR
+    thresholds = dict(spec.get("thresholds", {}))
+    lexicons = {name: list(phrases) for name, phrases in spec.get("lexicons", {}).items()}
+    rule_specs = spec.get("rules", [])
+    if not rule_specs:
+        raise ValueError("Rule pack has no rules")
+
+    # Collect every forbidden-phrase list first so they compile into a single matcher
+    phrases_by_rule = {}
+    for r in rule_specs:
+        if r.get("type") != "forbidden_phrases":
+            continue
+        params = r.get("params", {})
+        phrases = list(params.get("phrases", []))
+        if params.get("lexicon"):
+            if params["lexicon"] not in lexicons:
+                raise ValueError(f"Rule '{r.get('key')}' uses unknown lexicon '{params['lexicon']}'")
+            phrases += lexicons[params["lexicon"]]
+        for lexicon_path in params.get("lexicon_files", []):
+            phrases += load_lexicon(os.path.join(base_dir, lexicon_path))
+        env_path = os.getenv(params["lexicon_env"], "") if params.get("lexicon_env") else ""
+        if env_path and os.path.exists(env_path):
+            phrases += load_lexicon(env_path)
+        phrases_by_rule[r.get("key")] = phrases
+    shared = {"phrases": PhraseScanner(phrases_by_rule)}
+
+    rules, seen = [], set()
+    for r in rule_specs:
+        key, rule_type = r.get("key"), r.get("type")
+        if not key or key in seen:
+            raise ValueError(f"Rule keys must be unique and non-empty (got {key!r})")
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Rule '{key}' has unknown type '{rule_type}' (known: {', '.join(sorted(RULE_TYPES))})")
+        seen.add(key)
+        params = {name: _resolve(value, thresholds) for name, value in r.get("params", {}).items()}
+        label = r.get("label", key).format(**params)
+        try:
+            rules.append(RULE_TYPES[rule_type](key, label, params, r.get("remediation"), shared,
+                                               depends_on=r.get("depends_on", ())))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Rule '{key}' is missing or has invalid params: {e}") from e
+
+    return CompiledPack(
+        name=spec.get("name") or (os.path.splitext(os.path.basename(path))[0] if path else "inline"),
+        description=spec.get("description", ""),
+        path=path,
+        rules=rules,
+        order=evaluation_order(rules),
+        thresholds=thresholds,
+        lexicons=lexicons,
+        watched_files=([path] if path else []) + _lexicon_files(spec, base_dir),
+    )
+
+
+def _pack_dirs() -> list:
+    return [d for d in (RULE_PACK_DIR, BUILTIN_PACK_DIR) if d and os.path.isdir(d)]
+
+
+def find_pack(name: str) -> str:
+    """Path of the pack file for `name` (a pack name or a file path). Raises FileNotFoundError."""
+    if os.path.isfile(name):
+        return name
+    for directory in _pack_dirs():
+        for ext in PACK_EXTENSIONS:
+            candidate = os.path.join(directory, name + ext)
+            if os.path.isfile(candidate):
+                return candidate
+    raise FileNotFoundError(f"No rule pack named '{name}'")
+
+
+def list_packs() -> list:
+    """Names of the available packs; packs in SAR_RULE_PACK_DIR shadow built-in ones."""
+    names = []
+    for directory in _pack_dirs():
+        for filename in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(filename)
+            if ext in PACK_EXTENSIONS and stem not in names:
+                names.append(stem)
+    return names
+
+
+_packs = {}   # pack file path -> CompiledPack
+_packs_lock = threading.Lock()
+
+
+def get_pack(name: str = None) -> CompiledPack:
+    """
+    The compiled pack for `name` (default: SAR_RULE_PACK), shared by all sessions of the process.
+    A pack whose file or lexicon files changed since it was compiled is recompiled.
+    """
+    path = find_pack(name or DEFAULT_RULE_PACK)
+    with _packs_lock:
+        pack = _packs.get(path)
+        if pack is None or pack.signature != _mtimes(pack.watched_files):
+            pack = compile_pack(_read(path), path=path)
+            _packs[path] = pack
+        return pack
@@ -0,0 +1,102 @@
+"""
+Single-pass detection of speculative (hedging) language in SAR narratives.
+
+The lexicon is compiled once into a trie-shaped regular expression, so the narrative is scanned a
+single time regardless of how many phrases are configured, and every hit is reported with its
+character offsets for highlighting and targeted repair.
+
+Lexicons come from the compliance rule packs (see rule_packs.py), which may also read phrases from
+lexicon files: one phrase per line, `#` starts a comment.
+"""
+import re
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Lower-case and collapse whitespace; matches are reported in this canonical form."""
+    return " ".join(str(phrase).lower().split())
+
+
+def load_lexicon(path: str) -> list:
+    """Read a lexicon file: one phrase per line, blank lines and `#` comments ignored."""
+    phrases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            phrase = line.split("#", 1)[0].strip()
+            if phrase:
+                phrases.append(phrase)
+    return phrases
+
+
+def _trie_regex(phrases) -> str:
+    """
+    Build a regex body matching any of `phrases` by sharing common prefixes.
+
+    Alternatives at each node start with distinct characters, so the regex engine decides each
+    branch on a single character instead of trying every phrase in turn.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = []
+        for ch in sorted(k for k in node if k):
+            head = r"\s+" if ch == " " else re.escape(ch)
+            alternatives.append(head + build(node[ch]))
+        if not alternatives:
+            return ""
+        if "" in node:
+            # A phrase ends here and longer ones continue: the continuation is optional (greedy)
+            return "(?:" + "|".join(alternatives) + ")?"
+        return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+    return build(trie)
+
+
+class SpeculationMatcher:
+    """
+    Finds lexicon phrases as whole words, case-insensitively, in one pass over the text.
+
+    Phrases may span several words; any run of whitespace in the text matches a single space in
+    the phrase. Overlapping hits are resolved leftmost-longest.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = sorted({normalize_phrase(p) for p in phrases if normalize_phrase(p)})
+        body = _trie_regex(self.phrases) if self.phrases else r"(?!)"
+        # The leading \W (a sentinel space is prepended to the text) gives the engine a cheap
+        # first-character filter that a \b or lookbehind would disable.
+        self._pattern = re.compile(r"\W(" + body + r")(?!\w)")
+        self._fallback = re.compile(r"(?<!\w)(" + body + r")(?!\w)", re.I)
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def finditer(self, text: str):
+        """Yield (start, end, phrase) for each hit; offsets index into `text`."""
+        text = text or ""
+        lowered = " " + text.lower()
+        if len(lowered) == len(text) + 1:
+            canonical = {}  # matched text -> normalized phrase, computed once per distinct hit
+            for m in self._pattern.finditer(lowered):
+                start, end = m.span(1)
+                phrase = canonical.get(m[1])
+                if phrase is None:
+                    phrase = canonical[m[1]] = " ".join(m[1].split())
+                yield start - 1, end - 1, phrase
+        else:
+            # Lower-casing changed the length (rare non-ASCII characters): match the original text
+            for m in self._fallback.finditer(text):
+                yield m.start(1), m.end(1), normalize_phrase(m.group(1))
+
+    def find_spans(self, text: str) -> list:
+        """All hits as dicts with start, end and phrase, in text order."""
+        return [{"start": s, "end": e, "phrase": p} for s, e, p in self.finditer(text)]
+
+    def phrases_in(self, text: str) -> list:
+        """Sorted distinct phrases found in `text`."""
+        return sorted({p for _, _, p in self.finditer(text)})
+
@@ -0,0 +1,117 @@
+from string import Template
+
+import pandas as pd
+
+# ---- Tunables ----
+MAX_LISTED_TRANSACTIONS = 10   # individually described transactions; the rest are summarized
+TEMPLATE_LABEL = "Template-based draft"
+
+# Templates are compiled once at import; rendering is plain substitution.
+_SUBJECT = Template("This report concerns $who$where_clause.$risk_clause")
+_ACTIVITY = Template(
+    "Between $first and $last, the customer conducted $count transaction$plural "
+    "totaling `$$$total`, ranging from `$$$low` to `$$$high`."
+)
+_SINGLE_ACTIVITY = Template("On $first, the customer conducted one transaction of `$$$total`.")
+_TRANSACTION = Template("On $when, transaction$tid of `$$$amount` was conducted$location.")
+_MORE_TRANSACTIONS = Template("$count additional transaction$plural totaling `$$$total` occurred between $first and $last.")
+_ALERT = Template("On $when, alert $aid was generated for the customer: $reason.")
+_NOTE = Template("On $when, the following analyst note was recorded: $note.")
+_WHY = Template("This activity is being reported based on the following: $reasons.")
+
+
+def _fmt_ts(ts):
+    return ts.strftime("%Y-%m-%d %H:%M")
+
+
+def _fmt_money(value):
+    return f"{float(value):,.2f}"
+
+
+def _join(values):
+    values = [str(v) for v in values]
+    if len(values) <= 2:
+        return " and ".join(values)
+    return ", ".join(values[:-1]) + ", and " + values[-1]
+
+
+def render_template_draft(selected_facts, extracted_5ws):
+    """Builds a deterministic, chronological SAR draft from the facts and 5Ws without an LLM.
+
+    Args:
+        selected_facts (list of dict): The curated facts for the case.
+        extracted_5ws (dict): Output of `extract_5ws`.
+
+    Returns:
+        str: A FinCEN-style narrative labeled as a template-based draft.
+    """
+    five_ws = extracted_5ws or {}
+    facts = [f for f in (selected_facts or []) if isinstance(f, dict)]
+
+    customer = next((f for f in facts if "name" in f or "risk_score" in f), {})
+    # Parse every timestamp in one call, then order dated facts (stable on ties)
+    stamps = pd.to_datetime(pd.Series([f.get("timestamp") for f in facts], dtype=object), errors="coerce")
+    dated = sorted(
+        ((ts, i, f) for i, (ts, f) in enumerate(zip(stamps, facts)) if pd.notnull(ts)),
+        key=lambda t: (t[0], t[1]),
+    )
+    transactions = [(ts, f) for ts, _, f in dated if "transaction_amount" in f]
+    events = [(ts, f) for ts, _, f in dated if "alert_id" in f or "note" in f]
+
+    paragraphs = []
+
+    # Who / Where
+    who = customer.get("name") or _join(five_ws.get("Who", [])[:2]) or "the customer"
+    if customer.get("customer_id") is not None and customer.get("name"):
+        who = f"{customer['name']} (Customer ID {customer['customer_id']})"
+    where = customer.get("country") or next(iter(five_ws.get("Where", [])), None)
+    risk = customer.get("risk_score")
+    paragraphs.append(_SUBJECT.substitute(
+        who=who,
+        where_clause=f", located in {where}" if where else "",
+        risk_clause=f" The customer has an internal risk score of {risk}." if risk is not None else "",
+    ))
+
+    # What / When, in chronological order
+    if transactions:
+        amounts = [float(f["transaction_amount"]) for _, f in transactions]
+        first, last = _fmt_ts(transactions[0][0]), _fmt_ts(transactions[-1][0])
+        if len(transactions) == 1:
+            lines = [_SINGLE_ACTIVITY.substitute(first=first, total=_fmt_money(amounts[0]))]
+        else:
+            lines = [_ACTIVITY.substitute(
+                first=first, last=last, count=len(transactions), plural="s",
+                total=_fmt_money(sum(amounts)), low=_fmt_money(min(amounts)), high=_fmt_money(max(amounts)),
+            )]
+        for ts, t in transactions[:MAX_LISTED_TRANSACTIONS]:
+            location = ""
+            if "origin_latitude" in t and "origin_longitude" in t:
+                location = f" from approximately Lat {t['origin_latitude']:.2f}, Lon {t['origin_longitude']:.2f}"
+            lines.append(_TRANSACTION.substitute(
+                when=_fmt_ts(ts),
+                tid=f" {t['transaction_id']}" if "transaction_id" in t else "",
+                amount=_fmt_money(t["transaction_amount"]), location=location,
+            ))
+        rest = transactions[MAX_LISTED_TRANSACTIONS:]
+        if rest:
+            lines.append(_MORE_TRANSACTIONS.substitute(
+                count=len(rest), plural="s" if len(rest) > 1 else "",
+                total=_fmt_money(sum(amounts[MAX_LISTED_TRANSACTIONS:])),
+                first=_fmt_ts(rest[0][0]), last=_fmt_ts(rest[-1][0]),
+            ))
+        paragraphs.append(" ".join(lines))
+
+    if events:
+        paragraphs.append(" ".join(
+            _ALERT.substitute(when=_fmt_ts(ts), aid=e["alert_id"], reason=str(e.get("reason", "")).rstrip("."))
+            if "alert_id" in e else
+            _NOTE.substitute(when=_fmt_ts(ts), note=str(e["note"]).rstrip("."))
+            for ts, e in events
+        ))
+
+    # Why
+    reasons = five_ws.get("Why", [])
+    if reasons:
+        paragraphs.append(_WHY.substitute(reasons=_join(reasons)))
+
+    return f"{TEMPLATE_LABEL}:\n" + "\n\n".join(paragraphs)
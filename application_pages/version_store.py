@@ -0,0 +1,304 @@
+"""
+Revision history of a case narrative, stored as skip-deltas with periodic compressed snapshots.
+
+Every narrative written by Draft SAR, Human Review, the compliance editor or "Fix it with AI" is
+committed here, so later edits no longer overwrite earlier ones without a trace.
+
+Layout: versions are grouped in windows of VERSION_SNAPSHOT_EVERY. The first version of a window
+is a zlib-compressed snapshot. Version s + k inside the window (k > 0) is stored as a delta against
+version s + (k & (k - 1)), i.e. k with its lowest set bit cleared. Following bases from any version
+reaches the snapshot after at most log2(VERSION_SNAPSHOT_EVERY) deltas, and each revision is stored
+once, as the few spans that differ from its base.
+
+A delta is a tuple of segments: (start, end) copies a range of the base text, a str is inserted
+literally. Deltas are built from a word-level diff_engine diff. Two deltas compose into one, which
+is what `diff(i, j)` uses: the deltas from the versions' common ancestor in the skip-delta tree are
+composed and intersected, so the unchanged text is aligned without diffing it again and only the
+spans changed since that ancestor are diffed word by word. Versions in different windows share no
+ancestor and fall back to a word-level diff of both texts.
+"""
+import os
+import re
+import time
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+
+from application_pages import diff_engine
+
+# ---- Tunables ----
+VERSION_SNAPSHOT_EVERY = int(os.getenv("SAR_VERSION_SNAPSHOT_EVERY", "64"))  # versions per snapshot
+CHECKOUT_CACHE_SIZE = 8        # reconstructed texts kept per store (least recently used are evicted)
+
+_TOKEN_RE = re.compile(r"\s+|\S+")
+
+
+def _tokens(text: str) -> list:
+    return _TOKEN_RE.findall(text)
+
+
+def _offsets(tokens: list) -> list:
+    """Character offset of every token, plus the end of the text."""
+    offsets, pos = [0], 0
+    for tok in tokens:
+        pos += len(tok)
+        offsets.append(pos)
+    return offsets
+
+
+def _append(segments: list, seg) -> None:
+    """Append a segment, merging it into the previous one where they are contiguous."""
+    if isinstance(seg, str):
+        if not seg:
+            return
+        if segments and isinstance(segments[-1], str):
+            segments[-1] += seg
+            return
+    else:
+        if seg[0] == seg[1]:
+            return
+        if segments and isinstance(segments[-1], tuple) and segments[-1][1] == seg[0]:
+            segments[-1] = (segments[-1][0], seg[1])
+            return
+    segments.append(seg)
+
+
+def make_delta(base: str, text: str) -> tuple:
+    """Delta turning `base` into `text`, from a word-level diff of the two."""
+    a, b = _tokens(base), _tokens(text)
+    a_at = _offsets(a)
+    segments = []
+    for tag, i1, i2, j1, j2 in diff_engine.opcodes(a, b):
+        if tag == "equal":
+            _append(segments, (a_at[i1], a_at[i2]))
+        elif j1 < j2:
+            _append(segments, "".join(b[j1:j2]))
+    return tuple(segments)
+
+
+def apply_delta(base: str, delta: tuple) -> str:
+    return "".join(seg if isinstance(seg, str) else base[seg[0]:seg[1]] for seg in delta)
+
+
+def compose(first: tuple, second: tuple) -> tuple:
+    """One delta equivalent to applying `first` (C -> X) and then `second` (X -> Y): C -> Y."""
+    starts, spans, pos = [], [], 0
+    for seg in first:
+        size = len(seg) if isinstance(seg, str) else seg[1] - seg[0]
+        starts.append(pos)
+        spans.append((pos, pos + size, seg))
+        pos += size
+    segments = []
+    for seg in second:
+        if isinstance(seg, str):
+            _append(segments, seg)
+            continue
+        s, e = seg
+        k = bisect_right(starts, s) - 1
+        while s < e:
+            x0, x1, src = spans[k]
+            t = min(e, x1)
+            if isinstance(src, str):
+                _append(segments, src[s - x0:t - x0])
+            else:
+                _append(segments, (src[0] + s - x0, src[0] + t - x0))
+            s = t
+            k += 1
+    return tuple(segments)
+
+
+def _copies(delta: tuple) -> list:
+    """(base_start, base_end, offset in the result) of the copy segments of a delta."""
+    copies, pos = [], 0
+    for seg in delta:
+        if isinstance(seg, str):
+            pos += len(seg)
+        else:
+            copies.append((seg[0], seg[1], pos))
+            pos += seg[1] - seg[0]
+    return copies
+
+
+def _shared_blocks(delta_a: tuple, delta_b: tuple) -> list:
+    """
+    Matching (i, j, size) character blocks of the results of two deltas over the same base: the
+    base text both of them copy, in order.
+    """
+    blocks, a_copies, b_copies = [], _copies(delta_a), _copies(delta_b)
+    p = q = 0
+    while p < len(a_copies) and q < len(b_copies):
+        a0, a1, ai = a_copies[p]
+        b0, b1, bj = b_copies[q]
+        lo, hi = max(a0, b0), min(a1, b1)
+        if lo < hi:
+            blocks.append((ai + lo - a0, bj + lo - b0, hi - lo))
+        if a1 <= b1:
+            p += 1
+        else:
+            q += 1
+    return blocks
+
+
+def _word_ops(a: str, b: str, i0: int = 0, j0: int = 0) -> list:
+    """Character opcodes of a word-level diff of a and b, shifted by (i0, j0)."""
+    a_tok, b_tok = _tokens(a), _tokens(b)
+    a_at, b_at = _offsets(a_tok), _offsets(b_tok)
+    return [(tag, i0 + a_at[i1], i0 + a_at[i2], j0 + b_at[j1], j0 + b_at[j2])
+            for tag, i1, i2, j1, j2 in diff_engine.opcodes(a_tok, b_tok)]
+
+
+class VersionStore:
+    """
+    Append-only narrative history. `commit` records a revision and returns its version number
+    (0-based); `checkout` rebuilds any version; `diff` returns character opcodes between two.
+    """
+
+    def __init__(self, snapshot_every: int = VERSION_SNAPSHOT_EVERY, cache_size: int = CHECKOUT_CACHE_SIZE):
+        self.snapshot_every = max(1, snapshot_every)
+        self.cache_size = max(1, cache_size)
+        self._versions = []             # per version: {"base", "data", "length", "source", "created_at", ...}
+        self._texts = OrderedDict()     # version -> text, recently reconstructed
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def base_of(self, n: int):
+        """The version `n` is stored against, or None for a snapshot."""
+        k = n % self.snapshot_every
+        return None if k == 0 else n - k + (k & (k - 1))
+
+    def _chain(self, n: int) -> list:
+        """`n` and its bases, down to the window's snapshot."""
+        chain = [n]
+        while (base := self.base_of(chain[-1])) is not None:
+            chain.append(base)
+        return chain
+
+    def _remember(self, n: int, text: str) -> str:
+        self._texts[n] = text
+        self._texts.move_to_end(n)
+        while len(self._texts) > self.cache_size:
+            self._texts.popitem(last=False)
+        return text
+
+    def checkout(self, n: int) -> str:
+        """Text of version `n` (negative numbers count from the latest)."""
+        if n < 0:
+            n += len(self._versions)
+        if not 0 <= n < len(self._versions):
+            raise IndexError(f"No narrative version {n}")
+        cached = self._texts.get(n)
+        if cached is not None:
+            self._texts.move_to_end(n)
+            return cached
+        chain = self._chain(n)
+        for depth, v in enumerate(chain):
+            if v in self._texts:
+                text = self._texts[v]
+                break
+        else:
+            depth = len(chain) - 1
+            text = zlib.decompress(self._versions[chain[depth]]["data"]).decode("utf-8")
+        for v in reversed(chain[:depth]):
+            text = apply_delta(text, self._versions[v]["data"])
+        return self._remember(n, text)
+
+    def head(self) -> str:
+        return self.checkout(-1) if self._versions else ""
+
+    def commit(self, text: str, source: str, **meta) -> int:
+        """
+        Record `text` as a new version written by `source` (e.g. "human_review"). Committing the
+        latest text again is a no-op that returns the latest version number.
+        """
+        text = text or ""
+        if self._versions and text == self.head():
+            return len(self._versions) - 1
+        n = len(self._versions)
+        base = self.base_of(n)
+        if base is None:
+            data = zlib.compress(text.encode("utf-8"))
+        else:
+            data = make_delta(self.checkout(base), text)
+        self._versions.append({"base": base, "data": data, "length": len(text), "source": source,
+                               "created_at": time.time(), **meta})
+        self._remember(n, text)
+        return n
+
+    def delta_between(self, ancestor: int, n: int) -> tuple:
+        """Delta from `ancestor` (a base of `n`, or `n` itself) to version `n`, composed from the stored deltas."""
+        if n == ancestor:
+            return ((0, self._versions[n]["length"]),) if self._versions[n]["length"] else ()
+        delta, v = self._versions[n]["data"], self.base_of(n)
+        while v != ancestor:
+            if v is None:
+                raise ValueError(f"Version {ancestor} is not a base of version {n}")
+            delta = compose(self._versions[v]["data"], delta)
+            v = self.base_of(v)
+        return delta
+
+    def common_base(self, i: int, j: int):
+        """Nearest version both `i` and `j` are derived from in the skip-delta tree (None across windows)."""
+        ancestors = set(self._chain(i))
+        return next((v for v in self._chain(j) if v in ancestors), None)
+
+    def diff(self, i: int, j: int) -> list:
+        """Character opcodes (SequenceMatcher format) turning version `i` into version `j`."""
+        a, b = self.checkout(i), self.checkout(j)
+        i, j = i % len(self._versions), j % len(self._versions)
+        base = self.common_base(i, j)
+        if base is None:
+            return _word_ops(a, b)
+        blocks = _shared_blocks(self.delta_between(base, i), self.delta_between(base, j))
+        ops = []
+        for op in diff_engine.opcodes_from_blocks(blocks, len(a), len(b)):
+            tag, i1, i2, j1, j2 = op
+            if tag == "replace":
+                # Text changed since the common base on both sides may still agree in part
+                ops.extend(_word_ops(a[i1:i2], b[j1:j2], i1, j1))
+            else:
+                ops.append(op)
+        return ops
+
+    def history(self) -> list:
+        """One dict per version: number, source, time, length, and how it is stored."""
+        rows = []
+        for n, v in enumerate(self._versions):
+            row = {k: val for k, val in v.items() if k not in ("data", "base")}
+            row["version"] = n
+            row["stored_as"] = "snapshot" if v["base"] is None else f"delta from v{v['base']}"
+            rows.append(row)
+        return rows
+
+    def to_dict(self) -> dict:
+        """JSON-serialisable form of the history (snapshots as text, deltas as segment lists)."""
+        versions = []
+        for v in self._versions:
+            data = (zlib.decompress(v["data"]).decode("utf-8") if v["base"] is None
+                    else [seg if isinstance(seg, str) else list(seg) for seg in v["data"]])
+            versions.append({**v, "data": data})
+        return {"snapshot_every": self.snapshot_every, "versions": versions}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VersionStore":
+        store = cls(snapshot_every=data.get("snapshot_every", VERSION_SNAPSHOT_EVERY))
+        for v in data.get("versions", []):
+            if v["base"] is None:
+                payload = zlib.compress(v["data"].encode("utf-8"))
+            else:
+                payload = tuple(seg if isinstance(seg, str) else tuple(seg) for seg in v["data"])
+            store._versions.append({**v, "data": payload})
+        return store
+
+    def stats(self) -> dict:
+        """Approximate stored size (bytes of snapshot data and delta literals) vs. the full texts."""
+        stored = 0
+        for v in self._versions:
+            if v["base"] is None:
+                stored += len(v["data"])
+            else:
+                stored += sum(len(seg) if isinstance(seg, str) else 16 for seg in v["data"])
+        return {"versions": len(self._versions),
+                "snapshots": sum(1 for v in self._versions if v["base"] is None),
+                "stored_bytes": stored,
+                "full_text_bytes": sum(v["length"] for v in self._versions)}
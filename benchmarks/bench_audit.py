@@ -0,0 +1,118 @@
+"""
+Audit-trail queries (application_pages/audit_store.py) over a generated audit log.
+
+    python -m benchmarks.bench_audit --events 1000000 --workdir /tmp/audit_bench
+
+Writes a hash-chained log of synthetic case histories (draft, edits, checklist runs, AI fixes,
+exports) spread over two years, indexes it, and times the queries of the Audit Trail Query page.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from application_pages.audit_log import GENESIS_HASH, _canonical, _last_record, record_hash
+from application_pages.audit_store import AuditStore
+
+ANALYSTS = [f"AML_Analyst_{n:03d}" for n in range(1, 41)]
+LABELS = ["5Ws Present", "Chronology", "Facts Supported", "No Speculation", "Length Bounds"]
+
+
+def _case_events(rng, case_id: str) -> list:
+    """(event, details) of one case's history."""
+    events = [("AI draft generated", {"mode": rng.choice(["streaming", "hedged", "template"]), "version": 0})]
+    version = 0
+    for _ in range(rng.randint(0, 4)):
+        version += 1
+        events.append(("Narrative edited", {"source": "human_review", "version": version}))
+    passed = rng.random() < 0.6
+    events.append(("Compliance checklist run", {"status": "PASS" if passed else "FAIL", "version": version,
+                                                "failed": [] if passed else rng.sample(LABELS, rng.randint(1, 2))}))
+    if not passed and rng.random() < 0.7:
+        version += 1
+        events.append(("AI fix generated", {"summary": "Targeted repair"}))
+        events.append(("AI fix applied", {"source": "ai_fix", "version": version}))
+        events.append(("Compliance checklist run", {"status": "PASS", "version": version, "failed": []}))
+    if rng.random() < 0.8:
+        events.append(("Export prepared", {"status": "PASS"}))
+    return events
+
+
+def write_log(path: str, n_events: int, seed: int = 7) -> int:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    span = timedelta(days=730)
+    prev, seq, case = GENESIS_HASH, 0, 0
+    with open(path, "w", encoding="utf-8") as f:
+        while seq < n_events:
+            case += 1
+            analyst = rng.choice(ANALYSTS)
+            at = start + span * (seq / n_events)
+            for event, details in _case_events(rng, f"alert-{case}"):
+                seq += 1
+                at += timedelta(minutes=rng.randint(1, 30))
+                record = {"seq": seq, "timestamp": at.isoformat(sep=" ", timespec="seconds"), "event": event,
+                          "case_id": f"alert-{case}", "analyst_id": analyst, **details, "prev_hash": prev}
+                record["hash"] = prev = record_hash(record)
+                f.write(_canonical(record) + "\n")
+    return seq
+
+
+def _timed(label: str, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    size = len(result) if isinstance(result, list) else result
+    print(f"{label:<58} {elapsed * 1000:>9.1f} ms  {size:>8} rows", flush=True)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark audit-trail queries.")
+    parser.add_argument("--events", type=int, default=1_000_000, help="events in the generated log")
+    parser.add_argument("--workdir", default=".", help="directory for the log and index files")
+    args = parser.parse_args(argv)
+
+    log_path = os.path.join(args.workdir, "bench_audit_log.jsonl")
+    index_path = os.path.join(args.workdir, "bench_audit_index.sqlite3")
+    for path in (log_path, index_path, index_path + "-wal", index_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    n = write_log(log_path, args.events)
+    print(f"wrote {n} events ({os.path.getsize(log_path) / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s", flush=True)
+    store = AuditStore(index_path, log_path)
+    start = time.perf_counter()
+    store.sync(flush_log=False)
+    print(f"indexed in {time.perf_counter() - start:.1f}s ({os.path.getsize(index_path) / 1e6:.0f} MB, FTS5: {store.has_fts})", flush=True)
+
+    q = dict(sync=False)
+    _timed("exports by one analyst, last quarter", store.query, event="Export prepared",
+           analyst_id="AML_Analyst_007", since="2025-10-01", until="2025-12-31", **q)
+    _timed("  (count)", store.count, event="Export prepared", analyst_id="AML_Analyst_007",
+           since="2025-10-01", until="2025-12-31", **q)
+    _timed("cases with an AI fix applied after a FAIL, last quarter", store.cases_with_sequence,
+           "Compliance checklist run", "AI fix applied", first_status="FAIL", since="2025-10-01", until="2025-12-31", **q)
+    _timed("cases with an AI fix applied after a FAIL, all time (first 1000)", store.cases_with_sequence,
+           "Compliance checklist run", "AI fix applied", first_status="FAIL", **q)
+    _timed("one case's trail", store.query, case_id="alert-12345", **q)
+    _timed("failed checklist runs, one day", store.query, event="Compliance checklist run", status="FAIL",
+           since="2025-03-14", until="2025-03-14", **q)
+    _timed('full text "Chronology" (first 1000)', store.query, text="Chronology", **q)
+    _timed("latest 1000 events", store.query, **q)
+    _timed("event types", store.distinct, "event")
+    _timed("analysts", store.distinct, "analyst_id")
+
+    with open(log_path, "a", encoding="utf-8") as f:
+        last = _last_record(log_path) or {"seq": 0, "hash": GENESIS_HASH}
+        record = {"seq": last["seq"] + 1, "timestamp": datetime.now().isoformat(sep=" ", timespec="seconds"),
+                  "event": "Export prepared", "case_id": "alert-0", "analyst_id": ANALYSTS[0], "prev_hash": last["hash"]}
+        record["hash"] = record_hash(record)
+        f.write(_canonical(record) + "\n")
+    _timed("incremental sync of one new event", store.sync, flush_log=False)
+
+
+if __name__ == "__main__":
+    main()
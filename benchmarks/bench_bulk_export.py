@@ -0,0 +1,64 @@
+"""
+Bulk export (application_pages/bulk_export.py) of a month-end batch of finished cases.
+
+    python -m benchmarks.bench_bulk_export --cases 500 --workers 1,4 --workdir /tmp/bulk_bench
+
+Saves checked template cases for the synthetic alerts to a fresh case store, copies them under new
+case IDs up to --cases, then exports the whole batch (JSON, CSV, TXT and PDF per case) once per
+worker count and verifies every file against the manifest.
+"""
+import argparse
+import os
+import shutil
+
+from application_pages.bulk_export import run_bulk_export, verify_export, write_sample_cases
+from application_pages.case_store import CaseStore
+from application_pages.page_case_intake import load_synthetic_data
+
+
+def make_store(path: str, n_cases: int) -> list:
+    """A case store at `path` holding `n_cases` checked cases. Returns their IDs."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    store = CaseStore(path)
+    write_sample_cases(load_synthetic_data(), store)
+    originals = store.find(limit=n_cases)
+    case_ids = [c["case_id"] for c in originals]
+    copy = 0
+    while len(case_ids) < n_cases:
+        case = originals[copy % len(originals)]
+        row, blob = store.load(case["case_id"])
+        copy += 1
+        case_id = f"{case['case_id']}-{copy}"
+        store.save(case_id, blob, row["status"], customer_id=row["customer_id"], alert_id=row["alert_id"],
+                   analyst=row["analyst"])
+        case_ids.append(case_id)
+    return case_ids[:n_cases]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bulk export.")
+    parser.add_argument("--cases", type=int, default=500, help="cases in the batch")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated worker counts")
+    parser.add_argument("--workdir", default=".", help="directory for the case store and the exports")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    os.environ.setdefault("SAR_AUDIT_LOG", os.path.join(args.workdir, "bench_bulk_audit_log.jsonl"))
+    store_path = os.path.join(args.workdir, "bench_bulk_cases.sqlite3")
+    case_ids = make_store(store_path, args.cases)
+    print(f"{len(case_ids)} cases in {store_path}", flush=True)
+
+    for workers in dict.fromkeys(int(w) for w in args.workers.split(",")):
+        out_dir = os.path.join(args.workdir, f"bench_bulk_export_{workers}")
+        shutil.rmtree(out_dir, ignore_errors=True)
+        job = run_bulk_export(case_ids, out_dir, store_path=store_path, workers=workers)
+        mismatched = verify_export(out_dir)
+        print(f"workers={workers:<3} {job['exported']} cases, {job['files']} files, {job['bytes'] / 1e6:.0f} MB "
+              f"in {job['elapsed_s']:.1f} s: {job['cases_per_s']} cases/s, {job['mb_per_s']} MB/s; "
+              f"failed {job['failed']}, checksum mismatches {len(mismatched)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Diff engine (application_pages/diff_engine.py) vs. difflib.SequenceMatcher on generated narratives.
+
+    python -m benchmarks.bench_diff --sizes 1,10,100,1000 --edits 0.02
+
+For each document size (KB) an edited copy is made by rewording, deleting and inserting a fraction
+of the sentences. Both engines diff the paragraph lists and the word tokens of the whole document
+(the worst case for the inline diff: one long paragraph). difflib runs with autojunk=False, as the
+Human Review page used to; it is skipped above --difflib-max-kb, where its word-level run takes
+many minutes.
+"""
+import argparse
+import random
+import time
+from difflib import SequenceMatcher
+
+from application_pages import diff_engine
+from application_pages.page_review_compare import _split_paragraphs, _tokenize_with_ws
+
+SENTENCES = [
+    "On 2023-02-{day:02d}, the customer sent `${amount:,.2f}` to account {account}.",
+    "The funds were withdrawn in cash at the branch on the same day.",
+    "The customer deposited cash at the {city} branch.",
+    "The transaction triggered the structuring alert.",
+    "No business purpose for the transfers was documented.",
+]
+CITIES = ["Springfield", "Riverton", "Lakeside", "Fairview"]
+
+
+def _sentence(rng) -> str:
+    return rng.choice(SENTENCES).format(day=rng.randint(1, 28), amount=rng.uniform(10, 9999),
+                                        account=rng.randint(1000, 9999), city=rng.choice(CITIES))
+
+
+def make_document(kb: float, seed: int = 7) -> list:
+    """Paragraphs (lists of sentences) totalling about `kb` kilobytes."""
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < kb * 1000:
+        paragraph = [_sentence(rng) for _ in range(rng.randint(3, 7))]
+        paragraphs.append(paragraph)
+        size += sum(len(s) + 1 for s in paragraph) + 1
+    return paragraphs
+
+
+def edit_document(paragraphs: list, rate: float, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    edited = []
+    for paragraph in paragraphs:
+        new = []
+        for sentence in paragraph:
+            r = rng.random()
+            if r < rate / 3:
+                continue                                      # delete
+            if r < 2 * rate / 3:
+                sentence = sentence.replace("the", "a", 1)    # reword
+            new.append(sentence)
+            if rng.random() < rate / 3:
+                new.append(_sentence(rng))                    # insert
+        edited.append(new)
+    return edited
+
+
+def _join(paragraphs: list) -> str:
+    return "\n\n".join(" ".join(p) for p in paragraphs)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _difflib_opcodes(a, b):
+    return SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+
+def _matched(ops) -> int:
+    return sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == "equal")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the narrative diff engines.")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="document sizes in KB, comma-separated")
+    parser.add_argument("--edits", type=float, default=0.02, help="fraction of sentences edited")
+    parser.add_argument("--difflib-max-kb", type=float, default=10.0, help="largest size difflib is run on")
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>8} {'level':>10} {'items':>9} {'diff_engine':>12} {'difflib':>10} {'matched (engine/difflib)':>26}")
+    for kb in (float(s) for s in args.sizes.split(",")):
+        original = make_document(kb)
+        a_text, b_text = _join(original), _join(edit_document(original, args.edits))
+        levels = [
+            ("paragraph", _split_paragraphs(a_text), _split_paragraphs(b_text)),
+            ("word", _tokenize_with_ws(a_text), _tokenize_with_ws(b_text)),
+        ]
+        for level, a, b in levels:
+            ops, engine_s = _timed(diff_engine.opcodes, a, b)
+            if kb <= args.difflib_max_kb:
+                ref_ops, difflib_s = _timed(_difflib_opcodes, a, b)
+                ref = f"{difflib_s:>9.3f}s {_matched(ops):>12}/{_matched(ref_ops)}"
+            else:
+                ref = f"{'skipped':>10} {_matched(ops):>12}/-"
+            print(f"{len(a_text) / 1000:>6.0f}KB {level:>10} {len(a):>9} {engine_s:>11.3f}s {ref}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Throughput and latency benchmark of the Draft SAR and compliance-fix LLM paths.
+
+Runs against an in-process mock server by default (see benchmarks/mock_llm_server.py), so the real
+HTTP, retry, hedging and deadline code paths are exercised without an API key:
+
+    python -m benchmarks.bench_llm --requests 200 --concurrency 16 --latency lognormal:0.8,0.4 --fail 429=0.03
+    python -m benchmarks.bench_llm --url http://127.0.0.1:8900   # an already running mock server
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_llm_server import LatencyProfile, MockState, parse_failures, start_server
+
+SPECULATIVE_SENTENCES = [
+    "The customer likely structured these deposits.",
+    "The funds appears to have been moved to avoid reporting.",
+    "It is believed that the counterparties are related.",
+]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))]
+
+
+def long_narrative(n_sentences: int = 40) -> str:
+    """A long narrative with a few speculative sentences spread through it."""
+    sentences = []
+    for i in range(n_sentences):
+        if i % (n_sentences // len(SPECULATIVE_SENTENCES)) == 5:
+            sentences.append(SPECULATIVE_SENTENCES[len(sentences) % len(SPECULATIVE_SENTENCES)])
+        sentences.append(f"On 2023-02-{1 + i % 28:02d}, the customer sent `${100 + i * 13:,.2f}` to account {9000 + i}.")
+    return "AI-assisted draft:\n" + " ".join(sentences)
+
+
+def run_scenario(name, fn, inputs, concurrency):
+    latencies, errors = [], {}
+
+    def one(item):
+        start = time.perf_counter()
+        try:
+            fn(item)
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, inputs))
+    wall = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "requests": len(inputs),
+        "ok": len(latencies),
+        "errors": ", ".join(f"{k}={v}" for k, v in sorted(errors.items())) or "-",
+        "wall_s": wall,
+        "req_per_s": len(latencies) / wall if wall else float("nan"),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "mean_s": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+
+
+def mock_stats(base_url):
+    return requests.get(f"{base_url}/stats", timeout=5).json()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Draft SAR and compliance-fix LLM calls.")
+    parser.add_argument("--url", default=None, help="base URL of a running mock server (default: start one)")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.5,0.4")
+    parser.add_argument("--tail-prob", type=float, default=0.02)
+    parser.add_argument("--tail-latency", type=float, default=3.0)
+    parser.add_argument("--per-token-latency", type=float, default=0.002)
+    parser.add_argument("--fail", action="append", default=[])
+    parser.add_argument("--deadline", type=float, default=None, help="override LLM_DEADLINE_S")
+    parser.add_argument("--scenarios", default="draft,draft_stream,fix_full,fix_targeted")
+    args = parser.parse_args(argv)
+
+    if args.url is None:
+        state = MockState(LatencyProfile(args.latency, args.tail_prob, args.tail_latency, seed=7),
+                          parse_failures(args.fail), per_token_s=args.per_token_latency, seed=7)
+        _, base_url = start_server(state=state)
+    else:
+        base_url = args.url.rstrip("/")
+
+    # The clients read their configuration at import time
+    os.environ["LLM_API_URL"] = f"{base_url}/v1/chat/completions"
+    os.environ["LLM_API_KEY"] = "mock"
+    if args.deadline is not None:
+        os.environ["SAR_DRAFT_DEADLINE_S"] = os.environ["SAR_FIX_DEADLINE_S"] = str(args.deadline)
+
+    from application_pages.page_case_intake import load_synthetic_data
+    from application_pages.prefetch import build_alert_prompt, prioritized_alerts
+    from application_pages import page_draft_sar as draft
+    from application_pages import page_compliance_checklist as compliance
+    from application_pages.llm_client import latency_tracker
+
+    data = load_synthetic_data()
+    alerts = prioritized_alerts(data['alerts'], data['customers']).to_dict('records')
+    draft_prompts = [build_alert_prompt(data, alerts[i % len(alerts)])[2] for i in range(args.requests)]
+
+    narrative = long_narrative()
+    five_ws = {"Who": ["c"], "What": ["w"], "When": ["2023-01-01"], "Where": ["USA"], "Why": ["r"]}
+    report = compliance.run_compliance_checklist(narrative, five_ws)
+    flagged = compliance.find_flagged_sentences(narrative, report)
+    fix_prompt = compliance.build_fix_prompt(narrative, report)
+    targeted_prompt = compliance.build_targeted_fix_prompt(flagged)
+
+    def stream_draft(prompt):
+        return "".join(draft.stream_llm(prompt))
+
+    def fix_full(_):
+        return compliance.call_llm(fix_prompt)
+
+    def fix_targeted(_):
+        response = compliance.call_llm(targeted_prompt, max_tokens=compliance.targeted_fix_max_tokens(flagged))
+        return compliance.apply_sentence_replacements(
+            narrative, flagged, compliance.parse_sentence_replacements(response))
+
+    scenarios = {
+        "draft": (draft.call_llm, draft_prompts),
+        "draft_stream": (stream_draft, draft_prompts),
+        "fix_full": (fix_full, range(args.requests)),
+        "fix_targeted": (fix_targeted, range(args.requests)),
+    }
+
+    print(f"Mock LLM at {base_url} | {args.requests} requests per scenario | concurrency {args.concurrency}")
+    print(f"Fix narrative: {len(narrative)} chars, {len(flagged)} flagged sentences; "
+          f"prompt chars full={len(fix_prompt)} targeted={len(targeted_prompt)}")
+    header = f"{'scenario':<14}{'ok':>6}{'req/s':>9}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'out tok':>10}  errors"
+    print(header)
+    print("-" * len(header))
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        fn, inputs = scenarios[name]
+        before = mock_stats(base_url)
+        row = run_scenario(name, fn, list(inputs), args.concurrency)
+        out_tokens = mock_stats(base_url)["completion_tokens"] - before["completion_tokens"]
+        print(f"{row['scenario']:<14}{row['ok']:>6}{row['req_per_s']:>9.2f}{row['p50_s']:>9.3f}"
+              f"{row['p95_s']:>9.3f}{row['p99_s']:>9.3f}{out_tokens:>10}  {row['errors']}")
+
+    print("\nClient-side latency by endpoint (llm_client):")
+    for row in latency_tracker.snapshot():
+        print(f"  {row['endpoint']}: requests={row['requests']} p50={row['p50_s']:.3f}s p95={row['p95_s']:.3f}s "
+              f"p99={row['p99_s']:.3f}s hedged={row['hedged']} retries={row['retries']} "
+              f"deadline_exceeded={row['deadline_exceeded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+SAR PDF rendering (application_pages/pdf_renderer.py) on export bundles of synthetic cases.
+
+    python -m benchmarks.bench_pdf --cases 50 --facts 1000,5000,20000
+
+Bundles are built the way the Export & Audit page builds them: the case facts, a template draft,
+the compliance checklist report and a short audit trail. Reports per second are measured three
+ways: setting the renderer up for every report (styles and logo, as each export used to), one
+shared renderer, and the shared renderer serving unchanged bundles from its cache.
+
+With --facts, one case is grown to each number of transaction facts (plus half as many audit rows)
+and rendered with the standard layout in memory and with the scalable layout to a temp file, each
+in a forked process, reporting time and how much the process's peak RSS grew while rendering.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+
+from application_pages.compliance_rules import run_compliance_checklist
+from application_pages.page_case_intake import load_synthetic_data
+from application_pages.page_export_audit import export_sar_data
+from application_pages.pdf_renderer import SarPdfRenderer
+from application_pages.prefetch import build_alert_prompt, prioritized_alerts
+from application_pages.template_draft import render_template_draft
+
+EVENTS = ["AI draft generated", "Narrative edited", "Compliance checklist run", "Export prepared"]
+
+
+def make_bundles(n: int) -> list:
+    data = load_synthetic_data()
+    bundles = []
+    for alert in prioritized_alerts(data["alerts"], data["customers"]).head(n).to_dict("records"):
+        facts, five_ws, _ = build_alert_prompt(data, alert)
+        narrative = render_template_draft(facts, five_ws)
+        report = run_compliance_checklist(narrative, five_ws, selected_facts=facts)
+        case_id = f"alert-{alert['alert_id']}"
+        trail = [{"seq": k, "timestamp": f"2025-10-01 10:{k:02d}:00", "event": event, "case_id": case_id,
+                  "analyst_id": "AML_Analyst_001"} for k, event in enumerate(EVENTS, 1)]
+        bundles.append(export_sar_data(narrative, facts, report, trail))
+    return bundles
+
+
+def grow_bundle(bundle: dict, n_facts: int) -> dict:
+    """`bundle` with `n_facts` transaction facts and n_facts / 2 audit rows."""
+    case_id = bundle["audit_trail"][0]["case_id"]
+    facts = [{"type": f"Transaction {i}", "transaction_id": 100000 + i, "customer_id": 204,
+              "transaction_amount": 1234.5 + i, "timestamp": "2023-02-11 15:00:00", "origin_latitude": 36.06,
+              "origin_longitude": -117.22, "destination_latitude": 34.22, "destination_longitude": -118.58}
+             for i in range(1, n_facts + 1)]
+    trail = [{"seq": k, "timestamp": "2025-10-01 10:00:00", "event": "Narrative edited", "case_id": case_id,
+              "analyst_id": "AML_Analyst_001", "source": "human_review", "version": k} for k in range(n_facts // 2)]
+    return dict(bundle, facts=facts, audit_trail=trail)
+
+
+def _measure(fn, conn) -> None:
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    grown_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    conn.send((elapsed, grown_kb, size))
+
+
+def _peak(label: str, fn) -> None:
+    """Run `fn` (returning the PDF size) in a forked process and print its time and peak RSS growth."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_measure, args=(fn, child))
+    proc.start()
+    elapsed, grown_kb, size = parent.recv()
+    proc.join()
+    print(f"{label:<40} {elapsed:>8.1f} s  peak RSS +{grown_kb / 1024:>5.0f} MB  ({size / 1e6:.1f} MB PDF)", flush=True)
+
+
+def _to_file(renderer, bundle) -> int:
+    path = renderer.render_to_file(bundle)
+    try:
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def _rate(label: str, fn, bundles: list) -> None:
+    start = time.perf_counter()
+    size = sum(len(fn(b)) for b in bundles)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {len(bundles) / elapsed:>8.1f} reports/s  ({size / len(bundles) / 1e3:.0f} KB avg)", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SAR PDF rendering.")
+    parser.add_argument("--cases", type=int, default=50, help="number of case bundles")
+    parser.add_argument("--facts", default="", help="comma-separated fact counts for the memory comparison")
+    args = parser.parse_args(argv)
+
+    bundles = make_bundles(args.cases)
+    start = time.perf_counter()
+    renderer = SarPdfRenderer(cache_size=len(bundles))
+    print(f"{len(bundles)} bundles; renderer set up in {(time.perf_counter() - start) * 1000:.0f} ms", flush=True)
+    renderer.build(bundles[0])   # warm up fonts and imports
+
+    _rate("renderer set up per report", lambda b: SarPdfRenderer(cache_size=0).build(b), bundles)
+    _rate("shared renderer", renderer.build, bundles)
+    _rate("shared renderer, first render (cache)", renderer.render, bundles)
+    _rate("shared renderer, unchanged bundles", renderer.render, bundles)
+    print(renderer.stats())
+
+    for n in [int(x) for x in args.facts.split(",") if x.strip()]:
+        big = grow_bundle(bundles[0], n)
+        _peak(f"{n} facts, standard layout", lambda: len(renderer.build(big)))
+        _peak(f"{n} facts, scalable layout", lambda: _to_file(renderer, big))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throughput of the speculative-language matcher against a large generated lexicon.
+
+    python -m benchmarks.bench_speculation --phrases 5000 --mb 20
+"""
+import argparse
+import random
+import string
+import time
+
+from application_pages.rule_packs import get_pack
+from application_pages.speculation import SpeculationMatcher
+
+SENTENCES = [
+    "On 2023-02-{day:02d}, the customer sent `${amount:,.2f}` to account {account}.",
+    "The funds were withdrawn in cash at the branch on the same day.",
+    "The customer likely structured these deposits to avoid reporting.",
+    "It is believed that the counterparties are related.",
+]
+
+
+def make_lexicon(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(2000)]
+    hedges = list(get_pack("default").lexicons["speculative"]) + ["presumably", "apparently", "seemingly", "allegedly", "probably", "perhaps"]
+    lexicon = list(hedges)
+    while len(lexicon) < n:
+        lexicon.append(f"{rng.choice(hedges)} {rng.choice(words)}" if rng.random() < 0.5
+                       else " ".join(rng.sample(words, rng.randint(1, 3))))
+    return lexicon
+
+
+def make_text(mb: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < mb * 1_000_000:
+        s = rng.choice(SENTENCES).format(day=rng.randint(1, 28), amount=rng.uniform(10, 9999), account=rng.randint(1000, 9999))
+        parts.append(s)
+        size += len(s) + 1
+    return " ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the speculation matcher.")
+    parser.add_argument("--phrases", type=int, default=5000, help="lexicon size")
+    parser.add_argument("--mb", type=float, default=10.0, help="narrative text to scan (MB)")
+    args = parser.parse_args(argv)
+
+    lexicon = make_lexicon(args.phrases)
+    start = time.perf_counter()
+    matcher = SpeculationMatcher(lexicon)
+    compile_s = time.perf_counter() - start
+
+    text = make_text(args.mb)
+    start = time.perf_counter()
+    hits = sum(1 for _ in matcher.finditer(text))
+    scan_s = time.perf_counter() - start
+
+    print(f"lexicon: {len(matcher)} phrases, compiled in {compile_s:.2f}s")
+    print(f"scanned {len(text) / 1e6:.1f} MB in {scan_s:.2f}s: {len(text) / 1e6 / scan_s:.1f} MB/s, {hits} hits")
+
+
+if __name__ == "__main__":
+    main()
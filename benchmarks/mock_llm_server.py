@@ -0,0 +1,258 @@
+"""
+Local OpenAI-compatible mock of the chat-completions endpoint for testing and benchmarking.
+
+    python -m benchmarks.mock_llm_server --port 8900 --latency lognormal:0.8,0.5 --fail 429=0.05 --fail 500=0.02
+
+Point the app at it with:
+
+    LLM_API_URL=http://127.0.0.1:8900/v1/chat/completions LLM_API_KEY=mock streamlit run app.py
+
+Endpoints:
+    POST /v1/chat/completions   JSON or streamed (server-sent events) completions with `usage`
+    GET  /stats                 request, error and token counters since start (POST /stats/reset clears them)
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = (
+    "On the dates listed, the customer conducted the transactions described in the alert. "
+    "The amounts and counterparties are recorded in the case facts. "
+    "The activity was identified by transaction monitoring and reviewed by the analyst. "
+).split()
+
+
+class LatencyProfile:
+    """
+    Samples total response latency in seconds.
+    Specs: "fixed:S", "uniform:A,B", "lognormal:MEDIAN,SIGMA"; an optional tail adds slow outliers.
+    """
+
+    def __init__(self, spec: str = "fixed:0.2", tail_prob: float = 0.0, tail_s: float = 0.0, seed: int = None):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")] if params else []
+        if kind not in {"fixed", "uniform", "lognormal"}:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.tail_prob = tail_prob
+        self.tail_s = tail_s
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                value = self.params[0]
+            elif self.kind == "uniform":
+                value = self._rng.uniform(self.params[0], self.params[1])
+            else:
+                value = self._rng.lognormvariate(math.log(self.params[0]), self.params[1])
+            if self.tail_prob and self._rng.random() < self.tail_prob:
+                value += self.tail_s
+        return max(0.0, value)
+
+
+class MockState:
+    """Server configuration and thread-safe counters."""
+
+    def __init__(self, latency: LatencyProfile, failures: dict, completion_tokens: int = 200,
+                 ttft_fraction: float = 0.2, per_token_s: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.per_token_s = per_token_s      # decode time added per completion token
+        self.failures = failures            # {status_code: probability}
+        self.completion_tokens = completion_tokens
+        self.ttft_fraction = ttft_fraction  # share of latency before the first streamed token
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {"requests": 0, "succeeded": 0, "streamed": 0, "errors": {},
+                          "prompt_tokens": 0, "completion_tokens": 0, "started_at": time.time()}
+
+    def pick_failure(self):
+        with self._lock:
+            roll = self._rng.random()
+        cumulative = 0.0
+        for code, prob in self.failures.items():
+            cumulative += prob
+            if roll < cumulative:
+                return code
+        return None
+
+    def count(self, **kwargs):
+        with self._lock:
+            for k, v in kwargs.items():
+                if k == "error":
+                    self.stats["errors"][str(v)] = self.stats["errors"].get(str(v), 0) + 1
+                else:
+                    self.stats[k] += v
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def completion_for(prompt: str, max_tokens: int, target_tokens: int) -> str:
+    """A deterministic completion shaped like what each prompt asks for."""
+    if "Respond with ONLY a JSON array" in prompt:
+        # Targeted fix prompt: one replacement per numbered sentence
+        ids = [int(i) for i in re.findall(r"^(\d+)\. ", prompt, flags=re.M)]
+        return json.dumps([{"id": i, "text": f"Rewritten factual sentence {i}."} for i in ids])
+    narrative = re.search(r"CURRENT SAR NARRATIVE:\n(.*?)\n\nCOMPLIANCE CHECKLIST RESULTS:", prompt, flags=re.S)
+    if narrative:
+        # Full-rewrite fix prompt: the rewrite is about as long as the narrative it replaces
+        target_tokens = estimate_tokens(narrative.group(1))
+    n_words = max(1, min(max_tokens, target_tokens) * 3 // 4)
+    amounts = re.findall(r"\$?\d[\d,]*\.\d{2}", prompt)[:5]
+    words = [FILLER[i % len(FILLER)] for i in range(n_words)]
+    if amounts:
+        words.append("Amounts: " + ", ".join(f"`${a.lstrip('$')}`" for a in amounts) + ".")
+    prefix = "AI-assisted fixed draft:" if "fixed draft" in prompt else "AI-assisted draft:"
+    return prefix + "\n" + " ".join(words)
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, code: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+            if self.path.rstrip("/") == "/stats/reset":
+                state.reset()
+                return self._send_json(200, {"ok": True})
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+
+            state.count(requests=1)
+            payload = json.loads(body or b"{}")
+            prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+            latency = state.latency.sample()
+
+            failure = state.pick_failure()
+            if failure is not None:
+                time.sleep(latency * state.ttft_fraction)
+                state.count(error=failure)
+                headers = {"Retry-After": "1"} if failure == 429 else None
+                return self._send_json(failure, {"error": {"message": f"injected {failure}", "type": "mock"}}, headers)
+
+            text = completion_for(prompt, int(payload.get("max_tokens", 600)), state.completion_tokens)
+            usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            latency += state.per_token_s * usage["completion_tokens"]
+            state.count(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+
+            if payload.get("stream"):
+                self._stream(text, latency, payload.get("model"))
+                state.count(succeeded=1, streamed=1)
+                return
+            time.sleep(latency)
+            self._send_json(200, {
+                "id": f"mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            state.count(succeeded=1)
+
+        def _stream(self, text: str, latency: float, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = re.findall(r"\S+\s*", text)
+            time.sleep(latency * state.ttft_fraction)
+            per_token = latency * (1 - state.ttft_fraction) / max(1, len(pieces))
+            for piece in pieces:
+                chunk = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(per_token)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def parse_failures(specs) -> dict:
+    """["429=0.05", "500=0.02"] -> {429: 0.05, 500: 0.02}"""
+    failures = {}
+    for spec in specs or []:
+        code, _, prob = spec.partition("=")
+        failures[int(code)] = float(prob)
+    return failures
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, state: MockState = None):
+    """Start the mock server on a daemon thread. Returns (server, base_url); port 0 picks a free port."""
+    state = state or MockState(LatencyProfile())
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="probability of a slow outlier")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="seconds added to outliers")
+    parser.add_argument("--fail", action="append", default=[], help="inject errors, e.g. --fail 429=0.05")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="seconds added per completion token")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    state = MockState(
+        LatencyProfile(args.latency, args.tail_prob, args.tail_latency, seed=args.seed),
+        parse_failures(args.fail),
+        completion_tokens=args.completion_tokens,
+        per_token_s=args.per_token_latency,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()